@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Admission control module. Limits the concurrent requests per lane and rejects the excess early.
+"""
+
+import math
+import time
+import logging
+import threading
+from flask import g, jsonify, request
+from Service import metrics
+
+log = logging.getLogger(__name__)
+
+class Lane:
+  """Admits at most limit concurrent requests and queues at most queueSize more.
+
+  A queued request waits up to timeout seconds. Requests that do not fit are
+  rejected at once, with an estimate of when to retry from the recent request durations.
+  """
+
+  def __init__(self, name, limit, queueSize=0, timeout=0):
+    self.name = name
+    self.limit = max(limit, 1)
+    self.queueSize = queueSize
+    self.timeout = timeout
+    self.active = 0
+    self.waiting = 0
+    self.averageSeconds = 1.0
+    self.condition = threading.Condition()
+
+  def enter(self):
+    """Takes a slot of the lane. Returns False if the request is rejected."""
+    with self.condition:
+      if self.active >= self.limit or self.waiting:
+        if self.waiting >= self.queueSize:
+          return False
+        self.waiting += 1
+        try:
+          deadline = time.monotonic() + self.timeout
+          while self.active >= self.limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+              return False
+            self.condition.wait(remaining)
+        finally:
+          self.waiting -= 1
+      self.active += 1
+      return True
+
+  def leave(self, seconds):
+    """Frees the slot of a request that took seconds."""
+    with self.condition:
+      self.active -= 1
+      self.averageSeconds += 0.1 * (seconds - self.averageSeconds)
+      self.condition.notify()
+
+  def getRetryAfter(self):
+    """Returns the seconds until a slot is likely free."""
+    with self.condition:
+      return max(math.ceil(self.averageSeconds * (self.waiting + 1) / self.limit), 1)
+
+class AdmissionController:
+  """Assigns the requests to lanes by endpoint and rejects them with 429 when their lane is full.
+
+  lanes maps the lane names to dicts with the limit, queue and timeout of the lane
+  and routes maps the endpoints to lane names. Other endpoints use the default lane.
+  """
+
+  def __init__(self, lanes, routes, default="default"):
+    self.lanes = {name: Lane(name, lane["limit"], lane.get("queue", 0), lane.get("timeout", 0)) for name, lane in lanes.items()}
+    self.routes = dict(routes)
+    self.default = default
+
+  def init_app(self, app):
+    app.before_request(self.admit)
+    app.teardown_request(self.release)
+    app.extensions["admissionController"] = self
+
+  def getLane(self, endpoint):
+    """Returns the lane of the endpoint or None if the endpoint is not limited."""
+    return self.lanes.get(self.routes.get(endpoint, self.default))
+
+  def admit(self):
+    if request.environ.get("omwebservice.waitedJob"):
+      # the answer of a synchronous simulation, admitted as the simulate request
+      return None
+    lane = self.getLane(request.endpoint)
+    if lane is None:
+      return None
+    if not lane.enter():
+      metrics.admissionRejected.inc(lane.name)
+      retryAfter = lane.getRetryAfter()
+      log.debug("Rejected {0} request, retry after {1} seconds.".format(lane.name, retryAfter))
+      response = jsonify({"message": "The service is busy, retry after {0} seconds.".format(retryAfter)})
+      response.status_code = 429
+      response.headers["Retry-After"] = str(retryAfter)
+      return response
+    g.admissionLane = lane
+    g.admissionStart = time.monotonic()
+    return None
+
+  def release(self, exception=None):
+    lane = g.pop("admissionLane", None)
+    if lane is not None:
+      lane.leave(time.monotonic() - g.pop("admissionStart"))
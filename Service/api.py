@@ -33,17 +33,33 @@ Api module using the Flask framework.
 """
 
 import os
+import shutil
 import logging
 import flask
 from flask import current_app, jsonify
-from flask_restx import Resource, Api, reqparse
-from Service.omc import OMC
-from Service import util
+from flask_restx import Resource, Api, reqparse, inputs
+from Service import util, jobs, metrics
+from Service.libraries import LibraryLoadError, getLibraries, installLibrary
+from Service.compiledmodel import getFileNamePrefix, getCompiledModelKey, getExecutable, storeCompiledModel, runCompiledModel
+from Service.batch import getVariants, runVariants
+from Service.scheduler import setAffinity
+from Service.instancecache import getModelInstanceKey
+from Service.fmu import getFMUKey, copyFile
+from Service.metadata import parseMetaData
+from Service.packages import storePackage, linkPackage
+from Service.progress import ProgressMonitor, EventStream
+from Service.results import ResultFileError, readVariables, downsamplers
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import tempfile
 import zipfile
+import io
 import json
+import uuid
+import mimetypes
+import numpy
+from contextlib import contextmanager, nullcontext
 
 log = logging.getLogger(__name__)
 
@@ -54,61 +70,503 @@ allowedExtensions = set(["zip", "json"])
 def allowedFile(fileName):
   return '.' in fileName and fileName.rsplit('.', 1)[1].lower() in allowedExtensions
 
-def setResultJsonAndQuitOMC(omc, originalDir, messages, file):
+def getSessionPool():
+  """Returns the OMC session pool of the current app."""
+  return current_app.extensions["omcSessionPool"]
+
+def getJobManager():
+  """Returns the background job manager of the current app."""
+  return current_app.extensions["jobManager"]
+
+def getCompiledModelCache():
+  """Returns the compiled model cache of the current app or None if it is disabled."""
+  return current_app.extensions["compiledModelCache"]
+
+def getFMUCache():
+  """Returns the FMU cache of the current app or None if it is disabled."""
+  return current_app.extensions["fmuCache"]
+
+def getPackageCache():
+  """Returns the model package store of the current app or None if it is disabled."""
+  return current_app.extensions["packageCache"]
+
+def getModelInstanceCache():
+  """Returns the model instance cache of the current app or None if it is disabled."""
+  return current_app.extensions["modelInstanceCache"]
+
+def getCPUScheduler():
+  """Returns the CPU scheduler of the current app."""
+  return current_app.extensions["cpuScheduler"]
+
+def getOMCVersion():
+  """Returns the version of the pooled OMC sessions."""
+  sessionPool = getSessionPool()
+  if sessionPool.version is None:
+    with sessionPool.session():
+      pass
+  return sessionPool.version
+
+def getDownloadUrl(fileName):
+  """Returns the download url of the file name relative to TMPDIR."""
+  if not fileName:
+    return ""
+  return flask.url_for('api.download', FileName=fileName, _external=True)
+
+def touchFile(path):
+  """Tells the janitor that the existing file path inside TMPDIR is used."""
+  janitor = current_app.extensions.get("janitor")
+  if janitor is not None:
+    janitor.touch(path)
+
+def setResultJson(messages, fileName):
   resultJson = dict()
-  if originalDir:
-    omc.sendCommand("cd(\"{0}\")".format(originalDir.replace('\\','/')))
-  omc.sendCommand("quit()")
   resultJson["messages"] = messages
-  resultJson["file"] = file
+  resultJson["file"] = getDownloadUrl(fileName)
   return jsonify(resultJson)
 
-def readMetaDataAndZipFile(omc, metaDataJsonFileArg, modelZipFileArg):
+def isInlineSize(size):
+  """Returns True if an artifact of size bytes is small enough to be sent inline."""
+  return size <= current_app.config['INLINE_MAX_SIZE']
+
+def getMultipartResponse(resultJson, fileName):
+  """Returns a multipart/mixed response with the result json and the file relative to TMPDIR."""
+  boundary = uuid.uuid4().hex
+  with open(os.path.join(current_app.config['TMPDIR'], fileName), "rb") as file:
+    data = file.read()
+  name = os.path.basename(fileName)
+  mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+  body = b"".join([
+    "--{0}\r\nContent-Type: application/json\r\n\r\n".format(boundary).encode(),
+    json.dumps(resultJson).encode(),
+    "\r\n--{0}\r\nContent-Type: {1}\r\nContent-Disposition: attachment; filename=\"{2}\"\r\n\r\n".format(boundary, mimetype, name).encode(),
+    data,
+    "\r\n--{0}--\r\n".format(boundary).encode()
+  ])
+  return flask.Response(body, mimetype="multipart/mixed; boundary={0}".format(boundary))
+
+def setJobResultJson(result, timings=None, inline=False):
+  """Returns the job result with the file names replaced by download urls.
+
+  The phase durations of timings are added as timings and as the Server-Timing header.
+  With inline a result file up to INLINE_MAX_SIZE is sent along in a multipart/mixed response.
+  """
+  if timings is not None:
+    # the job result can be fetched several times
+    timings = timings.copy()
+  resultJson = dict()
+  resultJson["messages"] = result["messages"]
+  with metrics.collectTimings(timings), metrics.phase("resultUrl"):
+    resultJson["file"] = getDownloadUrl(result["fileName"])
+    if "runs" in result:
+      resultJson["runs"] = []
+      for run in result["runs"]:
+        runJson = {key: value for key, value in run.items() if key != "fileName"}
+        runJson["file"] = getDownloadUrl(run["fileName"])
+        resultJson["runs"].append(runJson)
+  if timings is not None:
+    resultJson["timings"] = timings.toJson()
+  fileName = result["fileName"]
+  if inline and fileName and isInlineSize(os.path.getsize(os.path.join(current_app.config['TMPDIR'], fileName))):
+    response = getMultipartResponse(resultJson, fileName)
+  else:
+    response = jsonify(resultJson)
+  if timings is not None:
+    response.headers["Server-Timing"] = timings.toServerTiming()
+  return response
+
+def readMetaDataAndZipFile(metaDataJsonFileArg, modelZipFileArg):
+  """Validates the metadata json, then saves it and extracts the zip file in a new upload directory.
+
+  Without a zip file the files of the stored package named by the package field of the metadata are
+  linked into the upload directory. Raises InvalidMetaData before anything is written if the metadata
+  does not match the schema.
+  """
   uploadDirectory = ""
   metaDataJson = {}
-  # save and read the json file
+  sourcesHash = ""
+  # read, validate and save the json file
   if metaDataJsonFileArg and allowedFile(metaDataJsonFileArg.filename):
     metaDataJsonFileName = secure_filename(metaDataJsonFileArg.filename)
+    with metrics.phase("upload"):
+      data = metaDataJsonFileArg.read()
+    with metrics.phase("validate"):
+      metaDataJson = parseMetaData(data, current_app.extensions["metadataValidator"])
     uploadDirectory = tempfile.mkdtemp(dir=current_app.config['TMPDIR'])
-    # change working directory
-    omc.sendCommand("cd(\"{0}\")".format(uploadDirectory.replace('\\','/')))
     metaDataJsonFilePath = os.path.join(uploadDirectory, metaDataJsonFileName)
-    metaDataJsonFileArg.save(metaDataJsonFilePath)
-    try:
-      with open(metaDataJsonFilePath) as metaDataJsonFile:
-        metaDataJson = json.load(metaDataJsonFile)
-    # json file not found exception
-    except FileNotFoundError:
-      return False, uploadDirectory, "The metadata.json file is missing. {0}".format(metaDataJsonFilePath), metaDataJson
+    with open(metaDataJsonFilePath, "wb") as metaDataJsonFile:
+      metaDataJsonFile.write(data)
   else:
-    return False, uploadDirectory, "The metadata.json file is missing. {0}".format(metaDataJsonFilePath), metaDataJson
+    return False, uploadDirectory, "The metadata.json file is missing. {0}".format(metaDataJsonFilePath), metaDataJson, sourcesHash
 
   # save and read the zip file
   if modelZipFileArg and allowedFile(modelZipFileArg.filename):
     modelZipFileName = secure_filename(modelZipFileArg.filename)
     modelZipFilePath = os.path.join(uploadDirectory, modelZipFileName)
-    modelZipFileArg.save(modelZipFilePath)
+    with metrics.phase("upload"):
+      modelZipFileArg.save(modelZipFilePath)
+    sourcesHash = util.hashFile(modelZipFilePath)
     # unzip the file
-    with zipfile.ZipFile(modelZipFilePath, 'r') as zip_ref:
+    with metrics.phase("unzip"), zipfile.ZipFile(modelZipFilePath, 'r') as zip_ref:
       zip_ref.extractall(uploadDirectory)
-
-  # load the model in OMC
+  elif metaDataJson.get("package"):
+    packageHash = metaDataJson["package"]
+    with metrics.phase("linkPackage"):
+      linked = getPackageCache() is not None and linkPackage(getPackageCache(), packageHash, uploadDirectory)
+    if not linked:
+      shutil.rmtree(uploadDirectory, ignore_errors=True)
+      return False, "", "The package {0} is not stored, upload it to /api/packages.".format(packageHash), metaDataJson, sourcesHash
+    # the hash of the package is the hash of its zip file, so the compiled models are shared with ModelZip uploads
+    sourcesHash = packageHash
+
+  return True, uploadDirectory, "", metaDataJson, sourcesHash
+
+def loadModelFiles(omc, uploadDirectory, metaDataJson):
+  """Changes the OMC working directory to the upload directory and loads the model files."""
+  omc.sendCommand("cd(\"{0}\")".format(uploadDirectory.replace('\\','/')))
   fileNames = metaDataJson.get("fileNames", [])
-  for fileName in fileNames:
-    if not omc.sendCommand("loadFile(\"{0}\")".format(fileName)):
-      return False, uploadDirectory, "Failed to load the model file {0}. {1}".format(fileName, omc.errorString), metaDataJson
-
-  # load the libs
-  libs = metaDataJson.get("libs", [])
-  for lib in libs:
-    name = lib.get("name", "")
-    version = lib.get("version", "")
-    if not omc.sendCommand("installPackage({0}, \"{1}\")".format(name, version)):
-      return False, uploadDirectory, "Failed to install package {0}.".format(name), metaDataJson
-    if not omc.sendCommand("loadModel({0}, {{\"{1}\"}})".format(name, version)):
-      return False, uploadDirectory, "Failed to load package {0}.".format(name), metaDataJson
-
-  return True, uploadDirectory, "", metaDataJson
+  with metrics.phase("loadFiles"):
+    loaded = omc.sendCommands("loadFile(\"{0}\")".format(fileName) for fileName in fileNames)
+  for fileName, fileLoaded in zip(fileNames, loaded):
+    if not fileLoaded:
+      return False, "Failed to load the model file {0}. {1}".format(fileName, omc.errorString)
+  return True, ""
+
+def runWithSession(function, uploadDirectory, metaDataJson, *args, interactive=False):
+  """Borrows an OMC session with the libs of the metadata loaded, loads the model files and calls function.
+
+  Interactive requests may use the sessions reserved for them, background jobs may not.
+  """
+  jobs.setProgress("Loading libraries and model files", 0.1)
+  try:
+    with getSessionPool().session(libraries=getLibraries(metaDataJson), interactive=interactive) as omc:
+      status, messages = loadModelFiles(omc, uploadDirectory, metaDataJson)
+      if not status:
+        return messages, ""
+      return function(omc, uploadDirectory, metaDataJson, *args)
+  except LibraryLoadError as ex:
+    return str(ex), ""
+
+def getSimulationArguments(metaDataJson):
+  """Returns the simulate, translateModel or buildModelFMU arguments for the metadata, after the class name."""
+  simulationArguments = []
+  if "fileNamePrefix" in metaDataJson:
+    simulationArguments.append("fileNamePrefix=\"{0}\"".format(metaDataJson["fileNamePrefix"]))
+
+  outputFormat = metaDataJson.get("outputFormat", "mat")
+  if outputFormat.casefold() == "fmu":
+    if "fmuVersion" in metaDataJson:
+      simulationArguments.append("version=\"{0}\"".format(metaDataJson["fmuVersion"]))
+    if "fmuType" in metaDataJson:
+      simulationArguments.append("fmuType=\"{0}\"".format(metaDataJson["fmuType"]))
+    if "platforms" in metaDataJson:
+      platforms = []
+      platformsJson = metaDataJson.get("platforms", [])
+      for platform in platformsJson:
+        platforms.append("\"{0}\"".format(platform))
+      simulationArguments.append("platforms={{{0}}}".format(", ".join(platforms)))
+    if "includeResources" in metaDataJson:
+      simulationArguments.append("includeResources={0}".format(metaDataJson["includeResources"]))
+  else:
+    if "startTime" in metaDataJson:
+      simulationArguments.append("startTime={0}".format(metaDataJson["startTime"]))
+    if "stopTime" in metaDataJson:
+      simulationArguments.append("stopTime={0}".format(metaDataJson["stopTime"]))
+    if "numberOfIntervals" in metaDataJson:
+      simulationArguments.append("numberOfIntervals={0}".format(metaDataJson["numberOfIntervals"]))
+    if "tolerance" in metaDataJson:
+      simulationArguments.append("tolerance={0}".format(metaDataJson["tolerance"]))
+    if "method" in metaDataJson:
+      simulationArguments.append("method=\"{0}\"".format(metaDataJson["method"]))
+    if "options" in metaDataJson:
+      simulationArguments.append("options=\"{0}\"".format(metaDataJson["options"]))
+    if outputFormat.casefold() == "mat" or outputFormat.casefold() == "csv":
+      simulationArguments.append("outputFormat=\"{0}\"".format(outputFormat))
+    if "variableFilter" in metaDataJson:
+      simulationArguments.append("variableFilter=\"{0}\"".format(metaDataJson["variableFilter"]))
+    if "cflags" in metaDataJson:
+      simulationArguments.append("cflags=\"{0}\"".format(metaDataJson["cflags"]))
+    if "simflags" in metaDataJson:
+      simulationArguments.append("simflags=\"{0}\"".format(metaDataJson["simflags"]))
+
+  simulationArgumentsStr = ", ".join(simulationArguments)
+  if simulationArgumentsStr:
+    simulationArgumentsStr = ", " + simulationArgumentsStr
+  return simulationArgumentsStr
+
+@contextmanager
+def reserveCompileCores(omc):
+  """Reserves the cores for compilation to omc and yields them.
+
+  The reserved cores are the parallel make budget of OMC and, if pinning is enabled, the cores omc and the
+  compiler it starts run on. Both are restored afterwards, the session goes back to the pool.
+  """
+  scheduler = getCPUScheduler()
+  with scheduler.reserveCompile() as cores:
+    omc.sendCommand("setCommandLineOptions(\"--numProcs={0}\")".format(len(cores)))
+    if scheduler.pin:
+      setAffinity(omc.getProcessId(), cores)
+    try:
+      yield cores
+    finally:
+      # 0 is the OMC default, as many processes as cores
+      omc.sendCommand("setCommandLineOptions(\"--numProcs=0\")")
+      if scheduler.pin:
+        setAffinity(omc.getProcessId(), scheduler.cores)
+
+def sendCompileCommand(omc, expression):
+  """Sends a buildModelFMU command on the cores reserved for compilation."""
+  with reserveCompileCores(omc):
+    return omc.sendCommand(expression)
+
+def monitorBuild(omc):
+  """Returns a ProgressMonitor that kills the compiler started by omc when the current job is cancelled."""
+
+  def cancel():
+    processId = omc.getProcessId()
+    if processId is not None:
+      util.killChildProcesses(processId)
+
+  return ProgressMonitor(jobs.getCurrentJob(), "", 0.0, 0.0, onCancel=cancel)
+
+def getSimulationDefaults(omc, className):
+  """Returns the experiment values of the class used when a request does not set them, or None."""
+  simulationOptions = omc.sendCommand("getSimulationOptions({0})".format(className))
+  try:
+    return {"startTime": simulationOptions[0], "stopTime": simulationOptions[1],
+            "tolerance": simulationOptions[2], "numberOfIntervals": simulationOptions[3]}
+  except (TypeError, IndexError, KeyError):
+    log.warning("Failed to get the simulation options of {0}: {1}".format(className, simulationOptions))
+    return None
+
+def simulateCompiledModel(uploadDirectory, metaDataJson, compiledModelKey):
+  """Runs the cached simulation executable with the runtime values of the metadata.
+
+  Returns the messages and the result file name, or None if the model is not cached.
+  """
+  compiledModelCache = getCompiledModelCache()
+  with compiledModelCache.open(compiledModelKey) as entryDirectory:
+    metadata = compiledModelCache.metadata(compiledModelKey) if entryDirectory else None
+    if not metadata:
+      return None
+    try:
+      return runSimulationExecutable(entryDirectory, metadata, uploadDirectory, metaDataJson)
+    except OSError as ex:
+      log.warning("Failed to run the compiled model {0}: {1}".format(metaDataJson["class"], str(ex)))
+      compiledModelCache.remove(compiledModelKey)
+      return None
+
+def runSimulationExecutable(entryDirectory, metadata, uploadDirectory, metaDataJson):
+  """Runs the simulation executable in entryDirectory on the cores reserved for simulation.
+
+  Returns the messages and the result file name relative to TMPDIR. Raises OSError if the executable does not run.
+  """
+  jobs.setProgress("Simulating", 0.3)
+  scheduler = getCPUScheduler()
+  with scheduler.reserveSimulate() as cores, metrics.phase("simulation"):
+    returnCode, output, resultFile = runCompiledModel(entryDirectory, metadata, uploadDirectory, metaDataJson,
+                                                      cores=cores if scheduler.pin else None)
+  if returnCode != 0 or not os.path.exists(resultFile):
+    return "Simulation execution failed for model: {0}\n{1}".format(metaDataJson["class"], output), ""
+  return output, "{0}/{1}".format(os.path.basename(uploadDirectory), os.path.basename(resultFile))
+
+def generateFMU(omc, uploadDirectory, metaDataJson):
+  """Builds the FMU for the platforms of the metadata in the upload directory.
+
+  OMC translates the model once and compiles the binaries of every platform from the same sources,
+  so they all have the GUID of the modelDescription.xml.
+  Returns the messages and the path of the FMU, or an empty path on failure.
+  """
+  fmuFile = sendCompileCommand(omc, "buildModelFMU({0}{1})".format(metaDataJson["class"], getSimulationArguments(metaDataJson)))
+  if not fmuFile:
+    return "Failed to generate the FMU. {0}".format(omc.errorString), ""
+  return "FMU is generated.", os.path.join(uploadDirectory, os.path.basename(fmuFile))
+
+def buildFMU(uploadDirectory, metaDataJson, sourcesHash):
+  """Builds the FMU with an OMC session, or copies it from the FMU cache.
+
+  Returns the messages and the FMU file name relative to TMPDIR.
+  """
+  fmuCache = getFMUCache()
+  fmuKey = getFMUKey(metaDataJson, sourcesHash, getOMCVersion()) if fmuCache is not None else None
+  if fmuKey:
+    with fmuCache.open(fmuKey) as entryDirectory:
+      metadata = fmuCache.metadata(fmuKey) if entryDirectory else None
+      if metadata:
+        copyFile(os.path.join(entryDirectory, metadata["fileName"]), os.path.join(uploadDirectory, metadata["fileName"]))
+        return "FMU is generated.", "{0}/{1}".format(os.path.basename(uploadDirectory), metadata["fileName"])
+
+  jobs.setProgress("Generating FMU", 0.3)
+  messages, fmuFile = runWithSession(generateFMU, uploadDirectory, metaDataJson)
+  if not fmuFile:
+    return messages, ""
+  fileName = os.path.basename(fmuFile)
+  if fmuKey:
+    try:
+      fmuCache.put(fmuKey, lambda directory: copyFile(fmuFile, os.path.join(directory, fileName)), {"fileName": fileName})
+    except OSError as ex:
+      log.warning("Failed to cache the FMU of {0}: {1}".format(metaDataJson["class"], str(ex)))
+  return messages, "{0}/{1}".format(os.path.basename(uploadDirectory), fileName)
+
+@jobs.jobType("simulate")
+def runSimulationJob(job):
+  """Runs a simulation job and returns the messages and the result file name.
+
+  Models in the compiled model cache are simulated without an OMC session. Other models are built with
+  an OMC session on the compile cores and then simulated like cached ones, after the session is returned.
+  FMUs are built by buildFMU.
+  """
+  uploadDirectory = job.payload["uploadDirectory"]
+  metaDataJson = job.payload["metaDataJson"]
+  if metaDataJson.get("class", "") and metaDataJson.get("outputFormat", "mat").casefold() == "fmu":
+    messages, fileName = buildFMU(uploadDirectory, metaDataJson, job.payload["sourcesHash"])
+    return {"messages": messages, "fileName": fileName}
+  if not metaDataJson.get("class", ""):
+    return {"messages": "Class is missing.", "fileName": ""}
+  compiledModelCache = getCompiledModelCache()
+  if compiledModelCache is not None:
+    compiledModelKey = getCompiledModelKey(metaDataJson, job.payload["sourcesHash"], getOMCVersion())
+    result = simulateCompiledModel(uploadDirectory, metaDataJson, compiledModelKey)
+    if result:
+      return {"messages": result[0], "fileName": result[1]}
+  messages, metadata = runWithSession(buildSimulationExecutable, uploadDirectory, metaDataJson)
+  if not metadata:
+    return {"messages": messages, "fileName": ""}
+  if compiledModelCache is not None:
+    try:
+      storeCompiledModel(compiledModelCache, compiledModelKey, uploadDirectory, metadata["prefix"], metadata["defaults"])
+    except OSError as ex:
+      log.warning("Failed to cache the compiled model {0}: {1}".format(metaDataJson["class"], str(ex)))
+  try:
+    messages, fileName = runSimulationExecutable(uploadDirectory, metadata, uploadDirectory, metaDataJson)
+  except OSError as ex:
+    messages, fileName = "Failed to run the simulation executable of {0}. {1}".format(metaDataJson["class"], str(ex)), ""
+  return {"messages": messages, "fileName": fileName}
+
+def buildSimulationExecutable(omc, uploadDirectory, metaDataJson):
+  """Translates the model and compiles the simulation executable in the upload directory.
+
+  The translate and compile phases are timed separately, like the OMC simulate record did.
+  Returns the messages and the metadata to run it with runCompiledModel, or an empty metadata on failure.
+  """
+  className = metaDataJson["class"]
+  prefix = getFileNamePrefix(metaDataJson)
+  failed = "Failed to build model: {0}".format(className)
+  with monitorBuild(omc), reserveCompileCores(omc) as cores:
+    jobs.setProgress("Translating", 0.1)
+    with metrics.phase("translate"):
+      translated = omc.sendCommand("translateModel({0}{1})".format(className, getSimulationArguments(metaDataJson)))
+    if not translated:
+      return "{0}\n{1}".format(failed, omc.errorString).rstrip(), {}
+    jobs.setProgress("Compiling", 0.2)
+    logFile = "{0}.compile.log".format(prefix)
+    with metrics.phase("compile"):
+      returnCode = omc.sendCommand("system(\"make -j{0} -f \\\"{1}.makefile\\\"\", \"{2}\")".format(len(cores), prefix, logFile))
+  executable = getExecutable(uploadDirectory, prefix)
+  if returnCode != 0 or not executable:
+    try:
+      with open(os.path.join(uploadDirectory, logFile), errors="replace") as file:
+        output = file.read()
+    except OSError:
+      output = omc.errorString
+    return "{0}\n{1}".format(failed, output).rstrip(), {}
+  defaults = getSimulationDefaults(omc, className)
+  if defaults is None:
+    return "{0}\n{1}".format(failed, omc.errorString).rstrip(), {}
+  return "", {"prefix": prefix, "executable": executable, "defaults": defaults}
+
+@jobs.jobType("batch")
+def runBatchJob(job):
+  """Builds the model once, or takes it from the compiled model cache, and simulates all variants."""
+  uploadDirectory = job.payload["uploadDirectory"]
+  metaDataJson = job.payload["metaDataJson"]
+  compiledModelCache = getCompiledModelCache()
+  compiledModelKey = getCompiledModelKey(metaDataJson, job.payload["sourcesHash"], getOMCVersion())
+  with compiledModelCache.open(compiledModelKey) if compiledModelCache else nullcontext() as entryDirectory:
+    metadata = compiledModelCache.metadata(compiledModelKey) if entryDirectory else None
+    if not metadata:
+      messages, metadata = runWithSession(buildSimulationExecutable, uploadDirectory, metaDataJson)
+      if not metadata:
+        return {"messages": messages, "fileName": "", "runs": []}
+      entryDirectory = uploadDirectory
+      if compiledModelCache:
+        try:
+          storeCompiledModel(compiledModelCache, compiledModelKey, uploadDirectory, metadata["prefix"], metadata["defaults"])
+        except OSError as ex:
+          log.warning("Failed to cache the compiled model {0}: {1}".format(metaDataJson["class"], str(ex)))
+    workers = current_app.config['BATCH_WORKERS'] or len(getCPUScheduler().cores)
+    runs = runVariants(entryDirectory, metadata, uploadDirectory, metaDataJson, job.payload["variants"], workers, getCPUScheduler())
+  failed = len([run for run in runs if run["status"] != "finished"])
+  return {"messages": "Simulated {0} variants, {1} failed.".format(len(runs), failed), "fileName": "", "runs": runs}
+
+def jobJson(job):
+  """Returns the job status with the links to poll it and get its result."""
+  jobJson = job.toJson()
+  jobJson["links"] = {
+    "status": flask.url_for('api.job_status', jobId=job.id, _external=True),
+    "result": flask.url_for('api.job_result', jobId=job.id, _external=True),
+    "events": flask.url_for('api.job_events', jobId=job.id, _external=True)
+  }
+  return jobJson
+
+def getEventVariables(variables):
+  """Returns the variable names of the comma separated Variables argument of the event stream."""
+  return [name.strip() for name in (variables or "").split(",") if name.strip()]
+
+def submitSimulationJob(metaDataJsonFileArg, modelZipFileArg):
+  """Saves the uploaded files and queues the simulation. Returns the job or None and the error messages."""
+  timings = metrics.Timings()
+  with metrics.collectTimings(timings):
+    status, uploadDirectory, messages, metaDataJson, sourcesHash = readMetaDataAndZipFile(metaDataJsonFileArg, modelZipFileArg)
+  if not status:
+    return None, messages
+  payload = {"uploadDirectory": uploadDirectory, "metaDataJson": metaDataJson, "sourcesHash": sourcesHash}
+  return submitJob("simulate", payload, timings), ""
+
+def submitJob(kind, payload, timings):
+  """Queues the job. Removes the upload directory of the payload if the job queue is full."""
+  try:
+    return getJobManager().submit(kind, payload, timings)
+  except jobs.JobQueueFull:
+    shutil.rmtree(payload["uploadDirectory"], ignore_errors=True)
+    raise
+
+def setModelInstanceJson(messages, data, inline=False):
+  """Returns the messages and the model instance json bytes, embedded if inline, small enough and a json object or else as a download url."""
+  if inline and data and isInlineSize(len(data)):
+    try:
+      return flask.Response(util.embedJson({"messages": messages, "file": ""}, "instance", data), mimetype="application/json")
+    except ValueError:
+      log.warning("The model instance is not a json object, sending it as a file.")
+  return setResultJson(messages, writeModelInstanceJson(data) if data else "")
+
+def writeModelInstanceJson(data):
+  """Writes the model instance json bytes to TMPDIR. Returns the file name relative to TMPDIR."""
+  fileHandle, modelInstanceJsonFilePath = tempfile.mkstemp(dir=current_app.config['TMPDIR'], suffix=".json", prefix="modelInstanceJson-")
+  try:
+    os.write(fileHandle, data)
+  finally:
+    os.close(fileHandle)
+  return os.path.basename(modelInstanceJsonFilePath)
+
+def instantiateModel(omc, uploadDirectory, metaDataJson, prettyPrint, modelInstanceKey=None):
+  """Gets the model instance. Returns the messages and the json bytes.
+
+  If modelInstanceKey is given the json is stored in the model instance cache.
+  """
+  data = b""
+
+  # get the model instance
+  className = metaDataJson.get("class", "")
+  if className:
+    modelInstanceJson = omc.sendCommand("getModelInstance({0}, {1})".format(className, util.pythonBoolToModelicaBool(prettyPrint)))
+    data = modelInstanceJson.encode()
+    messages = "Model instance json is created."
+    if modelInstanceKey and modelInstanceJson:
+      getModelInstanceCache().put(modelInstanceKey, data, getLibraries(metaDataJson))
+  else:
+    messages = "Class is missing."
+
+  return messages, data
 
 @api.errorhandler
 def defaultErrorHandler(error):
@@ -121,9 +579,8 @@ class Version(Resource):
 
   def get(self):
     """Gets the OpenModelica version"""
-    omc = OMC()
-    version = omc.sendCommand("getVersion()")
-    omc.sendCommand("quit()")
+    with getSessionPool().session() as omc:
+      version = omc.sendCommand("getVersion()")
     return jsonify({"version": version})
 
 @api.route("/simulate")
@@ -133,6 +590,7 @@ class Simulate(Resource):
   parser = reqparse.RequestParser()
   parser.add_argument("MetadataJson", location = "files", type = FileStorage, required = True, help = "JSON file with simulation data information")
   parser.add_argument("ModelZip", location = "files", type = FileStorage, help = "Zip file containing the extra Modelica files needed for simulation")
+  parser.add_argument("Inline", location = "form", type = inputs.boolean, default = False, help = "Send a result file up to INLINE_MAX_SIZE in a multipart/mixed response")
 
   @api.expect(parser)
   def post(self):
@@ -141,96 +599,261 @@ class Simulate(Resource):
     metaDataJsonFileArg = args["MetadataJson"]
     modelZipFileArg = args["ModelZip"]
 
-    omc = OMC()
-    originalDir = omc.sendCommand("cd()")
-    metaDataJson = {}
-    file = ""
+    job, messages = submitSimulationJob(metaDataJsonFileArg, modelZipFileArg)
+    if not job:
+      return setResultJson(messages, "")
+
+    if flask.request.environ.get("omwebservice.deferJobWait"):
+      # the ASGI adapter waits for the job on its event loop, then gets the response from JobResult
+      response = flask.Response(status=202)
+      response.headers["X-OMWebService-Wait-Job"] = job.id
+      response.headers["X-OMWebService-Inline"] = "1" if args["Inline"] else "0"
+      return response
+    job.wait()
+    return getSimulateResponse(job, args["Inline"])
+
+def getSimulateResponse(job, inline):
+  """Returns the response of a synchronous simulation whose job is done."""
+  if job.exception:
+    raise job.exception
+  return setJobResultJson(job.result, job.timings, inline)
+
+@api.route("/jobs/simulate")
+class SimulateJob(Resource):
+  """End point to simulate a model in the background"""
+
+  parser = Simulate.parser.copy().remove_argument("Inline")
 
-    status, uploadDirectory, messages, metaDataJson = readMetaDataAndZipFile(omc, metaDataJsonFileArg, modelZipFileArg)
+  @api.expect(parser)
+  def post(self):
+    """Queues the simulation and returns the job to poll."""
+    args = self.parser.parse_args()
+    job, messages = submitSimulationJob(args["MetadataJson"], args["ModelZip"])
+    if not job:
+      return {"message": messages}, 400
+    return jobJson(job), 202
+
+@api.route("/jobs/batch")
+class BatchJob(Resource):
+  """End point to simulate parameter variants of a model in the background"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("MetadataJson", location = "files", type = FileStorage, required = True, help = "JSON file with simulation data information")
+  parser.add_argument("ModelZip", location = "files", type = FileStorage, help = "Zip file containing the extra Modelica files needed for simulation")
+  parser.add_argument("VariantsJson", location = "files", type = FileStorage, required = True, help = "JSON file with a list of variants and/or a grid of values")
+
+  @api.expect(parser)
+  def post(self):
+    """Builds the model once and simulates every variant. Returns the job to poll."""
+    args = self.parser.parse_args()
+    try:
+      variants = getVariants(json.load(args["VariantsJson"].stream), current_app.config['BATCH_MAX_VARIANTS'])
+    except ValueError as ex:
+      return {"message": "Invalid variants json. {0}".format(str(ex))}, 400
+    timings = metrics.Timings()
+    with metrics.collectTimings(timings):
+      status, uploadDirectory, messages, metaDataJson, sourcesHash = readMetaDataAndZipFile(args["MetadataJson"], args["ModelZip"])
     if not status:
-      return setResultJsonAndQuitOMC(omc, originalDir, messages, file)
-
-    # simulate the model
-    className = metaDataJson.get("class", "")
-    if className:
-      simulationArguments = []
-      if "fileNamePrefix" in metaDataJson:
-        simulationArguments.append("fileNamePrefix=\"{0}\"".format(metaDataJson["fileNamePrefix"]))
-
-      outputFormat = metaDataJson.get("outputFormat", "mat")
-      if outputFormat.casefold() == "fmu":
-        if "fmuVersion" in metaDataJson:
-          simulationArguments.append("version={0}".format(metaDataJson["fmuVersion"]))
-        if "fmuType" in metaDataJson:
-          simulationArguments.append("fmuType={0}".format(metaDataJson["fmuType"]))
-        if "platforms" in metaDataJson:
-          platforms = []
-          platformsJson = metaDataJson.get("platforms", [])
-          for platform in platformsJson:
-            platforms.append("\"{0}\"".format(platform))
-          simulationArguments.append("platforms={{{0}}}".format(", ".join(platforms)))
-        if "includeResources" in metaDataJson:
-          simulationArguments.append("includeResources={0}".format(metaDataJson["includeResources"]))
-      else:
-        if "startTime" in metaDataJson:
-          simulationArguments.append("startTime={0}".format(metaDataJson["startTime"]))
-        if "stopTime" in metaDataJson:
-          simulationArguments.append("stopTime={0}".format(metaDataJson["stopTime"]))
-        if "numberOfIntervals" in metaDataJson:
-          simulationArguments.append("numberOfIntervals={0}".format(metaDataJson["numberOfIntervals"]))
-        if "tolerance" in metaDataJson:
-          simulationArguments.append("tolerance={0}".format(metaDataJson["tolerance"]))
-        if "method" in metaDataJson:
-          simulationArguments.append("method=\"{0}\"".format(metaDataJson["method"]))
-        if "options" in metaDataJson:
-          simulationArguments.append("options=\"{0}\"".format(metaDataJson["options"]))
-        if outputFormat.casefold() == "mat" or outputFormat.casefold() == "csv":
-          simulationArguments.append("outputFormat=\"{0}\"".format(outputFormat))
-        if "variableFilter" in metaDataJson:
-          simulationArguments.append("variableFilter=\"{0}\"".format(metaDataJson["variableFilter"]))
-        if "cflags" in metaDataJson:
-          simulationArguments.append("cflags=\"{0}\"".format(metaDataJson["cflags"]))
-        if "simflags" in metaDataJson:
-          simulationArguments.append("simflags=\"{0}\"".format(metaDataJson["simflags"]))
-
-      simulationArgumentsStr = ", ".join(simulationArguments)
-      if simulationArgumentsStr:
-        simulationArgumentsStr = ", " + simulationArgumentsStr
-
-      if outputFormat.casefold() == "fmu":
-        simulationResult = omc.sendCommand("buildModelFMU({0}{1})".format(className, simulationArgumentsStr))
-        if simulationResult:
-          messages = "FMU is generated."
-          file = flask.url_for('api.download', FileName="{0}/{1}".format(os.path.basename(uploadDirectory), os.path.basename(simulationResult)), _external=True)
-        else:
-          messages = "Failed to generate the FMU. {0}".format(omc.errorString)
-          file = ""
-      else:
-        simulationResult = omc.sendCommand("simulate({0}{1})".format(className, simulationArgumentsStr))
-        messages = simulationResult["messages"]
-        if simulationResult["resultFile"]:
-          file = flask.url_for('api.download', FileName="{0}/{1}".format(os.path.basename(uploadDirectory), os.path.basename(simulationResult["resultFile"])), _external=True)
-        else:
-          file = ""
+      return {"message": messages}, 400
+    if not metaDataJson.get("class", "") or metaDataJson.get("outputFormat", "mat").casefold() == "fmu":
+      return {"message": "Batch simulations need a class and a mat or csv outputFormat."}, 400
+    job = submitJob("batch", {"uploadDirectory": uploadDirectory, "metaDataJson": metaDataJson,
+                                           "sourcesHash": sourcesHash, "variants": variants}, timings)
+    return jobJson(job), 202
+
+@api.route("/jobs/<string:jobId>", endpoint="job_status")
+class JobStatus(Resource):
+  """End point to poll a background job"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("Wait", location = "args", type = float, default = 0, help = "Seconds to wait for the job to finish before answering, at most JOB_MAX_WAIT")
+
+  @api.expect(parser)
+  def get(self, jobId):
+    """Gets the status and progress of the job."""
+    args = self.parser.parse_args()
+    job = getJobManager().get(jobId)
+    if not job:
+      return {"message": "Job {0} not found.".format(jobId)}, 404
+    if args["Wait"] > 0:
+      job.wait(min(args["Wait"], current_app.config['JOB_MAX_WAIT']))
+    return jobJson(job)
+
+  def delete(self, jobId):
+    """Cancels the job. A queued job is not run, a running simulation is killed."""
+    job = getJobManager().get(jobId)
+    if not job:
+      return {"message": "Job {0} not found.".format(jobId)}, 404
+    if not job.cancel():
+      return {"message": "Job {0} is already {1}.".format(jobId, job.status)}, 409
+    return jobJson(job), 202
+
+@api.route("/jobs/<string:jobId>/events", endpoint="job_events")
+class JobEvents(Resource):
+  """End point to follow a background job as server-sent events"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("Variables", location = "args", default = "", help = "Comma separated variables to stream as rows while the simulation writes its result file")
+
+  @api.expect(parser)
+  def get(self, jobId):
+    """Streams the progress, log and cancel events of the job, the new rows of the variables and finally its status."""
+    args = self.parser.parse_args()
+    job = getJobManager().get(jobId)
+    if not job:
+      return {"message": "Job {0} not found.".format(jobId)}, 404
+    try:
+      lastEventId = int(flask.request.headers.get("Last-Event-ID", 0))
+    except ValueError:
+      lastEventId = 0
+    stream = EventStream(job, getEventVariables(args["Variables"]), lastEventId)
+    if stream.variables:
+      timeout = current_app.config['EVENT_STREAM_INTERVAL']
     else:
-      messages = "Class is missing."
-      file = ""
-    
-    return setResultJsonAndQuitOMC(omc, originalDir, messages, file)
+      timeout = current_app.config['EVENT_STREAM_HEARTBEAT']
+
+    def generate():
+      while not stream.finished:
+        messages = stream.poll(timeout)
+        yield "".join(messages) if messages else ": keepalive\n\n"
+
+    response = flask.Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@api.route("/jobs/<string:jobId>/result", endpoint="job_result")
+class JobResult(Resource):
+  """End point to get the result of a background job"""
+
+  def get(self, jobId):
+    """Gets the result of the job. Returns the job status with 202 while it is not finished."""
+    job = getJobManager().get(jobId)
+    if not job:
+      return {"message": "Job {0} not found.".format(jobId)}, 404
+    if not job.isDone():
+      return jobJson(job), 202
+    waitedJob = flask.request.environ.get("omwebservice.waitedJob")
+    if waitedJob and waitedJob[0] == jobId:
+      # the synchronous simulation the ASGI adapter waited for
+      return getSimulateResponse(job, waitedJob[1])
+    return setJobResultJson(job.result, job.timings)
+
+@api.route("/packages")
+class Packages(Resource):
+  """End point to upload a model zip file once and reference it by its hash"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("ModelZip", location = "files", type = FileStorage, required = True, help = "Zip file containing the Modelica files of the package")
+
+  @api.expect(parser)
+  def post(self):
+    """Stores the package. Returns its SHA-256 to put in the package field of the metadata json, with 201 if it is new."""
+    args = self.parser.parse_args()
+    if getPackageCache() is None:
+      return {"message": "Model packages are disabled."}, 404
+    if not allowedFile(args["ModelZip"].filename):
+      return {"message": "The package must be a zip file."}, 400
+    try:
+      with metrics.phase("upload"):
+        packageHash, created = storePackage(getPackageCache(), args["ModelZip"], current_app.config['TMPDIR'])
+    except zipfile.BadZipFile as ex:
+      return {"message": "The package is not a valid zip file. {0}".format(str(ex))}, 400
+    return {"package": packageHash}, 201 if created else 200
+
+@api.route("/packages/<string:packageHash>", endpoint="package")
+class Package(Resource):
+  """End point to check if a package is stored"""
+
+  def get(self, packageHash):
+    """Returns the hash of the package, or 404 if it is not stored and must be uploaded."""
+    if getPackageCache() is None or not getPackageCache().get(packageHash):
+      return {"message": "Package {0} not found.".format(packageHash)}, 404
+    return {"package": packageHash}
+
+@api.route("/libraries")
+class Libraries(Resource):
+  """End point to list and pre-install libraries"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("name", location = "form", required = True, help = "Name of the library to install")
+  parser.add_argument("version", location = "form", required = True, help = "Version of the library to install")
+
+  def get(self):
+    """Lists the installed libraries known to the service."""
+    return jsonify({"libraries": current_app.extensions["libraryIndex"].entries()})
+
+  @api.expect(parser)
+  def post(self):
+    """Installs a library so requests using it do not need the package manager."""
+    args = self.parser.parse_args()
+    name = args["name"]
+    version = args["version"]
+    libraryIndex = current_app.extensions["libraryIndex"]
+    libraryIndex.remove(name, version)
+    try:
+      with getSessionPool().session() as omc:
+        installLibrary(omc, name, version, libraryIndex)
+    except LibraryLoadError as ex:
+      return {"message": str(ex)}, 400
+    return jsonify({"libraries": libraryIndex.entries()})
 
 @api.route("/download/", doc=False)
 class Download(Resource):
-  """End point to download the svg file."""
+  """End point to download the result files."""
   parser = reqparse.RequestParser()
-  parser.add_argument("FileName", location = "args", required = True, help = "Path to download SVG file")
+  parser.add_argument("FileName", location = "args", required = True, help = "Path of the file relative to the download directory")
 
   @api.expect(parser)
   @api.produces(["application/octet-stream"])
   def get(self):
-    """Downloads the mat simulation result file."""
+    """Downloads a result file, supports Range, If-None-Match and If-Modified-Since requests."""
     args = self.parser.parse_args()
-    fileName = args["FileName"]
-    return flask.send_file(current_app.config['TMPDIR'] + "/" + fileName)
+    # send_from_directory keeps the path inside TMPDIR and answers range and conditional requests,
+    # the file body goes through the server's file wrapper (sendfile) or X-Sendfile if USE_X_SENDFILE is set
+    response = flask.send_from_directory(current_app.config['TMPDIR'], args["FileName"], conditional = True, etag = True,
+                                         max_age = current_app.config['DOWNLOAD_MAX_AGE'])
+    # only files that were found are touched
+    touchFile(safe_join(current_app.config['TMPDIR'], args["FileName"]))
+    return response
+
+@api.route("/results")
+class Results(Resource):
+  """End point to read variables from a simulation result file"""
+
+  parser = reqparse.RequestParser()
+  parser.add_argument("FileName", location = "args", required = True, help = "Path of the mat result file as in the download url")
+  parser.add_argument("Variables", location = "args", default = "", help = "Comma separated variable names or patterns like *.v, all variables if empty")
+  parser.add_argument("StartTime", location = "args", type = float, help = "Start of the time window")
+  parser.add_argument("StopTime", location = "args", type = float, help = "End of the time window")
+  parser.add_argument("Format", location = "args", choices = ("json", "npz"), default = "json", help = "json or npz with time, names and values arrays")
+  parser.add_argument("Downsample", location = "args", choices = tuple(downsamplers), help = "Downsampling method, minmax or lttb")
+  parser.add_argument("Points", location = "args", type = int, help = "Number of points per variable after downsampling")
+
+  @api.expect(parser)
+  def get(self):
+    """Gets the values of the selected variables without downloading the whole result file."""
+    args = self.parser.parse_args()
+    fileName = safe_join(current_app.config['TMPDIR'], args["FileName"])
+    if not fileName or not fileName.endswith(".mat"):
+      return {"message": "Invalid result file {0}.".format(args["FileName"])}, 400
+    patterns = [pattern.strip() for pattern in args["Variables"].split(",") if pattern.strip()]
+    try:
+      time, names, values = readVariables(fileName, patterns, args["StartTime"], args["StopTime"])
+    except ResultFileError as ex:
+      return {"message": str(ex)}, ex.code
+    touchFile(fileName)
+    if args["Downsample"]:
+      # each variable keeps different time points
+      points = max(args["Points"] or current_app.config['RESULT_DOWNSAMPLE_POINTS'], 3)
+      time, values = downsamplers[args["Downsample"]](time, values, points)
+    if args["Format"] == "npz":
+      buffer = io.BytesIO()
+      numpy.savez(buffer, time=time, names=numpy.array(names, dtype=str), values=values)
+      return flask.Response(buffer.getvalue(), mimetype="application/octet-stream")
+    if args["Downsample"]:
+      return jsonify({"variables": {name: {"time": time[index].tolist(), "values": values[index].tolist()} for index, name in enumerate(names)}})
+    return jsonify({"time": time.tolist(), "variables": {name: values[index].tolist() for index, name in enumerate(names)}})
 
 @api.route("/modelInstance")
 class ModelInstance(Resource):
@@ -240,6 +863,7 @@ class ModelInstance(Resource):
   parser.add_argument("MetadataJson", location = "files", type = FileStorage, required = True, help = "JSON file with simulation data information")
   parser.add_argument("ModelZip", location = "files", type = FileStorage, help = "Zip file containing the extra Modelica files needed for instantiation")
   parser.add_argument("PrettyPrint", location = "form", type = bool, default=False)
+  parser.add_argument("Inline", location = "form", type = inputs.boolean, default = False, help = "Embed a model instance up to INLINE_MAX_SIZE in the response")
 
   @api.expect(parser)
   def post(self):
@@ -249,28 +873,16 @@ class ModelInstance(Resource):
     modelZipFileArg = args["ModelZip"]
     prettyPrintArg = args["PrettyPrint"]
 
-    omc = OMC()
-    originalDir = omc.sendCommand("cd()")
-    metaDataJson = {}
-    file = ""
-
-    status, uploadDirectory, messages, metaDataJson = readMetaDataAndZipFile(omc, metaDataJsonFileArg, modelZipFileArg)
+    status, uploadDirectory, messages, metaDataJson, sourcesHash = readMetaDataAndZipFile(metaDataJsonFileArg, modelZipFileArg)
     if not status:
-      return setResultJsonAndQuitOMC(omc, originalDir, messages, file)
-
-    # simulate the model
-    className = metaDataJson.get("class", "")
-    if className:
-      modelInstanceJson = omc.sendCommand("getModelInstance({0}, {1})".format(className, util.pythonBoolToModelicaBool(prettyPrintArg)))
-      fileHandle, modelInstanceJsonFilePath = tempfile.mkstemp(dir=current_app.config['TMPDIR'], suffix=".json", prefix="modelInstanceJson-")
-      try:
-        os.write(fileHandle, modelInstanceJson.encode())
-      finally:
-        os.close(fileHandle)
-      messages = "Model instance json is created."
-      file = flask.url_for('api.download', FileName="{0}".format(os.path.basename(modelInstanceJsonFilePath)), _external=True)
-    else:
-      messages = "Class is missing."
-      file = ""
-
-    return setResultJsonAndQuitOMC(omc, originalDir, messages, file)
\ No newline at end of file
+      return setResultJson(messages, "")
+
+    modelInstanceKey = None
+    if getModelInstanceCache() is not None and metaDataJson.get("class", ""):
+      modelInstanceKey = getModelInstanceKey(metaDataJson, sourcesHash, prettyPrintArg, getOMCVersion())
+      modelInstanceJson = getModelInstanceCache().get(modelInstanceKey)
+      if modelInstanceJson is not None:
+        shutil.rmtree(uploadDirectory, ignore_errors=True)
+        return setModelInstanceJson("Model instance json is created.", modelInstanceJson, args["Inline"])
+    messages, data = runWithSession(instantiateModel, uploadDirectory, metaDataJson, prettyPrintArg, modelInstanceKey, interactive=True)
+    return setModelInstanceJson(messages, data, args["Inline"])
\ No newline at end of file
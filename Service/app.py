@@ -33,14 +33,64 @@ Web service application
 """
 
 import os
+import time
+import atexit
 import logging
-from flask import Flask, Blueprint
-from Service import api
+from flask import Flask, Blueprint, Response, current_app, g, request
+from werkzeug.utils import import_string
+from Service import api, metrics
+from Service.pool import OMCSessionPool
+from Service.libraries import LibraryIndex
+from Service.jobs import JobManager
+from Service.jobqueue import JobQueue, QueueJobManager
+from Service.cache import DirectoryCache
+from Service.instancecache import ModelInstanceCache
+from Service.janitor import Janitor
+from Service.scheduler import CPUScheduler
+from Service.admission import AdmissionController
+from Service.metadata import loadValidator
+from Service.replay import TraceWriter, ReplayOMC, recordingFactory
 
 log = logging.getLogger(__name__)
 
-def createApp():
-  """Create the Flask app."""
+def startRequestTimer():
+  g.requestStart = request.environ.get("omwebservice.requestStart", time.perf_counter())
+
+def observeRequest(response):
+  """Counts the request and observes its latency per endpoint.
+
+  The synchronous simulations the ASGI adapter waits for are counted once, when they are answered.
+  """
+  if "X-OMWebService-Wait-Job" in response.headers:
+    return response
+  endpoint, method = request.endpoint or "unknown", request.method
+  if request.environ.get("omwebservice.waitedJob"):
+    endpoint, method = "api.simulate", "POST"
+  metrics.httpRequests.inc(endpoint, method, str(response.status_code))
+  if "requestStart" in g:
+    metrics.httpRequestSeconds.observe(time.perf_counter() - g.requestStart, endpoint)
+  return response
+
+def getMetrics():
+  """Returns the metrics in the Prometheus text format."""
+  sessionPool = current_app.extensions["omcSessionPool"]
+  idle = len(sessionPool.idle)
+  metrics.omcSessions.set(idle, "idle")
+  metrics.omcSessions.set(sessionPool.size - idle, "active")
+  for status, count in current_app.extensions["jobManager"].countByStatus().items():
+    metrics.jobCount.set(count, status)
+  admissionController = current_app.extensions.get("admissionController")
+  if admissionController:
+    for lane in admissionController.lanes.values():
+      metrics.admissionRequests.set(lane.active, lane.name, "active")
+      metrics.admissionRequests.set(lane.waiting, lane.name, "waiting")
+  return Response(metrics.registry.expose(), mimetype="text/plain; version=0.0.4")
+
+def createApp(settings=None):
+  """Create the Flask app.
+
+  settings overrides the config values, e.g. to use another OMC_SESSION_FACTORY.
+  """
   app = Flask(__name__)
   blueprint = Blueprint("api", __name__, url_prefix="/api")
   api.api.init_app(blueprint)
@@ -52,9 +102,95 @@ def createApp():
   else:
     app.config.from_object('config.ProductionConfig')
     logging.basicConfig(level=logging.WARNING)
+  if settings:
+    app.config.update(settings)
 
   if not os.path.exists(app.config['TMPDIR']):
     os.makedirs(app.config['TMPDIR'])
+  if not os.path.exists(app.config['CACHE_DIR']):
+    os.makedirs(app.config['CACHE_DIR'])
+
+  app.extensions["metadataValidator"] = loadValidator()
+
+  libraryIndex = LibraryIndex(app.config['LIBRARY_INDEX_FILE'])
+  app.extensions["libraryIndex"] = libraryIndex
+  if app.config['OMC_REPLAY_TRACE_FILE']:
+    ReplayOMC.load(app.config['OMC_REPLAY_TRACE_FILE'], app.config['OMC_REPLAY_TIME_SCALE'])
+    sessionFactory = ReplayOMC
+  else:
+    sessionFactory = import_string(app.config['OMC_SESSION_FACTORY'])
+  if app.config['OMC_TRACE_FILE']:
+    traceWriter = TraceWriter(app.config['OMC_TRACE_FILE'])
+    atexit.register(traceWriter.close)
+    sessionFactory = recordingFactory(sessionFactory, traceWriter)
+  sessionPool = OMCSessionPool(sessionFactory,
+                               minSize=app.config['OMC_POOL_MIN_SIZE'],
+                               maxSize=app.config['OMC_POOL_MAX_SIZE'],
+                               maxUses=app.config['OMC_POOL_MAX_USES'],
+                               timeout=app.config['OMC_POOL_TIMEOUT'],
+                               healthCheckInterval=app.config['OMC_POOL_HEALTH_CHECK_INTERVAL'],
+                               prewarmLibraries=app.config['OMC_POOL_PREWARM_LIBRARIES'],
+                               libraryIndex=libraryIndex,
+                               reservedSessions=app.config['OMC_POOL_INTERACTIVE_SESSIONS'])
+  sessionPool.start()
+  atexit.register(sessionPool.close)
+  app.extensions["omcSessionPool"] = sessionPool
+
+  compiledModelCache = None
+  if app.config['COMPILED_MODEL_CACHE_SIZE']:
+    compiledModelCache = DirectoryCache(os.path.join(app.config['CACHE_DIR'], "models"), app.config['COMPILED_MODEL_CACHE_SIZE'])
+  app.extensions["compiledModelCache"] = compiledModelCache
+
+  fmuCache = None
+  if app.config['FMU_CACHE_SIZE']:
+    fmuCache = DirectoryCache(os.path.join(app.config['CACHE_DIR'], "fmus"), app.config['FMU_CACHE_SIZE'])
+  app.extensions["fmuCache"] = fmuCache
+
+  packageCache = None
+  if app.config['PACKAGE_CACHE_SIZE']:
+    packageCache = DirectoryCache(os.path.join(app.config['CACHE_DIR'], "packages"), app.config['PACKAGE_CACHE_SIZE'])
+  app.extensions["packageCache"] = packageCache
+
+  modelInstanceCache = None
+  if app.config['MODEL_INSTANCE_CACHE_MEMORY']:
+    directoryCache = None
+    if app.config['MODEL_INSTANCE_CACHE_SIZE']:
+      directoryCache = DirectoryCache(os.path.join(app.config['CACHE_DIR'], "instances"), app.config['MODEL_INSTANCE_CACHE_SIZE'])
+    modelInstanceCache = ModelInstanceCache(app.config['MODEL_INSTANCE_CACHE_MEMORY'], directoryCache)
+    libraryIndex.addListener(modelInstanceCache.invalidate)
+  app.extensions["modelInstanceCache"] = modelInstanceCache
+
+  app.extensions["cpuScheduler"] = CPUScheduler(cores=app.config['SCHEDULER_CORES'],
+                                                compileMaxCores=app.config['SCHEDULER_COMPILE_MAX_CORES'],
+                                                compileMaxShare=app.config['SCHEDULER_COMPILE_MAX_SHARE'],
+                                                pin=app.config['SCHEDULER_PIN_CPUS'])
+
+  if app.config['JOB_QUEUE_DATABASE']:
+    jobQueue = JobQueue(app.config['JOB_QUEUE_DATABASE'], leaseSeconds=app.config['JOB_QUEUE_LEASE'],
+                        maxAttempts=app.config['JOB_QUEUE_MAX_ATTEMPTS'])
+    app.extensions["jobQueue"] = jobQueue
+    jobManager = QueueJobManager(app, jobQueue, historySize=app.config['JOB_HISTORY_SIZE'],
+                                 queueSize=app.config['JOB_QUEUE_SIZE'], pollInterval=app.config['JOB_QUEUE_POLL_INTERVAL'])
+  else:
+    jobManager = JobManager(app, workers=app.config['JOB_WORKERS'], historySize=app.config['JOB_HISTORY_SIZE'],
+                            queueSize=app.config['JOB_QUEUE_SIZE'])
+  atexit.register(jobManager.shutdown)
+  app.extensions["jobManager"] = jobManager
+
+  if app.config['JANITOR_INTERVAL']:
+    janitor = Janitor(app, interval=app.config['JANITOR_INTERVAL'], ttl=app.config['TMPDIR_TTL'],
+                      quota=app.config['TMPDIR_QUOTA'], minAge=app.config['TMPDIR_MIN_AGE'])
+    janitor.start()
+    atexit.register(janitor.close)
+    app.extensions["janitor"] = janitor
+
+  if app.config['ADMISSION_LANES']:
+    AdmissionController(app.config['ADMISSION_LANES'], app.config['ADMISSION_ROUTES']).init_app(app)
+
+  if app.config['METRICS_ENABLED']:
+    app.before_request(startRequestTimer)
+    app.after_request(observeRequest)
+    app.add_url_rule("/metrics", "metrics", getMetrics)
 
   return app
 
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+ASGI serving mode. Runs the Flask app on a bounded thread pool without pinning a thread per connection.
+
+  uvicorn --factory Service.asgi:createAsgiApp --host 0.0.0.0 --port 8080
+
+The request handlers run on ASGI_EXTRA_THREADS more threads than OMC sessions, so requests
+wait for a thread without holding one. Response bodies like downloads are sent chunk by chunk
+from a small IO thread pool, and job status requests with a Wait argument wait on the event
+loop until the job finishes, as do synchronous simulations. Job event streams are polled from the event loop too, so a client
+following a long simulation holds no thread.
+"""
+
+import io
+import re
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+from urllib.parse import parse_qs, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.wsgi import FileWrapper
+from Service.app import createApp
+from Service.progress import EventStream
+from Service.api import getEventVariables
+
+log = logging.getLogger(__name__)
+
+jobStatusPattern = re.compile(r"^/api/jobs/(\w+)$")
+jobEventsPattern = re.compile(r"^/api/jobs/(\w+)/events$")
+FILE_CHUNK_SIZE = 256 * 1024
+
+class AsgiApp:
+  """Adapts the WSGI Flask app to ASGI."""
+
+  def __init__(self, app):
+    self.app = app
+    self.requestExecutor = ThreadPoolExecutor(max_workers=app.config['OMC_POOL_MAX_SIZE'] + app.config['ASGI_EXTRA_THREADS'],
+                                              thread_name_prefix="OMWebServiceRequest")
+    self.ioExecutor = ThreadPoolExecutor(max_workers=app.config['ASGI_IO_THREADS'], thread_name_prefix="OMWebServiceIO")
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] == "lifespan":
+      await self.lifespan(receive, send)
+    elif scope["type"] == "http":
+      await self.handleRequest(scope, receive, send)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message["type"] == "lifespan.startup":
+        await send({"type": "lifespan.startup.complete"})
+      elif message["type"] == "lifespan.shutdown":
+        self.close()
+        await send({"type": "lifespan.shutdown.complete"})
+        return
+
+  def close(self):
+    self.requestExecutor.shutdown(wait=False)
+    self.ioExecutor.shutdown(wait=False)
+    self.app.extensions["omcSessionPool"].close()
+    self.app.extensions["jobManager"].shutdown()
+
+  async def handleRequest(self, scope, receive, send):
+    loop = asyncio.get_running_loop()
+    body = tempfile.SpooledTemporaryFile(max_size=self.app.config['ASGI_SPOOL_SIZE'])
+    try:
+      more = True
+      while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+          return
+        if message.get("body"):
+          await loop.run_in_executor(self.ioExecutor, body.write, message["body"])
+        more = message.get("more_body", False)
+      body.seek(0)
+      if await self.streamJobEvents(scope, receive, send):
+        return
+      scope = await self.waitForJob(scope)
+      environ = self.getEnviron(scope, body)
+      environ["omwebservice.deferJobWait"] = True
+      requestStart = time.perf_counter()
+      status, headers, iterable, iterator, chunk = await loop.run_in_executor(self.requestExecutor, self.callApp, environ)
+      if any(name == b"x-omwebservice-wait-job" for name, _ in headers):
+        status, headers, iterable, iterator, chunk = await self.waitForSimulation(scope, headers, iterable, requestStart)
+      try:
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        while chunk is not None:
+          if chunk:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+          chunk = await loop.run_in_executor(self.ioExecutor, next, iterator, None)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+      finally:
+        if hasattr(iterable, "close"):
+          await loop.run_in_executor(self.ioExecutor, iterable.close)
+    finally:
+      body.close()
+
+  async def waitForJob(self, scope):
+    """Waits on the event loop for the job of a job status request with a Wait argument.
+
+    Returns the scope without the Wait argument, so the app answers at once, or the unchanged scope.
+    """
+    match = jobStatusPattern.match(scope["path"])
+    if scope["method"] != "GET" or not match:
+      return scope
+    query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    try:
+      wait = float(dict(query).get("Wait", "0"))
+    except ValueError:
+      return scope
+    job = self.app.extensions["jobManager"].get(match.group(1))
+    if wait <= 0 or job is None:
+      return scope
+    await self.waitForJobDone(job, min(wait, self.app.config['JOB_MAX_WAIT']))
+    query = [(name, value) for name, value in query if name != "Wait"]
+    return dict(scope, query_string=urlencode(query).encode("latin-1"))
+
+  async def waitForSimulation(self, scope, headers, iterable, requestStart):
+    """Waits on the event loop for the job of a synchronous simulation, then gets its response from the app.
+
+    The request thread is only used to queue the job and to answer once it is done. The answer is an
+    internal job result request, which admission control lets through and the metrics count as the
+    simulate request that started at requestStart.
+    """
+    loop = asyncio.get_running_loop()
+    headers = dict(headers)
+    jobId = headers[b"x-omwebservice-wait-job"].decode("latin-1")
+    inline = headers.get(b"x-omwebservice-inline") == b"1"
+    if hasattr(iterable, "close"):
+      await loop.run_in_executor(self.ioExecutor, iterable.close)
+    job = self.app.extensions["jobManager"].get(jobId)
+    if job is not None:
+      await self.waitForJobDone(job)
+    resultScope = dict(scope, method="GET", path="/api/jobs/{0}/result".format(jobId), query_string=b"",
+                       headers=[(name, value) for name, value in scope.get("headers", []) if name not in (b"content-type", b"content-length")])
+    environ = self.getEnviron(resultScope, io.BytesIO())
+    environ["omwebservice.waitedJob"] = (jobId, inline)
+    environ["omwebservice.requestStart"] = requestStart
+    return await loop.run_in_executor(self.requestExecutor, self.callApp, environ)
+
+  async def waitForJobDone(self, job, timeout=None):
+    """Waits on the event loop until the job is done or timeout seconds passed."""
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def setDone(job):
+      try:
+        loop.call_soon_threadsafe(lambda: done.done() or done.set_result(True))
+      except RuntimeError:
+        # the event loop was closed while waiting
+        pass
+
+    job.addDoneCallback(setDone)
+    try:
+      await asyncio.wait_for(done, timeout)
+    except asyncio.TimeoutError:
+      pass
+
+  async def streamJobEvents(self, scope, receive, send):
+    """Sends the events of a job event stream request from the event loop. Returns False for other requests."""
+    match = jobEventsPattern.match(scope["path"])
+    if scope["method"] != "GET" or not match:
+      return False
+    job = self.app.extensions["jobManager"].get(match.group(1))
+    if job is None:
+      # the app answers 404
+      return False
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    headers = dict((name.decode("latin-1").lower(), value.decode("latin-1")) for name, value in scope.get("headers", []))
+    try:
+      lastEventId = int(headers.get("last-event-id", 0))
+    except ValueError:
+      lastEventId = 0
+    stream = EventStream(job, getEventVariables(query.get("Variables", [""])[0]), lastEventId)
+    interval = self.app.config['EVENT_STREAM_INTERVAL']
+    heartbeat = self.app.config['EVENT_STREAM_HEARTBEAT']
+    loop = asyncio.get_running_loop()
+    disconnected = asyncio.ensure_future(receive())
+    try:
+      await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+      lastSent = loop.time()
+      while not stream.finished and not disconnected.done():
+        messages = await loop.run_in_executor(self.ioExecutor, stream.poll, 0)
+        if messages:
+          await send({"type": "http.response.body", "body": "".join(messages).encode("utf-8"), "more_body": True})
+          lastSent = loop.time()
+        elif loop.time() - lastSent >= heartbeat:
+          await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+          lastSent = loop.time()
+        if not stream.finished:
+          await asyncio.wait({disconnected}, timeout=interval)
+      await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+      disconnected.cancel()
+    return True
+
+  def callApp(self, environ):
+    """Calls the WSGI app and gets the first chunk of the body so start_response was called."""
+    response = {}
+
+    def startResponse(status, headers, excInfo=None):
+      response["status"] = int(status.split(" ", 1)[0])
+      response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    iterable = self.app(environ, startResponse)
+    iterator = iter(iterable)
+    chunk = next(iterator, None)
+    return response["status"], response["headers"], iterable, iterator, chunk if chunk is not None else b""
+
+  def getEnviron(self, scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+      "REQUEST_METHOD": scope["method"],
+      "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+      "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+      "QUERY_STRING": scope["query_string"].decode("latin-1"),
+      "SERVER_NAME": server[0],
+      "SERVER_PORT": str(server[1]),
+      "SERVER_PROTOCOL": "HTTP/{0}".format(scope.get("http_version", "1.1")),
+      "REMOTE_ADDR": client[0],
+      "wsgi.version": (1, 0),
+      "wsgi.url_scheme": scope.get("scheme", "http"),
+      "wsgi.input": body,
+      "wsgi.errors": sys.stderr,
+      "wsgi.multithread": True,
+      "wsgi.multiprocess": False,
+      "wsgi.run_once": False,
+      # larger blocks than the default so a download needs fewer IO thread hops
+      "wsgi.file_wrapper": lambda file, blockSize=FILE_CHUNK_SIZE: FileWrapper(file, max(blockSize, FILE_CHUNK_SIZE))
+    }
+    for name, value in scope.get("headers", []):
+      name = name.decode("latin-1").upper().replace("-", "_")
+      value = value.decode("latin-1")
+      if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+        name = "HTTP_" + name
+      environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+def createAsgiApp(settings=None):
+  """Creates the ASGI app, e.g. for uvicorn --factory."""
+  return AsgiApp(createApp(settings))
+
+def main():
+  """Serves the app with uvicorn in one process, the OMC sessions and jobs live in the process."""
+  import uvicorn
+  uvicorn.run(createAsgiApp(), host="0.0.0.0", port=8080, lifespan="on")
+
+if __name__ == "__main__":
+  main()
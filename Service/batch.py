@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Batch simulation module. Runs parameter variants of one compiled model in parallel.
+"""
+
+import os
+import re
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from Service import jobs, metrics
+from Service.compiledmodel import RUNTIME_KEYS, runCompiledModel
+
+log = logging.getLogger(__name__)
+
+variableNameRegex = re.compile(r"^[A-Za-z_$][\w$.\[\]']*$")
+
+def getVariants(variantsJson, maxVariants):
+  """Returns the list of variants described by the variants json.
+
+  The json is either a list of variants or an object with a "variants" list
+  and/or a "grid" object mapping names to lists of values whose cartesian
+  product is added. A variant maps runtime metadata keys (startTime, stopTime,
+  numberOfIntervals, tolerance, method) or model variables to values.
+  Raises ValueError if the json is invalid.
+  """
+  if isinstance(variantsJson, list):
+    variantsJson = {"variants": variantsJson}
+  if not isinstance(variantsJson, dict):
+    raise ValueError("The variants json must be a list or an object.")
+  variants = list(variantsJson.get("variants", []))
+  grid = variantsJson.get("grid", {})
+  if not isinstance(grid, dict) or not all(isinstance(values, list) for values in grid.values()):
+    raise ValueError("The grid must map names to lists of values.")
+  names = sorted(grid)
+  for values in itertools.product(*(grid[name] for name in names)):
+    variants.append(dict(zip(names, values)))
+  if not variants:
+    raise ValueError("No variants are given.")
+  if len(variants) > maxVariants:
+    raise ValueError("Too many variants {0}, at most {1} are allowed.".format(len(variants), maxVariants))
+  for variant in variants:
+    if not isinstance(variant, dict):
+      raise ValueError("A variant must be an object, got {0}.".format(variant))
+    for name, value in variant.items():
+      if not variableNameRegex.match(name):
+        raise ValueError("Invalid variable name {0}.".format(name))
+      if not isinstance(value, (bool, int, float, str)) or "," in str(value):
+        raise ValueError("Invalid value {0} for {1}.".format(value, name))
+  return variants
+
+def runVariant(entryDirectory, metadata, uploadDirectory, metaDataJson, index, variant, scheduler=None):
+  """Runs one variant in its own directory on a core reserved from the scheduler. Returns the run status."""
+  runDirectory = os.path.join(uploadDirectory, "run{0}".format(index))
+  os.makedirs(runDirectory, exist_ok=True)
+  runMetaDataJson = dict(metaDataJson)
+  overrides = {}
+  for name, value in variant.items():
+    if name in RUNTIME_KEYS:
+      runMetaDataJson[name] = value
+    else:
+      overrides[name] = value
+  run = {"index": index, "variant": variant, "fileName": ""}
+  try:
+    with scheduler.reserveSimulate() if scheduler else nullcontext() as cores, metrics.phase("simulation"):
+      cores = cores if scheduler and scheduler.pin else None
+      returnCode, run["messages"], resultFile = runCompiledModel(entryDirectory, metadata, runDirectory, runMetaDataJson, overrides, cores,
+                                                                 inputDirectory=uploadDirectory)
+  except OSError as ex:
+    returnCode, run["messages"], resultFile = -1, str(ex), ""
+  if returnCode == 0 and os.path.exists(resultFile):
+    run["status"] = "finished"
+    run["fileName"] = "{0}/{1}/{2}".format(os.path.basename(uploadDirectory), os.path.basename(runDirectory), os.path.basename(resultFile))
+  else:
+    run["status"] = "failed"
+  return run
+
+def runVariants(entryDirectory, metadata, uploadDirectory, metaDataJson, variants, workers, scheduler=None):
+  """Runs the variants in parallel, each simulation executable in its own process. Returns the runs in order."""
+  runs = [None] * len(variants)
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = {executor.submit(runVariant, entryDirectory, metadata, uploadDirectory, metaDataJson, index, variant, scheduler): index
+               for index, variant in enumerate(variants)}
+    finished = 0
+    for future in as_completed(futures):
+      runs[futures[future]] = future.result()
+      finished += 1
+      jobs.setProgress("Simulated {0} of {1} variants".format(finished, len(variants)), 0.2 + 0.8 * finished / len(variants))
+  return runs
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Content addressed cache module. Keeps artifact directories under a disk quota.
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+METADATA_FILE_NAME = "entry.json"
+
+def getDirectorySize(path):
+  """Returns the total size of the files in the directory tree."""
+  size = 0
+  for root, _, fileNames in os.walk(path):
+    for fileName in fileNames:
+      try:
+        size += os.lstat(os.path.join(root, fileName)).st_size
+      except OSError:
+        pass
+  return size
+
+class DirectoryCache:
+  """LRU cache of directories keyed by content hashes.
+
+  Entries are directories root/<key> holding the artifacts and an entry.json
+  with the metadata given when the entry was stored. The least recently used
+  entries are removed when the total size exceeds maxBytes. Entries opened with
+  open() are not removed while they are in use.
+  """
+
+  def __init__(self, root, maxBytes):
+    self.root = root
+    self.maxBytes = maxBytes
+    self.lock = threading.Lock()
+    self.entries = {}
+    self.users = {}
+    os.makedirs(root, exist_ok=True)
+    for key in os.listdir(root):
+      path = os.path.join(root, key)
+      if key.startswith("."):
+        shutil.rmtree(path, ignore_errors=True)
+      elif os.path.isdir(path):
+        self.entries[key] = {"size": getDirectorySize(path), "lastUsed": os.stat(path).st_mtime}
+
+  def get(self, key):
+    """Returns the directory of the entry or None. Marks the entry as used."""
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      entry["lastUsed"] = time.time()
+    path = os.path.join(self.root, key)
+    try:
+      os.utime(path)
+    except OSError:
+      with self.lock:
+        self.entries.pop(key, None)
+      return None
+    return path
+
+  @contextmanager
+  def open(self, key):
+    """Context manager returning the entry directory or None, keeping the entry while it is used."""
+    with self.lock:
+      self.users[key] = self.users.get(key, 0) + 1
+    try:
+      yield self.get(key)
+    finally:
+      with self.lock:
+        self.users[key] -= 1
+        if not self.users[key]:
+          del self.users[key]
+
+  def put(self, key, populate, metadata=None):
+    """Stores an entry. populate is called with a new directory to fill. Returns the entry directory."""
+    temporaryDirectory = tempfile.mkdtemp(dir=self.root, prefix=".")
+    try:
+      populate(temporaryDirectory)
+      if metadata is not None:
+        with open(os.path.join(temporaryDirectory, METADATA_FILE_NAME), "w") as metadataFile:
+          json.dump(metadata, metadataFile)
+      size = getDirectorySize(temporaryDirectory)
+      path = os.path.join(self.root, key)
+      with self.lock:
+        if key in self.entries:
+          shutil.rmtree(temporaryDirectory, ignore_errors=True)
+          return path
+        os.rename(temporaryDirectory, path)
+        self.entries[key] = {"size": size, "lastUsed": time.time()}
+        evicted = self._evict(key)
+    except BaseException:
+      shutil.rmtree(temporaryDirectory, ignore_errors=True)
+      raise
+    for evictedPath in evicted:
+      shutil.rmtree(evictedPath, ignore_errors=True)
+    return path
+
+  def metadata(self, key):
+    """Returns the metadata stored with the entry or None."""
+    try:
+      with open(os.path.join(self.root, key, METADATA_FILE_NAME)) as metadataFile:
+        return json.load(metadataFile)
+    except (OSError, ValueError):
+      return None
+
+  def remove(self, key):
+    with self.lock:
+      if self.entries.pop(key, None) is None:
+        return
+    shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+  def keys(self):
+    with self.lock:
+      return list(self.entries)
+
+  def size(self):
+    with self.lock:
+      return sum(entry["size"] for entry in self.entries.values())
+
+  def _evict(self, keep):
+    """Removes the least recently used entries from the index until the cache fits. Returns their paths."""
+    total = sum(entry["size"] for entry in self.entries.values())
+    evicted = []
+    for key in sorted(self.entries, key=lambda key: self.entries[key]["lastUsed"]):
+      if total <= self.maxBytes:
+        break
+      if key == keep or key in self.users:
+        continue
+      total -= self.entries.pop(key)["size"]
+      evicted.append(os.path.join(self.root, key))
+    if evicted:
+      log.debug("Evicted {0} cache entries from {1}.".format(len(evicted), self.root))
+    return evicted
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Compiled model module. Stores simulation executables and runs them with new runtime parameters.
+"""
+
+import os
+import shlex
+import shutil
+import logging
+import subprocess
+from Service import util, jobs
+from Service.fmu import copyFile
+from Service.progress import ProgressMonitor
+from Service.scheduler import setAffinity
+
+log = logging.getLogger(__name__)
+
+# metadata keys that only change the runtime flags of the simulation executable
+RUNTIME_KEYS = ("startTime", "stopTime", "numberOfIntervals", "tolerance", "method", "simflags")
+# metadata keys naming the model files, whose contents are covered by the sources hash
+SOURCE_KEYS = ("package",)
+# generated files that are not needed to run the simulation executable
+BUILD_SUFFIXES = (".c", ".h", ".o", ".makefile", ".log", ".libs")
+
+def getFileNamePrefix(metaDataJson):
+  return metaDataJson.get("fileNamePrefix", metaDataJson.get("class", ""))
+
+def getCompiledModelKey(metaDataJson, sourcesHash, omcVersion):
+  """Returns the cache key of everything that goes into the simulation executable."""
+  buildInputs = {key: value for key, value in metaDataJson.items() if key not in RUNTIME_KEYS + SOURCE_KEYS}
+  buildInputs["libs"] = sorted([lib.get("name", ""), lib.get("version", "")] for lib in metaDataJson.get("libs", []))
+  buildInputs["sourcesHash"] = sourcesHash
+  buildInputs["omcVersion"] = omcVersion
+  return util.hashJson(buildInputs)
+
+def isBuildProduct(fileName, prefix):
+  """Returns True if the file is generated for the prefix and needed to run the executable."""
+  if fileName != prefix and not fileName.startswith(prefix + "_") and not fileName.startswith(prefix + "."):
+    return False
+  if "_res." in fileName:
+    return False
+  return not fileName.endswith(BUILD_SUFFIXES)
+
+def getExecutable(directory, prefix):
+  for fileName in (prefix, prefix + ".exe"):
+    if os.path.isfile(os.path.join(directory, fileName)):
+      return fileName
+  return None
+
+def storeCompiledModel(cache, key, buildDirectory, prefix, defaults):
+  """Copies the simulation executable and its files from the build directory to the cache.
+
+  defaults are the experiment values used when a request does not set them.
+  Returns False if the build directory has no executable.
+  """
+  executable = getExecutable(buildDirectory, prefix)
+  if not executable:
+    return False
+  def populate(entryDirectory):
+    for fileName in os.listdir(buildDirectory):
+      if isBuildProduct(fileName, prefix):
+        shutil.copy2(os.path.join(buildDirectory, fileName), entryDirectory)
+  cache.put(key, populate, {"prefix": prefix, "executable": executable, "defaults": defaults})
+  return True
+
+def formatOverrideValue(value):
+  if isinstance(value, bool):
+    return util.pythonBoolToModelicaBool(value)
+  if isinstance(value, float):
+    return repr(value)
+  return str(value)
+
+def getRuntimeFlags(metaDataJson, defaults, overrides=None):
+  """Returns the simulation executable flags for the runtime values of the metadata.
+
+  overrides maps further variable names to the values to start the simulation with.
+  """
+  startTime = float(metaDataJson.get("startTime", defaults.get("startTime", 0.0)))
+  stopTime = float(metaDataJson.get("stopTime", defaults.get("stopTime", 1.0)))
+  numberOfIntervals = int(metaDataJson.get("numberOfIntervals", defaults.get("numberOfIntervals", 500)))
+  tolerance = float(metaDataJson.get("tolerance", defaults.get("tolerance", 1e-6)))
+  stepSize = (stopTime - startTime) / max(numberOfIntervals, 1)
+  override = "startTime={0},stopTime={1},stepSize={2},tolerance={3}".format(repr(startTime), repr(stopTime), repr(stepSize), repr(tolerance))
+  for name, value in (overrides or {}).items():
+    override += ",{0}={1}".format(name, formatOverrideValue(value))
+  flags = ["-override={0}".format(override)]
+  # without a method the executable uses the solver of the experiment annotation
+  if "method" in metaDataJson:
+    flags.append("-s={0}".format(metaDataJson["method"]))
+  if "simflags" in metaDataJson:
+    flags.extend(shlex.split(metaDataJson["simflags"]))
+  return flags
+
+def linkInputFiles(entryDirectory, metadata, inputDirectory):
+  """Links the files the executable reads, e.g. the init xml, from the compiled model entry into the input directory."""
+  for fileName in os.listdir(entryDirectory):
+    target = os.path.join(inputDirectory, fileName)
+    if isBuildProduct(fileName, metadata["prefix"]) and fileName != metadata["executable"] and not os.path.exists(target):
+      copyFile(os.path.join(entryDirectory, fileName), target)
+
+def runCompiledModel(entryDirectory, metadata, outputDirectory, metaDataJson, overrides=None, cores=None, inputDirectory=None):
+  """Runs the cached simulation executable for the metadata. Returns the return code, output and result file.
+
+  inputDirectory, by default outputDirectory, holds the model files of the request. The executable reads
+  its input files and resolves the resources of the model there.
+  If cores is given the process is pinned to them. In a background job the output lines
+  are added as log events, the progress is followed in the result file and cancelling
+  the job kills the process.
+  """
+  inputDirectory = inputDirectory or outputDirectory
+  if os.path.normpath(inputDirectory) != os.path.normpath(entryDirectory):
+    linkInputFiles(entryDirectory, metadata, inputDirectory)
+  prefix = metadata["prefix"]
+  outputFormat = metaDataJson.get("outputFormat", "mat").casefold()
+  resultFile = os.path.join(outputDirectory, "{0}_res.{1}".format(prefix, outputFormat))
+  arguments = [os.path.join(entryDirectory, metadata["executable"]),
+               "-inputPath={0}".format(inputDirectory),
+               "-outputPath={0}".format(outputDirectory),
+               "-r={0}".format(resultFile)]
+  arguments.extend(getRuntimeFlags(metaDataJson, metadata["defaults"], overrides))
+  log.debug("Running compiled model: {0}".format(" ".join(arguments)))
+  job = jobs.getCurrentJob()
+  defaults = metadata["defaults"]
+  startTime = metaDataJson.get("startTime", defaults["startTime"])
+  stopTime = metaDataJson.get("stopTime", defaults["stopTime"])
+  lines = []
+  with subprocess.Popen(arguments, cwd=outputDirectory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True) as process, \
+       ProgressMonitor(job, resultFile, startTime, stopTime, onCancel=process.kill):
+    setAffinity(process.pid, cores)
+    for line in process.stdout:
+      lines.append(line)
+      if job is not None:
+        job.addEvent("log", line.rstrip("\n"))
+    process.wait()
+  return process.returncode, "".join(lines), resultFile
@@ -37,12 +37,89 @@ import tempfile
 class Config:
   """Base config."""
   TMPDIR = tempfile.gettempdir() + "/OMWebService"
+  CACHE_DIR = tempfile.gettempdir() + "/OMWebService-cache"
+  LIBRARY_INDEX_FILE = CACHE_DIR + "/libraries.json"
+  COMPILED_MODEL_CACHE_SIZE = 2 * 1024 * 1024 * 1024 # bytes of simulation executables to keep, 0 disables the cache
+  FMU_CACHE_SIZE = 1024 * 1024 * 1024 # bytes of built FMUs to keep, 0 disables the cache
+  PACKAGE_CACHE_SIZE = 1024 * 1024 * 1024 # bytes of extracted model packages to keep, 0 disables /api/packages
+  MODEL_INSTANCE_CACHE_MEMORY = 64 * 1024 * 1024 # bytes of model instance json to keep in memory, 0 disables the cache
+  MODEL_INSTANCE_CACHE_SIZE = 512 * 1024 * 1024 # bytes of model instance json to keep on disk, 0 keeps them only in memory
+  # OMC session pool
+  OMC_SESSION_FACTORY = "Service.omc.OMC"
+  OMC_POOL_MIN_SIZE = 1
+  OMC_POOL_MAX_SIZE = 4
+  OMC_POOL_MAX_USES = 50 # recycle a session after this many borrowers, 0 disables recycling
+  OMC_POOL_TIMEOUT = 120 # seconds to wait for a free session
+  OMC_POOL_HEALTH_CHECK_INTERVAL = 60 # check sessions idle for longer than this many seconds
+  OMC_POOL_PREWARM_LIBRARIES = [] # library sets, lists of (name, version), to load at start
+  OMC_POOL_INTERACTIVE_SESSIONS = 1 # sessions background jobs may not take, kept for version and modelInstance requests
+  OMC_TRACE_FILE = "" # records the expressions, results and wall times of all OMC sessions as json lines
+  OMC_REPLAY_TRACE_FILE = "" # answers the OMC expressions from this trace instead of running omc
+  OMC_REPLAY_TIME_SCALE = 1.0 # scales the recorded wall times waited by the replay, 0 answers at once
+  # background jobs
+  JOB_WORKERS = 4
+  JOB_HISTORY_SIZE = 1000 # number of jobs to remember
+  JOB_MAX_WAIT = 60 # longest wait in seconds of a job status request
+  JOB_QUEUE_SIZE = 100 # jobs waiting for a worker, more are rejected with 429, 0 does not limit the queue
+  # shared job queue, the API nodes queue the jobs and worker processes (Service/worker.py) run them;
+  # TMPDIR must then be shared by all nodes, it holds the uploads and the result files
+  JOB_QUEUE_DATABASE = "" # SQLite database of the job queue, empty runs the jobs in this process
+  JOB_QUEUE_LEASE = 60 # seconds a job stays with a worker that stopped renewing its lease before it is run again
+  JOB_QUEUE_HEARTBEAT = 1 # seconds between the lease renewals, which also send the progress and events of the job
+  JOB_QUEUE_MAX_ATTEMPTS = 3 # runs of a job whose workers were lost before it fails
+  JOB_QUEUE_POLL_INTERVAL = 0.5 # seconds between queue checks of an idle worker or an API node waiting for a job
+  EVENT_STREAM_INTERVAL = 0.5 # seconds between result rows sent on a job event stream
+  EVENT_STREAM_HEARTBEAT = 15 # seconds after which an idle job event stream sends a keepalive comment
+  # admission control, requests over the limit of their lane wait in its queue for up to timeout seconds,
+  # requests that do not fit are rejected with 429 and Retry-After, empty ADMISSION_LANES disables it
+  ADMISSION_LANES = {
+    "interactive": {"limit": 16, "queue": 32, "timeout": 10},
+    "simulation": {"limit": 8, "queue": 16, "timeout": 5},
+    "polling": {"limit": 64, "queue": 64, "timeout": 5},
+    "default": {"limit": 16, "queue": 32, "timeout": 10}
+  }
+  # lane of each endpoint, other endpoints use the default lane and endpoints of an unknown lane are not limited
+  ADMISSION_ROUTES = {
+    "api.version": "interactive",
+    "api.model_instance": "interactive",
+    "api.libraries": "interactive",
+    "api.simulate": "simulation",
+    "api.simulate_job": "simulation",
+    "api.batch_job": "simulation",
+    "api.job_status": "polling",
+    "api.job_result": "polling",
+    "api.job_events": "polling",
+    "api.packages": "simulation",
+    "api.package": "polling",
+    "api.results": "polling",
+    "api.download": "polling",
+    "metrics": None
+  }
+  SCHEDULER_CORES = 0 # cores used for compilation and simulation, 0 uses all cores of the process
+  SCHEDULER_COMPILE_MAX_CORES = 0 # parallel make jobs of one compilation when cores are idle, 0 allows all cores
+  SCHEDULER_COMPILE_MAX_SHARE = 0.75 # share of the cores all compilations may hold together
+  SCHEDULER_PIN_CPUS = False # pin omc and the simulation executables to the reserved cores
+  JANITOR_INTERVAL = 300 # seconds between the clean ups of TMPDIR, 0 disables them
+  TMPDIR_TTL = 24 * 60 * 60 # seconds an unused upload directory or file is kept
+  TMPDIR_QUOTA = 10 * 1024 * 1024 * 1024 # bytes, the least recently used entries are removed above it, 0 disables it
+  TMPDIR_MIN_AGE = 600 # seconds a new entry is kept regardless of the quota
+  ASGI_EXTRA_THREADS = 8 # request threads besides one per OMC session in the ASGI serving mode
+  ASGI_IO_THREADS = 4 # threads sending response bodies and spooling uploads in the ASGI serving mode
+  ASGI_SPOOL_SIZE = 1024 * 1024 # bytes of an upload kept in memory in the ASGI serving mode
+  BATCH_WORKERS = 0 # simultaneous simulations of a batch job, 0 uses the number of cores
+  BATCH_MAX_VARIANTS = 1000
+  RESULT_DOWNSAMPLE_POINTS = 2000 # default points per variable when downsampling results
+  INLINE_MAX_SIZE = 1024 * 1024 # bytes, larger results of Inline requests are sent as download urls
+  DOWNLOAD_MAX_AGE = 3600 # seconds clients may cache downloaded files, result files never change
+  USE_X_SENDFILE = False # let the front end web server send downloaded files
+  METRICS_ENABLED = True # serve the Prometheus metrics on /metrics
 
 class ProductionConfig(Config):
   """Production config."""
   SERVER_NAME = "omwebservice.openmodelica.org"
   DEBUG = False
   TESTING = False
+  OMC_POOL_PREWARM_LIBRARIES = [[("Modelica", "4.0.0")]]
 
 class DevelopmentConfig(Config):
   """Development config."""
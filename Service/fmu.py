@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+FMU module. Keys and links the built FMUs of the FMU cache.
+"""
+
+import os
+import shutil
+import logging
+from Service import util
+
+log = logging.getLogger(__name__)
+
+FMU_KEYS = ("class", "fileNames", "fileNamePrefix", "fmuVersion", "fmuType", "platforms", "includeResources")
+
+def getFMUKey(metaDataJson, sourcesHash, omcVersion):
+  """Returns the cache key of everything that goes into the FMU."""
+  buildInputs = {key: metaDataJson[key] for key in FMU_KEYS if key in metaDataJson}
+  buildInputs["libs"] = sorted([lib.get("name", ""), lib.get("version", "")] for lib in metaDataJson.get("libs", []))
+  buildInputs["sourcesHash"] = sourcesHash
+  buildInputs["omcVersion"] = omcVersion
+  return util.hashJson(buildInputs)
+
+def copyFile(source, target):
+  """Hard links the file, or copies it if the file systems differ."""
+  try:
+    os.link(source, target)
+  except OSError:
+    shutil.copyfile(source, target)
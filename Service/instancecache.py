@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Model instance cache module. Keeps the getModelInstance json of recent requests in memory and on disk.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from Service import util, metrics
+
+log = logging.getLogger(__name__)
+
+INSTANCE_FILE_NAME = "instance.json"
+
+def getModelInstanceKey(metaDataJson, sourcesHash, prettyPrint, omcVersion):
+  """Returns the cache key of everything that goes into the model instance json."""
+  return util.hashJson({
+    "class": metaDataJson.get("class", ""),
+    "fileNames": metaDataJson.get("fileNames", []),
+    "libs": sorted([lib.get("name", ""), lib.get("version", "")] for lib in metaDataJson.get("libs", [])),
+    "sourcesHash": sourcesHash,
+    "prettyPrint": bool(prettyPrint),
+    "omcVersion": omcVersion
+  })
+
+class ModelInstanceCache:
+  """LRU cache of model instance json with a memory tier of memoryBytes and an optional DirectoryCache tier.
+
+  Entries remember their (name, version) libraries so invalidate can drop the
+  entries of a library when it is installed again.
+  """
+
+  def __init__(self, memoryBytes, directoryCache=None):
+    self.memoryBytes = memoryBytes
+    self.directoryCache = directoryCache
+    self.memory = OrderedDict()
+    self.memorySize = 0
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    """Returns the json bytes of the entry or None."""
+    with self.lock:
+      entry = self.memory.get(key)
+      if entry is not None:
+        self.memory.move_to_end(key)
+        metrics.modelInstanceCacheRequests.inc("memory")
+        return entry[0]
+    if self.directoryCache is not None:
+      with self.directoryCache.open(key) as entryDirectory:
+        metadata = self.directoryCache.metadata(key) if entryDirectory else None
+        if metadata is not None:
+          try:
+            with open(os.path.join(entryDirectory, INSTANCE_FILE_NAME), "rb") as instanceFile:
+              data = instanceFile.read()
+          except OSError:
+            data = None
+          if data is not None:
+            self._putMemory(key, data, toLibraries(metadata["libs"]))
+            metrics.modelInstanceCacheRequests.inc("disk")
+            return data
+    metrics.modelInstanceCacheRequests.inc("miss")
+    return None
+
+  def put(self, key, data, libraries):
+    """Stores the json bytes of the model instance built with the (name, version) libraries."""
+    self._putMemory(key, data, tuple(libraries))
+    if self.directoryCache is not None:
+      def populate(directory):
+        with open(os.path.join(directory, INSTANCE_FILE_NAME), "wb") as instanceFile:
+          instanceFile.write(data)
+      try:
+        self.directoryCache.put(key, populate, {"libs": [list(library) for library in libraries]})
+      except OSError as ex:
+        log.warning("Failed to cache the model instance: {0}".format(str(ex)))
+
+  def invalidate(self, name, version):
+    """Removes the entries built with the library version."""
+    library = (name, version)
+    with self.lock:
+      for key in [key for key, entry in self.memory.items() if library in entry[1]]:
+        self.memorySize -= len(self.memory.pop(key)[0])
+    if self.directoryCache is not None:
+      for key in self.directoryCache.keys():
+        metadata = self.directoryCache.metadata(key)
+        if metadata is None or library in toLibraries(metadata.get("libs", [])):
+          self.directoryCache.remove(key)
+    log.debug("Invalidated the model instances using {0} {1}.".format(name, version))
+
+  def _putMemory(self, key, data, libraries):
+    if len(data) > self.memoryBytes:
+      return
+    with self.lock:
+      if key in self.memory:
+        self.memorySize -= len(self.memory.pop(key)[0])
+      self.memory[key] = (data, libraries)
+      self.memorySize += len(data)
+      while self.memorySize > self.memoryBytes:
+        _, (evicted, _) = self.memory.popitem(last=False)
+        self.memorySize -= len(evicted)
+
+def toLibraries(libs):
+  return tuple((name, version) for name, version in libs)
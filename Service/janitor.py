@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Removes the old upload directories and files of TMPDIR and prunes the build products of finished jobs.
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+from Service import metrics
+from Service.results import forgetMatResults
+from Service.cache import getDirectorySize
+from Service.compiledmodel import BUILD_SUFFIXES, getFileNamePrefix
+
+log = logging.getLogger(__name__)
+
+# the sidecar file whose modification time is the last use of a TMPDIR entry
+TOUCHED_FILE = ".touched"
+
+class Janitor:
+  """Keeps TMPDIR within a time to live and a disk quota.
+
+  Every entry of TMPDIR, an upload directory or a file, is removed when it was not
+  used for longer than ttl seconds. If TMPDIR is larger than quota bytes the least
+  recently used entries are removed first. An entry is used when it is modified or
+  touched by a download. Touches are kept in a sidecar file, inside a directory entry
+  and next to a file entry, so all the nodes sharing TMPDIR and restarts see them.
+  Entries of unfinished jobs and entries younger than minAge are kept.
+  """
+
+  def __init__(self, app, interval=300, ttl=86400, quota=0, minAge=600):
+    self.app = app
+    self.interval = interval
+    self.ttl = ttl
+    self.quota = quota
+    self.minAge = minAge
+    self.sizes = {}
+    self.pruned = set()
+    self.stopped = threading.Event()
+    self.thread = None
+
+  def start(self):
+    self.thread = threading.Thread(target=self._run, name="OMWebServiceJanitor", daemon=True)
+    self.thread.start()
+
+  def close(self):
+    self.stopped.set()
+
+  def touch(self, path):
+    """Marks the TMPDIR entry of the existing file path as used now."""
+    tmpDirectory = os.path.normpath(self.app.config['TMPDIR'])
+    relativePath = os.path.relpath(os.path.normpath(path), tmpDirectory)
+    entry = relativePath.split(os.sep, 1)[0]
+    if entry.startswith(".") or not os.path.exists(os.path.join(tmpDirectory, relativePath)):
+      return
+    # not os.utime of the file, the modification time of downloaded files is part of their ETag
+    touchedFile = self._getTouchedFile(os.path.join(tmpDirectory, entry))
+    try:
+      with open(touchedFile, "a"):
+        pass
+      os.utime(touchedFile)
+    except OSError:
+      pass
+
+  def collect(self):
+    """Prunes the finished jobs and removes the expired entries, then the least recently used ones over the quota."""
+    tmpDirectory = self.app.config['TMPDIR']
+    now = time.time()
+    pinned, finished = self._getJobDirectories()
+    for uploadDirectory, metaDataJson in finished.items():
+      if uploadDirectory not in self.pruned:
+        self.prune(uploadDirectory, getFileNamePrefix(metaDataJson))
+    # forget the jobs that left the job history
+    self.pruned = set(finished)
+
+    entries = []
+    try:
+      scan = list(os.scandir(tmpDirectory))
+    except FileNotFoundError:
+      return
+    for entry in scan:
+      if entry.name.startswith("."):
+        self._removeOrphanedTouchedFile(entry)
+        continue
+      path = os.path.normpath(entry.path)
+      try:
+        lastUsed = entry.stat(follow_symlinks=False).st_mtime
+      except OSError:
+        continue
+      lastUsed = max(lastUsed, self._getTouched(path))
+      size = self._getSize(entry, path, path not in pinned)
+      entries.append((lastUsed, path, size))
+    entries.sort()
+    totalSize = sum(size for _, _, size in entries)
+    for lastUsed, path, size in entries:
+      if path in pinned or now - lastUsed < self.minAge:
+        continue
+      if now - lastUsed > self.ttl:
+        reason = "ttl"
+      elif self.quota and totalSize > self.quota:
+        reason = "quota"
+      else:
+        continue
+      log.debug("Removing {0} ({1}).".format(path, reason))
+      self.remove(path)
+      metrics.janitorRemoved.inc(reason)
+      totalSize -= size
+    metrics.tmpDirectoryBytes.set(totalSize)
+
+  def prune(self, uploadDirectory, prefix):
+    """Removes the C sources, object files and other build products of the prefix once the job finished."""
+    try:
+      fileNames = os.listdir(uploadDirectory)
+    except OSError:
+      return
+    for fileName in fileNames:
+      if prefix and fileName.startswith(prefix) and fileName.endswith(BUILD_SUFFIXES):
+        path = os.path.join(uploadDirectory, fileName)
+        if os.path.isdir(path):
+          shutil.rmtree(path, ignore_errors=True)
+        else:
+          try:
+            os.remove(path)
+          except OSError:
+            pass
+    self.sizes.pop(uploadDirectory, None)
+
+  def remove(self, path):
+    self.sizes.pop(path, None)
+    self.pruned.discard(path)
+    # release the memory maps of the removed result files
+    forgetMatResults(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+      shutil.rmtree(path, ignore_errors=True)
+    else:
+      for fileName in (path, self._getTouchedFile(path)):
+        try:
+          os.remove(fileName)
+        except OSError:
+          pass
+
+  def _getTouchedFile(self, path):
+    """Returns the sidecar file of the TMPDIR entry."""
+    if os.path.isdir(path) and not os.path.islink(path):
+      return os.path.join(path, TOUCHED_FILE)
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "." + name + TOUCHED_FILE)
+
+  def _removeOrphanedTouchedFile(self, entry):
+    """Removes the sidecar file of a file entry that is gone."""
+    if not entry.name.endswith(TOUCHED_FILE) or len(entry.name) <= len(TOUCHED_FILE) + 1:
+      return
+    fileName = os.path.join(os.path.dirname(entry.path), entry.name[1:-len(TOUCHED_FILE)])
+    if not os.path.lexists(fileName):
+      try:
+        os.remove(entry.path)
+      except OSError:
+        pass
+
+  def _getTouched(self, path):
+    """Returns the time the TMPDIR entry was last touched, 0 if never."""
+    try:
+      return os.stat(self._getTouchedFile(path)).st_mtime
+    except OSError:
+      return 0
+
+  def _getSize(self, entry, path, useCache=True):
+    """Returns the size of the entry. Directory sizes are computed again when the directory changed or useCache is False."""
+    try:
+      if not entry.is_dir(follow_symlinks=False):
+        return entry.stat(follow_symlinks=False).st_size
+      changed = entry.stat(follow_symlinks=False).st_ctime
+    except OSError:
+      return 0
+    cached = self.sizes.get(path)
+    if not useCache or cached is None or cached[0] != changed:
+      cached = self.sizes[path] = (changed, getDirectorySize(path))
+    return cached[1]
+
+  def _getJobDirectories(self):
+    """Returns the upload directories of the unfinished jobs and the metadata of the finished jobs by upload directory."""
+    pinned = set()
+    finished = {}
+    for job in self.app.extensions["jobManager"].getJobs():
+      uploadDirectory = job.payload.get("uploadDirectory")
+      if not uploadDirectory:
+        continue
+      uploadDirectory = os.path.normpath(uploadDirectory)
+      if job.isDone():
+        finished[uploadDirectory] = job.payload.get("metaDataJson", {})
+      else:
+        pinned.add(uploadDirectory)
+    return pinned, finished
+
+  def _run(self):
+    while not self.stopped.wait(self.interval):
+      try:
+        self.collect()
+      except Exception:
+        log.exception("Cleaning up {0} failed.".format(self.app.config['TMPDIR']))
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Job queue module. Keeps the background jobs in a SQLite database shared by the API nodes and the workers.
+
+The API nodes put the jobs in the queue and read their state from it, the workers (Service.worker)
+claim them with a lease they renew while the job runs. The job of a worker that stops renewing its
+lease is run again by another worker, up to maxAttempts times.
+"""
+
+import json
+import math
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from Service import metrics
+from Service.jobs import Job, JobQueueFull, jobTypes
+
+log = logging.getLogger(__name__)
+
+DONE_STATUSES = (Job.FINISHED, Job.FAILED, Job.CANCELLED)
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  status TEXT NOT NULL,
+  phase TEXT NOT NULL DEFAULT '',
+  progress REAL NOT NULL DEFAULT 0,
+  result TEXT,
+  timings TEXT NOT NULL DEFAULT '{}',
+  resultFile TEXT NOT NULL DEFAULT '',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  worker TEXT,
+  leaseExpires REAL,
+  cancelled INTEGER NOT NULL DEFAULT 0,
+  created REAL NOT NULL,
+  started REAL,
+  finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobsByStatus ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS events (
+  jobId TEXT NOT NULL,
+  eventId INTEGER NOT NULL,
+  kind TEXT NOT NULL,
+  data TEXT NOT NULL,
+  PRIMARY KEY (jobId, eventId)
+);
+"""
+
+class JobQueue:
+  """Durable job queue in the SQLite database fileName.
+
+  Every thread uses its own connection. The database needs a file system with working
+  locks, e.g. a local disk or a shared file system that supports them.
+  """
+
+  def __init__(self, fileName, leaseSeconds=60, maxAttempts=3):
+    self.fileName = fileName
+    self.leaseSeconds = leaseSeconds
+    self.maxAttempts = max(maxAttempts, 1)
+    self.local = threading.local()
+    self._connect().executescript(schema)
+
+  def _connect(self):
+    connection = getattr(self.local, "connection", None)
+    if connection is None:
+      connection = sqlite3.connect(self.fileName, timeout=30, isolation_level=None)
+      connection.row_factory = sqlite3.Row
+      self.local.connection = connection
+    return connection
+
+  @contextmanager
+  def _transaction(self):
+    """Runs the with block in a write transaction, so workers claim and update the jobs one at a time."""
+    connection = self._connect()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+      yield connection
+    except BaseException:
+      connection.execute("ROLLBACK")
+      raise
+    connection.execute("COMMIT")
+
+  def put(self, jobId, kind, payload, timings=None, historySize=0):
+    """Queues the job. Forgets the oldest finished jobs when there are more than historySize."""
+    with self._transaction() as connection:
+      connection.execute("INSERT INTO jobs (id, kind, payload, status, timings, created) VALUES (?, ?, ?, ?, ?, ?)",
+                         (jobId, kind, json.dumps(payload), Job.QUEUED, json.dumps(timings or {}), time.time()))
+      if historySize:
+        self._prune(connection, historySize)
+
+  def claim(self, workerId):
+    """Leases the oldest queued job to the worker. Returns the job row with lastEventId or None if there is none."""
+    now = time.time()
+    with self._transaction() as connection:
+      self._recover(connection, now)
+      row = connection.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (Job.QUEUED,)).fetchone()
+      if row is None:
+        return None
+      connection.execute("UPDATE jobs SET status = ?, worker = ?, leaseExpires = ?, attempts = attempts + 1, started = ? WHERE id = ?",
+                         (Job.RUNNING, workerId, now + self.leaseSeconds, now, row["id"]))
+      job = self._get(connection, row["id"])
+      job["lastEventId"] = connection.execute("SELECT COALESCE(MAX(eventId), 0) FROM events WHERE jobId = ?", (row["id"],)).fetchone()[0]
+      return job
+
+  def renew(self, jobId, workerId, phase, progress, resultFile, events=()):
+    """Extends the lease of the worker and stores the progress and the new events.
+
+    Returns whether the job was cancelled, or None if the worker lost the lease.
+    """
+    with self._transaction() as connection:
+      cursor = connection.execute("UPDATE jobs SET leaseExpires = ?, phase = ?, progress = ?, resultFile = ? WHERE id = ? AND worker = ? AND status = ?",
+                                  (time.time() + self.leaseSeconds, phase, progress, resultFile, jobId, workerId, Job.RUNNING))
+      if cursor.rowcount == 0:
+        return None
+      self._addEvents(connection, jobId, events)
+      return bool(connection.execute("SELECT cancelled FROM jobs WHERE id = ?", (jobId,)).fetchone()[0])
+
+  def finish(self, jobId, workerId, status, result, timings, events=()):
+    """Stores the result of the job and its last events. Returns False if the worker lost the lease."""
+    with self._transaction() as connection:
+      cursor = connection.execute("UPDATE jobs SET status = ?, result = ?, timings = ?, progress = 1, finished = ?, leaseExpires = NULL WHERE id = ? AND worker = ? AND status = ?",
+                                  (status, json.dumps(result), json.dumps(timings), time.time(), jobId, workerId, Job.RUNNING))
+      if cursor.rowcount == 0:
+        return False
+      self._addEvents(connection, jobId, events)
+      return True
+
+  def cancel(self, jobId):
+    """Cancels a queued job at once and asks the worker of a running job to stop. Returns False if it is done already."""
+    with self._transaction() as connection:
+      row = connection.execute("SELECT status FROM jobs WHERE id = ?", (jobId,)).fetchone()
+      if row is None or row["status"] in DONE_STATUSES:
+        return False
+      if row["status"] == Job.QUEUED:
+        connection.execute("UPDATE jobs SET status = ?, result = ?, progress = 1, finished = ? WHERE id = ?",
+                           (Job.CANCELLED, json.dumps({"messages": "The job was cancelled.", "fileName": ""}), time.time(), jobId))
+      connection.execute("UPDATE jobs SET cancelled = 1 WHERE id = ?", (jobId,))
+      return True
+
+  def get(self, jobId):
+    """Returns the job row as a dict or None."""
+    return self._get(self._connect(), jobId)
+
+  def getJobs(self):
+    return [self._decode(row) for row in self._connect().execute("SELECT * FROM jobs ORDER BY created")]
+
+  def getEvents(self, jobId, lastEventId):
+    """Returns the (eventId, kind, data) events of the job after lastEventId."""
+    rows = self._connect().execute("SELECT eventId, kind, data FROM events WHERE jobId = ? AND eventId > ? ORDER BY eventId", (jobId, lastEventId))
+    return [(row["eventId"], row["kind"], json.loads(row["data"])) for row in rows]
+
+  def countByStatus(self):
+    return {row["status"]: row["count"] for row in self._connect().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")}
+
+  def getAverageSeconds(self, count=100):
+    """Returns the average run time of the last count finished jobs, None if there are none."""
+    row = self._connect().execute("SELECT AVG(finished - started) FROM (SELECT finished, started FROM jobs WHERE status = ? ORDER BY finished DESC LIMIT ?)",
+                                  (Job.FINISHED, count)).fetchone()
+    return row[0]
+
+  def close(self):
+    connection = getattr(self.local, "connection", None)
+    if connection is not None:
+      connection.close()
+      self.local.connection = None
+
+  def _get(self, connection, jobId):
+    row = connection.execute("SELECT * FROM jobs WHERE id = ?", (jobId,)).fetchone()
+    return None if row is None else self._decode(row)
+
+  def _decode(self, row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = None if job["result"] is None else json.loads(job["result"])
+    job["timings"] = json.loads(job["timings"])
+    return job
+
+  def _addEvents(self, connection, jobId, events):
+    connection.executemany("INSERT OR REPLACE INTO events (jobId, eventId, kind, data) VALUES (?, ?, ?, ?)",
+                           [(jobId, eventId, kind, json.dumps(data)) for eventId, kind, data in events])
+    if events:
+      connection.execute("DELETE FROM events WHERE jobId = ? AND eventId <= ?", (jobId, events[-1][0] - Job.MAX_EVENTS))
+
+  def _recover(self, connection, now):
+    """Requeues the running jobs whose lease expired, or fails them after maxAttempts runs."""
+    expired = "status = '{0}' AND leaseExpires < ?".format(Job.RUNNING)
+    lost = json.dumps({"messages": "The worker running the job was lost {0} times.".format(self.maxAttempts), "fileName": ""})
+    cancelled = json.dumps({"messages": "The job was cancelled.", "fileName": ""})
+    connection.execute("UPDATE jobs SET status = ?, result = ?, finished = ? WHERE " + expired + " AND cancelled = 1",
+                       (Job.CANCELLED, cancelled, now, now))
+    connection.execute("UPDATE jobs SET status = ?, result = ?, finished = ? WHERE " + expired + " AND attempts >= ?",
+                       (Job.FAILED, lost, now, now, self.maxAttempts))
+    cursor = connection.execute("UPDATE jobs SET status = ?, worker = NULL, leaseExpires = NULL WHERE " + expired, (Job.QUEUED, now))
+    if cursor.rowcount:
+      log.warning("Requeued {0} jobs of lost workers.".format(cursor.rowcount))
+
+  def _prune(self, connection, historySize):
+    connection.execute("DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?, ?) ORDER BY finished DESC LIMIT -1 OFFSET ?)",
+                       DONE_STATUSES + (historySize,))
+    connection.execute("DELETE FROM events WHERE jobId NOT IN (SELECT id FROM jobs)")
+
+class QueuedJob:
+  """A job of the job queue as seen by an API node, with the interface of Job.
+
+  Its state is a snapshot of the queue, read again by isDone, wait and getEvents.
+  """
+
+  def __init__(self, manager, row):
+    self.manager = manager
+    self.exception = None
+    self._update(row)
+
+  def _update(self, row):
+    self.id = row["id"]
+    self.kind = row["kind"]
+    self.payload = row["payload"]
+    self.status = row["status"]
+    self.phase = row["phase"]
+    self.progress = row["progress"]
+    self.result = row["result"]
+    self.resultFile = row["resultFile"]
+    self.created = row["created"]
+    self.started = row["started"]
+    self.finished = row["finished"]
+    self.timings = metrics.Timings()
+    self.timings.phases = dict(row["timings"])
+
+  def refresh(self):
+    row = self.manager.queue.get(self.id)
+    if row is not None:
+      self._update(row)
+
+  def isDone(self):
+    self.refresh()
+    return self.status in DONE_STATUSES
+
+  def wait(self, timeout=None):
+    """Waits for the job to finish. Returns True if it did."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not self.isDone():
+      if deadline is not None and time.monotonic() >= deadline:
+        return False
+      time.sleep(self.manager.pollInterval if deadline is None else max(min(self.manager.pollInterval, deadline - time.monotonic()), 0))
+    return True
+
+  def getEvents(self, lastEventId, timeout=None):
+    """Returns the events after lastEventId, waiting up to timeout seconds for one unless the job is done."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+      events = self.manager.queue.getEvents(self.id, lastEventId)
+      if events or self.isDone() or (deadline is not None and time.monotonic() >= deadline):
+        return events
+      time.sleep(self.manager.pollInterval if deadline is None else max(min(self.manager.pollInterval, deadline - time.monotonic()), 0))
+
+  def cancel(self):
+    return self.manager.queue.cancel(self.id)
+
+  def addDoneCallback(self, callback):
+    """Calls callback with the job when it finishes, at once if it already did."""
+    self.manager.watch(self, callback)
+
+  def toJson(self):
+    return Job.toJson(self)
+
+class QueueJobManager:
+  """Puts the jobs in the job queue for the workers and reads them back, with the interface of JobManager.
+
+  At most queueSize jobs wait for a worker, 0 does not limit the queue.
+  """
+
+  def __init__(self, app, queue, historySize=1000, queueSize=0, pollInterval=0.5):
+    self.app = app
+    self.queue = queue
+    self.historySize = historySize
+    self.queueSize = queueSize
+    self.pollInterval = pollInterval
+    self.watched = {}
+    self.watcher = None
+    self.stopped = threading.Event()
+    self.lock = threading.Lock()
+
+  def submit(self, kind, payload, timings=None):
+    """Queues a job of a registered kind and returns it.
+
+    Raises JobQueueFull if queueSize jobs are waiting already.
+    """
+    if kind not in jobTypes:
+      raise ValueError("Unknown job type {0}.".format(kind))
+    if self.queueSize:
+      counts = self.queue.countByStatus()
+      queued = counts.get(Job.QUEUED, 0)
+      if queued >= self.queueSize:
+        averageSeconds = self.queue.getAverageSeconds() or 10.0
+        raise JobQueueFull(max(math.ceil(averageSeconds * queued / max(counts.get(Job.RUNNING, 0), 1)), 1))
+    jobId = uuid.uuid4().hex
+    self.queue.put(jobId, kind, payload, None if timings is None else timings.toJson(), self.historySize)
+    return self.get(jobId)
+
+  def get(self, jobId):
+    row = self.queue.get(jobId)
+    return None if row is None else QueuedJob(self, row)
+
+  def getJobs(self):
+    return [QueuedJob(self, row) for row in self.queue.getJobs()]
+
+  def countByStatus(self):
+    """Returns the number of jobs of each status."""
+    counts = dict.fromkeys((Job.QUEUED, Job.RUNNING) + DONE_STATUSES, 0)
+    counts.update(self.queue.countByStatus())
+    return counts
+
+  def watch(self, job, callback):
+    """Calls callback with the job once it is done, checking the watched jobs from one thread."""
+    if job.isDone():
+      callback(job)
+      return
+    with self.lock:
+      self.watched.setdefault(job.id, []).append(callback)
+      if self.watcher is None:
+        self.watcher = threading.Thread(target=self._watch, name="OMWebServiceJobWatcher", daemon=True)
+        self.watcher.start()
+
+  def shutdown(self):
+    self.stopped.set()
+
+  def _watch(self):
+    while not self.stopped.wait(self.pollInterval):
+      with self.lock:
+        jobIds = list(self.watched)
+      for jobId in jobIds:
+        try:
+          job = self.get(jobId)
+        except sqlite3.Error:
+          log.exception("Checking job {0} failed.".format(jobId))
+          continue
+        if job is not None and job.status not in DONE_STATUSES:
+          continue
+        with self.lock:
+          callbacks = self.watched.pop(jobId, [])
+        for callback in callbacks if job is not None else []:
+          try:
+            callback(job)
+          except Exception:
+            log.exception("Job {0} done callback failed.".format(jobId))
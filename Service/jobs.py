@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Background jobs module. Runs long requests on a bounded pool of worker threads.
+"""
+
+import math
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import TooManyRequests
+from Service import metrics
+
+log = logging.getLogger(__name__)
+
+jobTypes = {}
+currentJob = threading.local()
+
+class JobQueueFull(TooManyRequests):
+  """Raised when a job is submitted while the queue is full. Answered with 429 and Retry-After."""
+
+  def __init__(self, retryAfter):
+    super().__init__("Too many queued jobs, retry after {0} seconds.".format(retryAfter), retry_after=retryAfter)
+
+def jobType(kind):
+  """Decorator registering the function that runs the jobs of the kind.
+
+  The function is called with the job inside an app context and returns the result dict.
+  """
+  def register(function):
+    jobTypes[kind] = function
+    return function
+  return register
+
+def getCurrentJob():
+  """Returns the job running in this thread or None."""
+  return getattr(currentJob, "job", None)
+
+def setProgress(phase, progress=None):
+  """Updates the phase and progress of the job running in this thread, if any."""
+  job = getCurrentJob()
+  if job is not None:
+    job.setProgress(phase, progress)
+
+def addEvent(kind, data):
+  """Adds an event to the job running in this thread, if any."""
+  job = getCurrentJob()
+  if job is not None:
+    job.addEvent(kind, data)
+
+class Job:
+  """A request executed by a background worker."""
+
+  QUEUED = "queued"
+  RUNNING = "running"
+  FINISHED = "finished"
+  FAILED = "failed"
+  CANCELLED = "cancelled"
+  MAX_EVENTS = 1000
+
+  def __init__(self, kind, payload, timings=None):
+    self.id = uuid.uuid4().hex
+    self.kind = kind
+    self.payload = payload
+    self.timings = metrics.Timings() if timings is None else timings
+    self.status = Job.QUEUED
+    self.phase = ""
+    self.progress = 0.0
+    self.result = None
+    self.exception = None
+    self.created = time.time()
+    self.started = None
+    self.finished = None
+    self.done = threading.Event()
+    self.doneCallbacks = []
+    self.lock = threading.Lock()
+    self.condition = threading.Condition(self.lock)
+    # progress, log and cancel events for the event stream, the result file is set while it is written
+    self.events = []
+    self.lastEventId = 0
+    self.resultFile = ""
+    self.cancelled = threading.Event()
+
+  def setProgress(self, phase, progress=None):
+    if phase == self.phase and progress in (None, self.progress):
+      return
+    self.phase = phase
+    if progress is not None:
+      self.progress = progress
+    self.addEvent("progress", {"phase": self.phase, "progress": self.progress})
+
+  def addEvent(self, kind, data):
+    """Adds an event for the event stream. Only the last MAX_EVENTS events are kept."""
+    with self.condition:
+      self.lastEventId += 1
+      self.events.append((self.lastEventId, kind, data))
+      if len(self.events) > Job.MAX_EVENTS:
+        del self.events[:len(self.events) - Job.MAX_EVENTS]
+      self.condition.notify_all()
+
+  def getEvents(self, lastEventId, timeout=None):
+    """Returns the events after lastEventId, waiting up to timeout seconds for one unless the job is done."""
+    with self.condition:
+      if self.lastEventId <= lastEventId and not self.done.is_set():
+        self.condition.wait(timeout)
+      return [event for event in self.events if event[0] > lastEventId]
+
+  def cancel(self):
+    """Asks the job to stop. Returns False if it is done already.
+
+    A queued job is not run, a running job stops at its next cancellation point.
+    """
+    with self.lock:
+      if self.done.is_set():
+        return False
+      self.cancelled.set()
+    self.addEvent("cancel", {})
+    return True
+
+  def isDone(self):
+    return self.done.is_set()
+
+  def wait(self, timeout=None):
+    """Waits for the job to finish. Returns True if it did."""
+    return self.done.wait(timeout)
+
+  def addDoneCallback(self, callback):
+    """Calls callback with the job when it finishes, at once if it already did."""
+    with self.lock:
+      if not self.done.is_set():
+        self.doneCallbacks.append(callback)
+        return
+    callback(self)
+
+  def setDone(self):
+    with self.lock:
+      self.done.set()
+      self.condition.notify_all()
+      callbacks, self.doneCallbacks = self.doneCallbacks, []
+    for callback in callbacks:
+      try:
+        callback(self)
+      except Exception:
+        log.exception("Job {0} done callback failed.".format(self.id))
+
+  def toJson(self):
+    return {
+      "id": self.id,
+      "kind": self.kind,
+      "status": self.status,
+      "phase": self.phase,
+      "progress": self.progress,
+      "created": self.created,
+      "started": self.started,
+      "finished": self.finished
+    }
+
+class JobManager:
+  """Runs jobs on a fixed number of worker threads and keeps the recent jobs.
+
+  At most queueSize jobs wait for a worker, 0 does not limit the queue.
+  """
+
+  def __init__(self, app, workers=4, historySize=1000, queueSize=0):
+    self.app = app
+    self.workers = max(workers, 1)
+    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="OMWebServiceJob")
+    self.historySize = historySize
+    self.queueSize = queueSize
+    self.queued = 0
+    self.averageSeconds = 10.0
+    self.jobs = OrderedDict()
+    self.lock = threading.Lock()
+
+  def submit(self, kind, payload, timings=None):
+    """Queues a job of a registered kind and returns it.
+
+    The phases of the job are added to timings, e.g. the timings of the request that uploaded the files.
+    Raises JobQueueFull if queueSize jobs are waiting already.
+    """
+    if kind not in jobTypes:
+      raise ValueError("Unknown job type {0}.".format(kind))
+    job = Job(kind, payload, timings)
+    with self.lock:
+      if self.queueSize and self.queued >= self.queueSize:
+        raise JobQueueFull(max(math.ceil(self.averageSeconds * self.queued / self.workers), 1))
+      self.queued += 1
+      self.jobs[job.id] = job
+      self._prune()
+    self.executor.submit(self._run, job)
+    return job
+
+  def get(self, jobId):
+    with self.lock:
+      return self.jobs.get(jobId)
+
+  def getJobs(self):
+    with self.lock:
+      return list(self.jobs.values())
+
+  def shutdown(self):
+    self.executor.shutdown(wait=False)
+
+  def countByStatus(self):
+    """Returns the number of jobs of each status."""
+    counts = dict.fromkeys((Job.QUEUED, Job.RUNNING, Job.FINISHED, Job.FAILED, Job.CANCELLED), 0)
+    with self.lock:
+      for job in self.jobs.values():
+        counts[job.status] += 1
+    return counts
+
+  def _prune(self):
+    """Forgets the oldest finished jobs when there are more than historySize."""
+    if len(self.jobs) <= self.historySize:
+      return
+    for jobId in [jobId for jobId, job in self.jobs.items() if job.isDone()]:
+      del self.jobs[jobId]
+      if len(self.jobs) <= self.historySize:
+        break
+
+  def _run(self, job):
+    with self.lock:
+      self.queued -= 1
+    runJob(self.app, job)
+    with self.lock:
+      self.averageSeconds += 0.1 * (job.finished - job.started - self.averageSeconds)
+
+def runJob(app, job):
+  """Runs the job in this thread inside an app context and marks it done."""
+  job.status = Job.RUNNING
+  job.started = time.time()
+  currentJob.job = job
+  try:
+    if job.cancelled.is_set():
+      job.result = {"messages": "The job was cancelled.", "fileName": ""}
+    else:
+      with app.app_context(), metrics.collectTimings(job.timings):
+        metrics.observePhase("queue", job.started - job.created)
+        job.result = jobTypes[job.kind](job)
+    job.status = Job.CANCELLED if job.cancelled.is_set() else Job.FINISHED
+  except Exception as ex:
+    log.exception("Job {0} failed.".format(job.id))
+    job.exception = ex
+    job.result = {"messages": str(ex), "fileName": ""}
+    job.status = Job.CANCELLED if job.cancelled.is_set() else Job.FAILED
+  finally:
+    currentJob.job = None
+    job.finished = time.time()
+    job.progress = 1.0
+    job.setDone()
+  metrics.jobsFinished.inc(job.kind, job.status)
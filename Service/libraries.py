@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Modelica library handling module.
+"""
+
+import os
+import json
+import logging
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+class LibraryLoadError(Exception):
+  """Raised when a library could not be installed or loaded."""
+
+def getLibraries(metaDataJson):
+  """Returns the libs of the metadata as a tuple of (name, version) pairs."""
+  libraries = []
+  for lib in metaDataJson.get("libs", []):
+    libraries.append((lib.get("name", ""), lib.get("version", "")))
+  return tuple(libraries)
+
+class LibraryIndex:
+  """Index of the installed (name, version) libraries persisted in a json file.
+
+  Each entry keeps the path of the library source file so the installation
+  can be verified on disk without asking the package manager. Listeners are
+  called with the name and version of every installed library.
+  """
+
+  def __init__(self, fileName):
+    self.fileName = fileName
+    self.lock = threading.Lock()
+    self.libraries = {}
+    self.listeners = []
+    try:
+      with open(fileName) as indexFile:
+        for entry in json.load(indexFile):
+          self.libraries[(entry["name"], entry["version"])] = entry
+    except FileNotFoundError:
+      pass
+    except (ValueError, KeyError, TypeError) as ex:
+      log.warning("Ignoring invalid library index {0}: {1}".format(fileName, str(ex)))
+
+  def isInstalled(self, name, version):
+    """Returns True if the library is in the index and its source file exists."""
+    entry = self.libraries.get((name, version))
+    return bool(entry) and os.path.exists(entry["path"])
+
+  def addListener(self, listener):
+    self.listeners.append(listener)
+
+  def add(self, name, version, path):
+    with self.lock:
+      self.libraries[(name, version)] = {"name": name, "version": version, "path": path, "installed": time.time()}
+      self._save()
+    for listener in self.listeners:
+      listener(name, version)
+
+  def remove(self, name, version):
+    with self.lock:
+      if self.libraries.pop((name, version), None):
+        self._save()
+
+  def entries(self):
+    """Returns the index entries with an exists flag from the on-disk verification."""
+    entries = []
+    for entry in list(self.libraries.values()):
+      entry = dict(entry)
+      entry["exists"] = os.path.exists(entry["path"])
+      entries.append(entry)
+    return sorted(entries, key=lambda entry: (entry["name"], entry["version"]))
+
+  def _save(self):
+    directory = os.path.dirname(self.fileName)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    fileHandle, tempFileName = tempfile.mkstemp(dir=directory or None, suffix=".json")
+    with os.fdopen(fileHandle, "w") as indexFile:
+      json.dump(list(self.libraries.values()), indexFile, indent=2)
+    os.replace(tempFileName, self.fileName)
+
+def installLibrary(omc, name, version, index=None):
+  """Installs and loads the library in OMC and adds it to the index."""
+  if not omc.sendCommand("installPackage({0}, \"{1}\")".format(name, version)):
+    raise LibraryLoadError("Failed to install package {0}.".format(name))
+  if not omc.sendCommand("loadModel({0}, {{\"{1}\"}})".format(name, version)):
+    raise LibraryLoadError("Failed to load package {0}.".format(name))
+  if index is not None:
+    path = omc.sendCommand("getSourceFile({0})".format(name))
+    if path:
+      index.add(name, version, path)
+
+def loadLibraries(omc, libraries, index=None):
+  """Loads the (name, version) pairs in OMC.
+
+  Libraries found in the index are loaded directly, the others are installed
+  with the package manager first.
+  """
+  indexed = [(name, version) for name, version in libraries if index is not None and index.isInstalled(name, version)]
+  loaded = omc.sendCommands("loadModel({0}, {{\"{1}\"}})".format(name, version) for name, version in indexed)
+  for (name, version), libraryLoaded in zip(indexed, loaded):
+    if not libraryLoaded:
+      log.warning("Failed to load indexed package {0} {1}, installing it again.".format(name, version))
+      index.remove(name, version)
+  for name, version in libraries:
+    if (name, version) not in indexed or not index.isInstalled(name, version):
+      installLibrary(omc, name, version, index)
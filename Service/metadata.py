@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Metadata module. Validates the metadata json of the requests against metadata.schema.json.
+"""
+
+import os
+import json
+import logging
+from jsonschema.validators import validator_for
+from werkzeug.exceptions import BadRequest
+
+log = logging.getLogger(__name__)
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadata.schema.json")
+
+class InvalidMetaData(BadRequest):
+  """Raised for metadata json that is not json or does not match the schema. Answered with 400 and the errors."""
+
+  def __init__(self, errors):
+    super().__init__("Invalid metadata json. {0}".format(" ".join(errors)))
+    self.data = {"message": self.description, "errors": errors}
+
+def loadValidator(fileName=SCHEMA_FILE):
+  """Checks the schema and returns its validator, built once and reused for all requests."""
+  with open(fileName) as schemaFile:
+    schema = json.load(schemaFile)
+  validatorClass = validator_for(schema)
+  validatorClass.check_schema(schema)
+  return validatorClass(schema)
+
+def getErrorPath(error):
+  return "/".join(str(element) for element in error.absolute_path) or "metadata"
+
+def parseMetaData(data, validator):
+  """Returns the metadata json of the bytes. Raises InvalidMetaData with all the errors found."""
+  try:
+    metaDataJson = json.loads(data)
+  except ValueError as ex:
+    raise InvalidMetaData(["metadata: {0}.".format(str(ex))])
+  errors = sorted(validator.iter_errors(metaDataJson), key=lambda error: list(map(str, error.absolute_path)))
+  if errors:
+    raise InvalidMetaData(["{0}: {1}.".format(getErrorPath(error), error.message) for error in errors])
+  return metaDataJson
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Counters, gauges and histograms exposed in the Prometheus text format.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def formatLabels(labelNames, labelValues, extra=()):
+  labels = list(zip(labelNames, labelValues)) + list(extra)
+  if not labels:
+    return ""
+  return "{" + ",".join("{0}=\"{1}\"".format(name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+                        for name, value in labels) + "}"
+
+def formatValue(value):
+  if value == float("inf"):
+    return "+Inf"
+  return repr(float(value))
+
+class Metric:
+  """Base class of the metrics, keeps one value per label values tuple."""
+  kind = ""
+
+  def __init__(self, name, documentation, labelNames=()):
+    self.name = name
+    self.documentation = documentation
+    self.labelNames = tuple(labelNames)
+    self.values = {}
+    self.lock = threading.Lock()
+
+  def samples(self):
+    """Yields the (suffix, labels, value) samples of the metric."""
+    with self.lock:
+      values = list(self.values.items())
+    for labelValues, value in sorted(values):
+      yield "", formatLabels(self.labelNames, labelValues), value
+
+  def expose(self):
+    lines = ["# HELP {0} {1}".format(self.name, self.documentation), "# TYPE {0} {1}".format(self.name, self.kind)]
+    for suffix, labels, value in self.samples():
+      lines.append("{0}{1}{2} {3}".format(self.name, suffix, labels, formatValue(value)))
+    return "\n".join(lines)
+
+class Counter(Metric):
+  """Monotonically increasing count."""
+  kind = "counter"
+
+  def inc(self, *labelValues, amount=1):
+    with self.lock:
+      self.values[labelValues] = self.values.get(labelValues, 0) + amount
+
+class Gauge(Metric):
+  """Value that goes up and down."""
+  kind = "gauge"
+
+  def set(self, value, *labelValues):
+    with self.lock:
+      self.values[labelValues] = value
+
+  def inc(self, *labelValues, amount=1):
+    with self.lock:
+      self.values[labelValues] = self.values.get(labelValues, 0) + amount
+
+  def dec(self, *labelValues, amount=1):
+    self.inc(*labelValues, amount=-amount)
+
+class Histogram(Metric):
+  """Counts the observations in cumulative buckets and keeps their sum."""
+  kind = "histogram"
+
+  def __init__(self, name, documentation, labelNames=(), buckets=DEFAULT_BUCKETS):
+    super().__init__(name, documentation, labelNames)
+    self.buckets = tuple(sorted(buckets))
+
+  def observe(self, value, *labelValues):
+    index = bisect.bisect_left(self.buckets, value)
+    with self.lock:
+      counts = self.values.get(labelValues)
+      if counts is None:
+        # one count per bucket, the +Inf bucket and the sum
+        counts = self.values[labelValues] = [0] * (len(self.buckets) + 2)
+      counts[index] += 1
+      counts[-1] += value
+
+  @contextmanager
+  def time(self, *labelValues):
+    """Observes the duration of the with block."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - start, *labelValues)
+
+  def samples(self):
+    with self.lock:
+      values = [(labelValues, list(counts)) for labelValues, counts in self.values.items()]
+    for labelValues, counts in sorted(values):
+      count = 0
+      for bound, bucketCount in zip(self.buckets + (float("inf"),), counts):
+        count += bucketCount
+        yield "_bucket", formatLabels(self.labelNames, labelValues, [("le", formatValue(bound))]), count
+      yield "_count", formatLabels(self.labelNames, labelValues), count
+      yield "_sum", formatLabels(self.labelNames, labelValues), counts[-1]
+
+class Registry:
+  """Collection of metrics rendered together."""
+
+  def __init__(self):
+    self.metrics = []
+
+  def register(self, metric):
+    self.metrics.append(metric)
+    return metric
+
+  def counter(self, name, documentation, labelNames=()):
+    return self.register(Counter(name, documentation, labelNames))
+
+  def gauge(self, name, documentation, labelNames=()):
+    return self.register(Gauge(name, documentation, labelNames))
+
+  def histogram(self, name, documentation, labelNames=(), buckets=DEFAULT_BUCKETS):
+    return self.register(Histogram(name, documentation, labelNames, buckets))
+
+  def expose(self):
+    """Returns the metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.expose() for metric in self.metrics) + "\n"
+
+registry = Registry()
+
+httpRequests = registry.counter("omws_http_requests_total", "HTTP requests by endpoint, method and status code.", ("endpoint", "method", "status"))
+httpRequestSeconds = registry.histogram("omws_http_request_duration_seconds", "HTTP request latency by endpoint.", ("endpoint",))
+omcCommandSeconds = registry.histogram("omws_omc_command_duration_seconds", "OMC command latency by command.", ("command",))
+omcCommandErrors = registry.counter("omws_omc_command_errors_total", "OMC commands that raised an exception or returned false.", ("command",))
+phaseSeconds = registry.histogram("omws_phase_duration_seconds", "Duration of the phases of the simulation pipeline.", ("phase",))
+jobsFinished = registry.counter("omws_jobs_total", "Finished background jobs by kind and status.", ("kind", "status"))
+omcSessions = registry.gauge("omws_omc_sessions", "OMC sessions of the pool by state.", ("state",))
+coresInUse = registry.gauge("omws_cpu_cores_in_use", "Cores reserved by compilation and simulation phases.", ("kind",))
+admissionRequests = registry.gauge("omws_admission_requests", "Requests of the admission lanes by state, active or waiting.", ("lane", "state"))
+admissionRejected = registry.counter("omws_admission_rejected_total", "Requests rejected with 429 by lane.", ("lane",))
+modelInstanceCacheRequests = registry.counter("omws_model_instance_cache_requests_total", "Model instance cache lookups by result, memory, disk or miss.", ("result",))
+janitorRemoved = registry.counter("omws_tmpdir_removed_total", "TMPDIR entries removed by reason, ttl or quota.", ("reason",))
+tmpDirectoryBytes = registry.gauge("omws_tmpdir_bytes", "Size of TMPDIR at the last clean up.")
+jobCount = registry.gauge("omws_jobs", "Background jobs in the job history by status.", ("status",))
+
+class Timings:
+  """Durations of the phases of one request, in the order they were first recorded."""
+
+  def __init__(self):
+    self.phases = {}
+    self.lock = threading.Lock()
+
+  def add(self, name, seconds):
+    with self.lock:
+      self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+  def copy(self):
+    timings = Timings()
+    with self.lock:
+      timings.phases = dict(self.phases)
+    return timings
+
+  def toJson(self):
+    """Returns the phase durations in seconds."""
+    with self.lock:
+      return {name: round(seconds, 6) for name, seconds in self.phases.items()}
+
+  def toServerTiming(self):
+    """Returns the Server-Timing header value, with the durations in milliseconds."""
+    with self.lock:
+      return ", ".join("{0};dur={1:.3f}".format(name, seconds * 1000) for name, seconds in self.phases.items())
+
+# the timings of the request or job handled by the thread
+currentTimings = threading.local()
+
+@contextmanager
+def collectTimings(timings):
+  """Records the phases of the with block in timings, besides the phase histogram."""
+  previous = getattr(currentTimings, "timings", None)
+  currentTimings.timings = timings
+  try:
+    yield timings
+  finally:
+    currentTimings.timings = previous
+
+def getCurrentTimings():
+  """Returns the timings collected in this thread or None, e.g. to collect them in other threads too."""
+  return getattr(currentTimings, "timings", None)
+
+def getCommandName(expression):
+  """Returns the function name of the OMC expression, array for {...} expressions."""
+  if expression.startswith("{"):
+    return "array"
+  index = expression.find("(")
+  return expression[:index] if index > 0 else expression
+
+@contextmanager
+def phase(name):
+  """Observes the duration of the with block as the phase name."""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    observePhase(name, time.perf_counter() - start)
+
+def observePhase(name, seconds):
+  """Records a phase duration measured elsewhere, e.g. the OMC simulate timings."""
+  phaseSeconds.observe(seconds, name)
+  timings = getattr(currentTimings, "timings", None)
+  if timings is not None:
+    timings.add(name, seconds)
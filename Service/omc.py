@@ -33,32 +33,102 @@ OpenModelica kernel module. Communicates with OM compiler.
 """
 
 import logging
+import time
 from OMPython import OMCSessionZMQ
+from Service import metrics
 
 log = logging.getLogger(__name__)
 
+# the missing omc process id is logged once
+processIdWarned = False
+
 class OMC:
   """OpenModelica Compiler interface"""
 
-  def __init__(self):
-    self.omcSession = OMCSessionZMQ()
-    self.errorString = ""
+  def __init__(self, omcSession=None):
+    self.omcSession = OMCSessionZMQ() if omcSession is None else omcSession
+    self._errorString = ""
+    self._errorPending = False
 
   def __del__(self):
     pass
 
+  @property
+  def errorString(self):
+    """Returns the errors of the commands sent since the last clearErrorString.
+
+    OMC keeps the errors until getErrorString() is called, so they are fetched
+    only when needed, in one round trip for all the commands sent before.
+    """
+    if self._errorPending:
+      self._errorPending = False
+      errorString = self.omcSession.sendExpression("getErrorString()")
+      log.debug("OMC getErrorString(): {0}".format(errorString))
+      if errorString:
+        self._errorString += errorString
+    return self._errorString
+
+  def clearErrorString(self):
+    """Returns the errors and clears them so they are not reported for the next commands."""
+    errorString = self.errorString
+    self._errorString = ""
+    return errorString
+
+  def getProcessId(self):
+    """Returns the process id of omc or None if the session does not expose it.
+
+    OMPython has no public attribute for it, the private ones are those of the version required in setup.py.
+    """
+    global processIdWarned
+    process = getattr(getattr(self.omcSession, "omc_process", None), "_omc_process", None)
+    if process is None:
+      process = getattr(self.omcSession, "_omc_process", None)
+    processId = getattr(process, "pid", None)
+    if processId is None and not processIdWarned:
+      processIdWarned = True
+      log.warning("The OMPython session does not expose the omc process id, omc is not pinned to the compile cores "
+                  "and cancelled jobs do not kill the compiler.")
+    return processId
+
+  def close(self):
+    """Quits the OMC session."""
+    self.sendCommand("quit()")
+
   def sendCommand(self, expression, parsed=True):
     """Sends the command to OMC."""
     log.debug("OMC sendCommand: {0} - parsed: {1}".format(expression, parsed))
 
+    command = metrics.getCommandName(expression)
+    start = time.perf_counter()
     try:
       res = self.omcSession.sendExpression(expression, parsed)
       log.debug("OMC result: {0}".format(res))
       if expression != "quit()":
-        errorString = self.omcSession.sendExpression("getErrorString()")
-        log.debug("OMC getErrorString(): {0}".format(errorString))
+        self._errorPending = True
     except Exception as ex:
+      metrics.omcCommandErrors.inc(command)
       log.error("OMC failed: {0}, parsed={1} with exception: {2}".format(expression, parsed, str(ex)))
       raise
+    finally:
+      metrics.omcCommandSeconds.observe(time.perf_counter() - start, command)
+    if res is False:
+      metrics.omcCommandErrors.inc(command)
+
+    return res
+
+  def sendCommands(self, expressions, parsed=True):
+    """Sends the commands to OMC in one round trip and returns a tuple of their results.
 
-    return res
\ No newline at end of file
+    OMC evaluates the commands as an array, so they must have the same result
+    type, e.g. several loadFile or loadModel calls. If OMC rejects the array
+    the commands are sent one by one.
+    """
+    expressions = list(expressions)
+    if len(expressions) < 2:
+      return tuple(self.sendCommand(expression, parsed) for expression in expressions)
+    res = self.sendCommand("{{{0}}}".format(", ".join(expressions)), parsed)
+    if isinstance(res, (list, tuple)) and len(res) == len(expressions):
+      return tuple(res)
+    log.debug("OMC rejected the command array, sending the commands one by one.")
+    self.clearErrorString()
+    return tuple(self.sendCommand(expression, parsed) for expression in expressions)
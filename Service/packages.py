@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Model packages module. Keeps uploaded model zip files extracted once, keyed by their SHA-256.
+
+Requests reference a package by the hash in the package field of the metadata json. The files of the
+extracted tree are read only and hard linked into the upload directory of each request.
+"""
+
+import os
+import stat
+import zipfile
+import tempfile
+from Service import util
+from Service.fmu import copyFile
+
+def extractPackage(zipFileName, directory):
+  """Extracts the zip file into the directory and makes the files read only, they are shared by hard links."""
+  with zipfile.ZipFile(zipFileName, "r") as zipFile:
+    zipFile.extractall(directory)
+  for root, _, fileNames in os.walk(directory):
+    for fileName in fileNames:
+      os.chmod(os.path.join(root, fileName), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+def storePackage(packageCache, fileStorage, temporaryDirectory):
+  """Saves the uploaded zip file and extracts it unless the package is stored already.
+
+  Returns the hash of the package and whether it was new. Raises zipfile.BadZipFile for an invalid zip file.
+  """
+  fileHandle, zipFileName = tempfile.mkstemp(dir=temporaryDirectory, prefix="package-", suffix=".zip")
+  os.close(fileHandle)
+  try:
+    fileStorage.save(zipFileName)
+    packageHash = util.hashFile(zipFileName)
+    if packageCache.get(packageHash):
+      return packageHash, False
+    packageCache.put(packageHash, lambda directory: extractPackage(zipFileName, os.path.join(directory, "files")))
+    return packageHash, True
+  finally:
+    os.remove(zipFileName)
+
+def linkPackage(packageCache, packageHash, directory):
+  """Hard links the files of the package into the directory. Returns False if the package is not stored."""
+  with packageCache.open(packageHash) as path:
+    if path is None:
+      return False
+    files = os.path.join(path, "files")
+    for root, directoryNames, fileNames in os.walk(files):
+      target = os.path.join(directory, os.path.relpath(root, files))
+      for directoryName in directoryNames:
+        os.makedirs(os.path.join(target, directoryName), exist_ok=True)
+      for fileName in fileNames:
+        copyFile(os.path.join(root, fileName), os.path.join(target, fileName))
+  return True
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+OMC session pool module. Keeps a bounded set of started OMC sessions.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from Service import metrics
+from Service.libraries import loadLibraries
+
+log = logging.getLogger(__name__)
+
+class OMCSessionPoolTimeout(Exception):
+  """Raised when no OMC session becomes available in time."""
+  code = 503
+
+  def __init__(self, timeout):
+    super().__init__("No OpenModelica session available after {0} seconds.".format(timeout))
+
+class OMCSessionPoolClosed(Exception):
+  """Raised when a session is requested from a closed pool."""
+  code = 503
+
+  def __init__(self):
+    super().__init__("The OpenModelica session pool is closed.")
+
+class SessionInfo:
+  """Bookkeeping for a pooled session."""
+
+  def __init__(self, workingDirectory):
+    self.workingDirectory = workingDirectory
+    self.useCount = 0
+    self.lastUsed = time.monotonic()
+    # the library set loaded in the session and the top level classes, their source files and
+    # their numbers of classes including the nested ones after loading it
+    self.libraries = frozenset()
+    self.classNames = ()
+    self.sourceFiles = ()
+    self.classCounts = ()
+
+class OMCSessionPool:
+  """Bounded pool of started OMC sessions.
+
+  Sessions are created lazily up to maxSize and recycled after maxUses borrowers
+  or when a borrower fails. Sessions keep their loaded libraries between borrowers;
+  a borrower asking for a library set gets a session that already has it loaded
+  if one is idle. Classes loaded by the borrower are deleted when it is returned.
+  Background borrowers, e.g. simulation jobs, may not take the last reservedSessions
+  sessions so interactive requests are not stuck behind long simulations.
+  """
+
+  def __init__(self, factory, minSize=1, maxSize=4, maxUses=0, timeout=None, healthCheckInterval=0, prewarmLibraries=(), libraryIndex=None,
+               reservedSessions=0):
+    self.factory = factory
+    self.minSize = max(minSize, 0)
+    self.maxSize = max(maxSize, 1, self.minSize)
+    self.maxUses = maxUses
+    self.timeout = timeout
+    self.healthCheckInterval = healthCheckInterval
+    self.prewarmLibraries = list(prewarmLibraries)
+    self.libraryIndex = libraryIndex
+    self.version = None
+    self.idle = []
+    self.sessions = {}
+    self.size = 0
+    self.closed = False
+    self.condition = threading.Condition()
+    self.backgroundSlots = threading.Semaphore(max(self.maxSize - reservedSessions, 1))
+    self.background = set()
+
+  def start(self):
+    """Starts minSize sessions so the first requests do not pay the startup cost.
+
+    Sessions are started for each of the prewarm library sets and get those libraries loaded.
+    """
+    for i in range(max(self.minSize, len(self.prewarmLibraries))):
+      with self.condition:
+        if self.closed or self.size >= self.maxSize:
+          return
+        self.size += 1
+      try:
+        omc = self._create()
+      except Exception as ex:
+        log.warning("Failed to pre-start OMC session: {0}".format(str(ex)))
+        return
+      if i < len(self.prewarmLibraries):
+        try:
+          self._loadLibraries(omc, self.prewarmLibraries[i])
+        except Exception as ex:
+          log.warning("Failed to pre-load libraries {0}: {1}".format(self.prewarmLibraries[i], str(ex)))
+      self._putIdle(omc)
+
+  def acquire(self, timeout=None, libraries=(), interactive=True):
+    """Borrows a session from the pool with the (name, version) libraries loaded.
+
+    Prefers an idle session that has exactly these libraries loaded, then an idle
+    session without libraries, then a new session and last the least recently used
+    idle session. Raises LibraryLoadError if the libraries can not be loaded.
+    Background borrowers, not interactive, first wait for an unreserved session.
+    """
+    if timeout is None:
+      timeout = self.timeout
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if interactive:
+      return self._acquire(timeout, deadline, libraries)
+    with metrics.phase("waitSession"):
+      if not self.backgroundSlots.acquire(timeout=timeout):
+        raise OMCSessionPoolTimeout(timeout)
+    try:
+      omc = self._acquire(timeout, deadline, libraries)
+    except BaseException:
+      self.backgroundSlots.release()
+      raise
+    with self.condition:
+      self.background.add(omc)
+    return omc
+
+  def _acquire(self, timeout, deadline, libraries):
+    key = frozenset(libraries)
+    omc = None
+    with metrics.phase("waitSession"), self.condition:
+      while True:
+        if self.closed:
+          raise OMCSessionPoolClosed()
+        omc = self._takeIdle(key)
+        if omc is not None:
+          break
+        if self.size < self.maxSize:
+          self.size += 1
+          break
+        if self.idle:
+          omc = self.idle.pop(0)
+          break
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+          raise OMCSessionPoolTimeout(timeout)
+        self.condition.wait(remaining)
+
+    if omc is None:
+      with metrics.phase("startSession"):
+        omc = self._create()
+    elif not self._isHealthy(omc):
+      self._destroy(omc)
+      omc = self._create()
+    if self.sessions[omc].libraries != key:
+      try:
+        self._loadLibraries(omc, libraries)
+      except BaseException:
+        self.release(omc)
+        raise
+    # errors of the reset and the library loading are not the borrower's
+    omc.clearErrorString()
+    return omc
+
+  def release(self, omc, discard=False):
+    """Returns a borrowed session to the pool."""
+    with self.condition:
+      background = omc in self.background
+      self.background.discard(omc)
+    if background:
+      self.backgroundSlots.release()
+    info = self.sessions.get(omc)
+    if not discard and info:
+      info.useCount += 1
+      if self.maxUses and info.useCount >= self.maxUses:
+        log.debug("Recycling OMC session after {0} uses.".format(info.useCount))
+        discard = True
+    if not discard:
+      try:
+        self._reset(omc)
+      except Exception as ex:
+        log.warning("Failed to reset OMC session: {0}".format(str(ex)))
+        discard = True
+    if discard or self.closed:
+      self._destroy(omc)
+      with self.condition:
+        self.size -= 1
+        self.condition.notify()
+    else:
+      self._putIdle(omc)
+
+  @contextmanager
+  def session(self, timeout=None, libraries=(), interactive=True):
+    """Context manager that borrows a session and returns it afterwards.
+
+    The session is discarded if the block raises an exception.
+    """
+    omc = self.acquire(timeout, libraries, interactive)
+    try:
+      yield omc
+    except BaseException:
+      self.release(omc, discard=True)
+      raise
+    self.release(omc)
+
+  def close(self):
+    """Closes the pool and quits all idle sessions."""
+    with self.condition:
+      self.closed = True
+      idle = self.idle
+      self.idle = []
+      self.size -= len(idle)
+      self.condition.notify_all()
+    for omc in idle:
+      self._destroy(omc)
+
+  def _create(self):
+    """Starts a new session. The caller must have reserved a slot in size."""
+    try:
+      omc = self.factory()
+      workingDirectory = omc.sendCommand("cd()")
+      if self.version is None:
+        self.version = omc.sendCommand("getVersion()")
+    except Exception:
+      with self.condition:
+        self.size -= 1
+        self.condition.notify()
+      raise
+    self.sessions[omc] = SessionInfo(workingDirectory)
+    return omc
+
+  def _destroy(self, omc):
+    self.sessions.pop(omc, None)
+    try:
+      omc.close()
+    except Exception as ex:
+      log.debug("Failed to quit OMC session: {0}".format(str(ex)))
+
+  def _takeIdle(self, key):
+    """Takes the most recently used idle session with the library set key or without libraries."""
+    candidates = [omc for omc in self.idle if self.sessions[omc].libraries == key]
+    if not candidates:
+      candidates = [omc for omc in self.idle if not self.sessions[omc].libraries]
+    if not candidates:
+      return None
+    omc = candidates[-1]
+    self.idle.remove(omc)
+    return omc
+
+  def _putIdle(self, omc):
+    info = self.sessions.get(omc)
+    if info:
+      info.lastUsed = time.monotonic()
+    with self.condition:
+      self.idle.append(omc)
+      self.condition.notify()
+
+  def _isHealthy(self, omc):
+    info = self.sessions.get(omc)
+    if not info or not self.healthCheckInterval or time.monotonic() - info.lastUsed < self.healthCheckInterval:
+      return True
+    try:
+      return bool(omc.sendCommand("getVersion()"))
+    except Exception as ex:
+      log.warning("OMC session failed the health check: {0}".format(str(ex)))
+      return False
+
+  def _loadLibraries(self, omc, libraries):
+    """Replaces the libraries loaded in the session."""
+    info = self.sessions[omc]
+    if info.libraries:
+      self._clear(omc)
+    with metrics.phase("loadLibraries"):
+      loadLibraries(omc, libraries, self.libraryIndex)
+    if libraries:
+      info.libraries = frozenset(libraries)
+      info.classNames = self._getClassNames(omc)
+      info.sourceFiles = self._getSourceFiles(omc, info.classNames)
+      info.classCounts = self._getClassCounts(omc, info.classNames)
+
+  def _clear(self, omc):
+    info = self.sessions[omc]
+    omc.sendCommand("clear()")
+    info.libraries = frozenset()
+    info.classNames = ()
+    info.sourceFiles = ()
+    info.classCounts = ()
+
+  def _getClassNames(self, omc):
+    return toTuple(omc.sendCommand("getClassNames()"))
+
+  def _getSourceFiles(self, omc, classNames):
+    if not classNames:
+      return ()
+    return toTuple(omc.sendCommand("{{{0}}}".format(", ".join("getSourceFile({0})".format(c) for c in classNames))))
+
+  def _getClassCounts(self, omc, classNames):
+    """Returns the number of classes in each top level class, nested ones included, or None if OMC did not count them."""
+    if not classNames:
+      return ()
+    counts = toTuple(omc.sendCommand("{{{0}}}".format(", ".join("size(getClassNames({0}, recursive=true), 1)".format(c) for c in classNames))))
+    if len(counts) != len(classNames) or not all(isinstance(count, int) and not isinstance(count, bool) for count in counts):
+      return None
+    return counts
+
+  def _reset(self, omc):
+    """Resets the session state for the next borrower.
+
+    Classes loaded by the borrower are deleted so the libraries stay loaded. If the
+    borrower replaced a library class or added a class inside a library, e.g. with a
+    file starting with within Modelica.Blocks, the session is cleared instead.
+    """
+    info = self.sessions[omc]
+    omc.sendCommand("cd(\"{0}\")".format(info.workingDirectory.replace('\\','/')))
+    if not info.libraries:
+      omc.sendCommand("clear()")
+      return
+    if (info.classCounts is None or self._getSourceFiles(omc, info.classNames) != info.sourceFiles
+        or self._getClassCounts(omc, info.classNames) != info.classCounts):
+      log.debug("OMC session libraries were modified, clearing the session.")
+      self._clear(omc)
+      return
+    omc.sendCommands("deleteClass({0})".format(className) for className in self._getClassNames(omc) if className not in info.classNames)
+
+def toTuple(value):
+  """Converts the parsed OMC array to a tuple."""
+  if isinstance(value, (list, tuple)):
+    return tuple(value)
+  if value is None or value == "":
+    return ()
+  return (value,)
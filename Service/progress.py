@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Progress module. Follows the result file of a running simulation to report its progress and to cancel it,
+and streams the events of a job as server-sent events.
+"""
+
+import json
+import logging
+import threading
+from Service.results import ResultTail
+
+log = logging.getLogger(__name__)
+
+class ProgressMonitor:
+  """Polls the result file of the simulation of a job every interval seconds.
+
+  The simulation time of the last row written, between startTime and stopTime,
+  is reported as the progress of the job between the start and end progress.
+  If the job is cancelled onCancel is called on every poll until the simulation stops.
+  Without a job, outside of background jobs, the monitor does nothing.
+  """
+
+  def __init__(self, job, resultFile, startTime, stopTime, interval=0.5, onCancel=None, start=0.3, end=0.95):
+    self.job = job
+    self.tail = ResultTail(resultFile)
+    self.startTime = startTime
+    self.stopTime = stopTime
+    self.interval = interval
+    self.onCancel = onCancel
+    self.start = start
+    self.end = end
+    self.stopped = threading.Event()
+    self.thread = threading.Thread(target=self.run, name="OMWebServiceProgress", daemon=True)
+
+  def __enter__(self):
+    if self.job is not None:
+      self.job.resultFile = self.tail.fileName
+      self.thread.start()
+    return self
+
+  def __exit__(self, *excInfo):
+    if self.job is None:
+      return
+    self.stopped.set()
+    self.thread.join()
+    self.poll()
+    self.job.resultFile = ""
+
+  def run(self):
+    while not self.stopped.wait(self.interval):
+      if self.job.cancelled.is_set() and self.onCancel is not None:
+        try:
+          self.onCancel()
+        except Exception as ex:
+          log.warning("Failed to cancel the simulation of job {0}: {1}".format(self.job.id, str(ex)))
+      self.poll()
+
+  def poll(self):
+    rows = self.tail.poll()
+    if not rows or self.stopTime <= self.startTime:
+      return
+    fraction = min(max((rows[-1][0] - self.startTime) / (self.stopTime - self.startTime), 0.0), 1.0)
+    self.job.setProgress("Simulating", round(self.start + (self.end - self.start) * fraction, 3))
+
+def formatEvent(kind, data, eventId=None):
+  """Returns the server-sent event of the kind with the json data."""
+  lines = [] if eventId is None else ["id: {0}".format(eventId)]
+  lines.append("event: {0}".format(kind))
+  lines.append("data: {0}".format(json.dumps(data)))
+  return "\n".join(lines) + "\n\n"
+
+class EventStream:
+  """Server-sent events of a job after lastEventId, and the new rows of the variables while the result file is written.
+
+  The stream ends with a status event once the job is done.
+  """
+
+  def __init__(self, job, variables=(), lastEventId=0):
+    self.job = job
+    self.variables = list(variables)
+    self.lastEventId = lastEventId
+    self.tail = None
+    self.finished = False
+
+  def poll(self, timeout=0):
+    """Returns the new events, waiting up to timeout seconds for a job event."""
+    done = self.job.isDone()
+    messages = []
+    for eventId, kind, data in self.job.getEvents(self.lastEventId, None if done else timeout):
+      messages.append(formatEvent(kind, data, eventId))
+      self.lastEventId = eventId
+    if self.variables and self.job.resultFile and (self.tail is None or self.tail.fileName != self.job.resultFile):
+      self.tail = ResultTail(self.job.resultFile, self.variables)
+    if self.tail is not None:
+      rows = self.tail.poll()
+      if rows:
+        messages.append(formatEvent("rows", {"names": ["time"] + self.tail.names, "rows": rows}))
+    if done:
+      messages.append(formatEvent("status", self.job.toJson()))
+      self.finished = True
+    return messages
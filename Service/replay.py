@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Records the OMC sessions to a trace file and replays them without OpenModelica.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import itertools
+from collections import defaultdict
+from Service import metrics
+from Service.omc import OMC
+
+log = logging.getLogger(__name__)
+
+# upload directories created with tempfile.mkdtemp, they differ between recording and replay
+uploadDirectoryPattern = re.compile(r"(?:[A-Za-z]:)?[^\s\"'{}(),]*/tmp[a-z0-9_]{8}(?=[/\"']|$)")
+UPLOAD_DIRECTORY = "<upload>"
+
+def normalize(value):
+  """Replaces the upload directories in the strings of value."""
+  if isinstance(value, str):
+    return uploadDirectoryPattern.sub(UPLOAD_DIRECTORY, value)
+  if isinstance(value, (list, tuple)):
+    return [normalize(item) for item in value]
+  if isinstance(value, dict):
+    return {key: normalize(item) for key, item in value.items()}
+  return value
+
+def substitute(value, uploadDirectory):
+  """Replaces the normalized upload directories in the strings of value. Arrays become tuples as in OMPython."""
+  if isinstance(value, str):
+    return value.replace(UPLOAD_DIRECTORY, uploadDirectory)
+  if isinstance(value, list):
+    return tuple(substitute(item, uploadDirectory) for item in value)
+  if isinstance(value, dict):
+    return {key: substitute(item, uploadDirectory) for key, item in value.items()}
+  return value
+
+class TraceWriter:
+  """Appends the OMC expressions of all sessions as json lines to the trace file."""
+
+  def __init__(self, fileName):
+    directory = os.path.dirname(fileName)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    self.traceFile = open(fileName, "a")
+    self.lock = threading.Lock()
+    self.sessionIds = itertools.count(1)
+
+  def write(self, record):
+    line = json.dumps(record, default=str)
+    with self.lock:
+      self.traceFile.write(line + "\n")
+      self.traceFile.flush()
+
+  def close(self):
+    with self.lock:
+      self.traceFile.close()
+
+class RecordingSession:
+  """Wraps the OMC session and records every expression with its result and wall time."""
+
+  def __init__(self, omcSession, writer):
+    self.omcSession = omcSession
+    self.writer = writer
+    self.sessionId = next(writer.sessionIds)
+
+  def __getattr__(self, name):
+    # e.g. the omc process of the session
+    if name == "omcSession":
+      raise AttributeError(name)
+    return getattr(self.omcSession, name)
+
+  def sendExpression(self, expression, parsed=True):
+    start = time.time()
+    startCounter = time.perf_counter()
+    try:
+      result = self.omcSession.sendExpression(expression, parsed)
+    except Exception as ex:
+      self.writer.write({"session": self.sessionId, "time": start, "expression": expression, "parsed": parsed,
+                         "exception": str(ex), "seconds": time.perf_counter() - startCounter})
+      raise
+    self.writer.write({"session": self.sessionId, "time": start, "expression": expression, "parsed": parsed,
+                       "result": result, "seconds": time.perf_counter() - startCounter})
+    return result
+
+def recordingFactory(factory, writer):
+  """Returns a session factory whose OMC sessions are recorded by writer."""
+  def createRecordedOMC():
+    omc = factory()
+    omc.omcSession = RecordingSession(omc.omcSession, writer)
+    return omc
+  return createRecordedOMC
+
+class ReplayOMC(OMC):
+  """Answers the OMC expressions with the results recorded in a trace file.
+
+  The expressions are matched after replacing the upload directories, the recorded
+  results of an expression are returned in turn and the recorded wall time times
+  timeScale is waited. Unknown expressions get the result of the same command.
+  """
+  responses = {}
+  commandResponses = {}
+  timeScale = 1.0
+  lock = threading.Lock()
+
+  @classmethod
+  def load(cls, fileName, timeScale=1.0):
+    """Loads the trace file for all replay sessions."""
+    responses = defaultdict(list)
+    commandResponses = defaultdict(list)
+    with open(fileName) as traceFile:
+      for line in traceFile:
+        record = json.loads(line)
+        if "exception" in record or record["expression"] == "quit()":
+          continue
+        response = (normalize(record["result"]), record["seconds"])
+        responses[normalize(record["expression"])].append(response)
+        commandResponses[metrics.getCommandName(record["expression"])].append(response)
+    cls.responses = {key: itertools.cycle(values) for key, values in responses.items()}
+    cls.commandResponses = {key: itertools.cycle(values) for key, values in commandResponses.items()}
+    cls.timeScale = timeScale
+    log.info("Loaded {0} OMC expressions from {1}.".format(len(cls.responses), fileName))
+
+  def __init__(self):
+    super().__init__(omcSession=self)
+    self.workingDirectory = os.getcwd()
+
+  def getProcessId(self):
+    """Replayed sessions have no omc process."""
+    return None
+
+  def sendExpression(self, expression, parsed=True):
+    if expression == "quit()":
+      return None
+    key = normalize(expression)
+    with self.lock:
+      responses = self.responses.get(key) or self.commandResponses.get(metrics.getCommandName(expression))
+      result, seconds = next(responses) if responses else (True, 0.0)
+    if not responses:
+      log.warning("No recorded result for the OMC expression {0}.".format(expression))
+    if self.timeScale and seconds:
+      time.sleep(seconds * self.timeScale)
+    if metrics.getCommandName(expression) == "cd" and expression != "cd()":
+      self.workingDirectory = expression[len("cd(\""):-len("\")")]
+    result = substitute(result, self.workingDirectory)
+    self.createResultFiles(result)
+    return result
+
+  def createResultFiles(self, result):
+    """Creates empty files for the result and FMU files of the replayed result so they can be downloaded."""
+    fileNames = result.values() if isinstance(result, dict) else [result]
+    for fileName in fileNames:
+      if (isinstance(fileName, str) and fileName.startswith(self.workingDirectory + "/")
+          and os.path.splitext(fileName)[1] in (".mat", ".csv", ".fmu") and not os.path.exists(fileName)):
+        with open(fileName, "wb"):
+          pass
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Simulation result module. Reads OpenModelica MAT v4 result files with memory mapping.
+"""
+
+import os
+import fnmatch
+import logging
+import threading
+import collections
+import numpy
+
+log = logging.getLogger(__name__)
+
+# number of parsed result files kept open
+MAT_RESULT_CACHE_SIZE = 32
+
+# MAT v4 precision digit to numpy type
+matPrecisions = {0: "f8", 1: "f4", 2: "i4", 3: "i2", 4: "u2", 5: "u1"}
+
+class ResultFileError(Exception):
+  """Raised when a result file can not be read."""
+
+  def __init__(self, message, code=400):
+    super().__init__(message)
+    self.code = code
+
+class MatResult:
+  """OpenModelica MAT v4 result file.
+
+  The variable names and data info are read once; the data matrices are memory
+  mapped so only the pages of the requested variables are read from disk.
+  A growing file is still written by the simulation, its data_2 holds the
+  complete rows written so far and is mapped again by refresh.
+  """
+
+  def __init__(self, fileName, growing=False):
+    self.fileName = fileName
+    self.growing = growing
+    self.matrices = self._readMatrices(fileName)
+    self.transposed = False
+    for name in ("Aclass", "name", "dataInfo", "data_2"):
+      if name not in self.matrices:
+        raise ResultFileError("{0} is not an OpenModelica result file, the {1} matrix is missing.".format(os.path.basename(fileName), name))
+    self.transposed = "binTrans" in self._readStrings("Aclass")
+    names = self._readStrings("name")
+    dataInfo = self._readMatrix("dataInfo")
+    self.variables = {}
+    for index, name in enumerate(names):
+      self.variables[name] = (int(dataInfo[index][0]), int(dataInfo[index][1]))
+    self.data1 = self._readMatrix("data_1") if "data_1" in self.matrices else None
+    self.data2 = self._readMatrix("data_2")
+
+  def _readMatrices(self, fileName):
+    """Returns the header of each matrix: name -> (data offset, mrows, ncols, dtype)."""
+    matrices = {}
+    fileSize = os.path.getsize(fileName)
+    with open(fileName, "rb") as matFile:
+      offset = 0
+      while offset + 20 <= fileSize:
+        matFile.seek(offset)
+        header = numpy.frombuffer(matFile.read(20), dtype="<i4")
+        if header[0] > 9999 or header[0] < 0:
+          header = header.byteswap()
+          byteOrder = ">"
+        else:
+          byteOrder = "<"
+        matType, mrows, ncols, imagf, nameLength = (int(value) for value in header)
+        if imagf or mrows < 0 or ncols < 0 or nameLength <= 0:
+          raise ResultFileError("Invalid matrix header in {0}.".format(os.path.basename(fileName)))
+        precision = (matType % 100) // 10
+        if precision not in matPrecisions:
+          raise ResultFileError("Unsupported matrix type {0} in {1}.".format(matType, os.path.basename(fileName)))
+        name = matFile.read(nameLength).rstrip(b"\0").decode("ascii", "replace")
+        dtype = numpy.dtype(byteOrder + matPrecisions[precision])
+        dataOffset = offset + 20 + nameLength
+        if self.growing and name == "data_2" and mrows:
+          # the simulation appends the rows and writes their count at the end
+          matrices[name] = (dataOffset, mrows, (fileSize - dataOffset) // (mrows * dtype.itemsize), dtype)
+          break
+        offset = dataOffset + mrows * ncols * dtype.itemsize
+        if offset > fileSize:
+          raise ResultFileError("The {0} matrix of {1} is truncated.".format(name, os.path.basename(fileName)))
+        matrices[name] = (dataOffset, mrows, ncols, dtype)
+    return matrices
+
+  def refresh(self):
+    """Maps the rows appended to the data_2 of a growing file since it was read."""
+    dataOffset, mrows, _, dtype = self.matrices["data_2"]
+    ncols = (os.path.getsize(self.fileName) - dataOffset) // (mrows * dtype.itemsize)
+    self.matrices["data_2"] = (dataOffset, mrows, ncols, dtype)
+    self.data2 = self._readMatrix("data_2")
+
+  def _readMatrix(self, name):
+    """Memory maps the matrix with one row per string, variable or time point.
+
+    The column major matrices are mapped transposed. In binTrans files, except
+    Aclass, that gives the wanted layout; binNormal files need the transpose.
+    """
+    dataOffset, mrows, ncols, dtype = self.matrices[name]
+    if not mrows or not ncols:
+      matrix = numpy.zeros((ncols, mrows), dtype=dtype)
+    else:
+      matrix = numpy.memmap(self.fileName, dtype=dtype, mode="r", offset=dataOffset, shape=(ncols, mrows))
+    if self.transposed and name != "Aclass":
+      return matrix
+    return matrix.T
+
+  def _readStrings(self, name):
+    strings = self._readMatrix(name)
+    return [bytes(numpy.asarray(row, dtype="u1")).rstrip(b"\0 ").decode("utf-8", "replace") for row in strings]
+
+  def getTime(self):
+    return numpy.asarray(self.data2[:, 0], dtype="f8")
+
+  def getNames(self, patterns=None):
+    """Returns the variable names matching any of the fnmatch patterns, all if patterns is empty."""
+    if not patterns:
+      return sorted(self.variables)
+    names = []
+    for pattern in patterns:
+      if pattern in self.variables:
+        matches = [pattern]
+      else:
+        matches = sorted(fnmatch.filter(self.variables, pattern))
+      names.extend(name for name in matches if name not in names)
+    return names
+
+  def getValues(self, name, rows=slice(None)):
+    """Returns the values of the variable at the data_2 rows."""
+    matrixIndex, column = self.variables[name]
+    sign = -1.0 if column < 0 else 1.0
+    column = abs(column) - 1
+    if matrixIndex == 1 and self.data1 is not None:
+      length = len(self.data2[rows, 0])
+      return numpy.full(length, sign * float(self.data1[0, column]))
+    return sign * numpy.asarray(self.data2[rows, column], dtype="f8")
+
+  def getRows(self, startTime=None, stopTime=None):
+    """Returns the slice of the data_2 rows inside the time window."""
+    time = self.data2[:, 0]
+    start = 0 if startTime is None else int(numpy.searchsorted(time, startTime, side="left"))
+    stop = len(time) if stopTime is None else int(numpy.searchsorted(time, stopTime, side="right"))
+    return slice(start, stop)
+
+_matResults = collections.OrderedDict()
+_matResultsLock = threading.Lock()
+
+def openMatResult(fileName):
+  """Returns the MatResult of the file. The parsed index is cached until the file changes."""
+  try:
+    stat = os.stat(fileName)
+  except OSError:
+    raise ResultFileError("Result file {0} not found.".format(os.path.basename(fileName)), 404)
+  key = (os.path.normpath(fileName), stat.st_mtime_ns, stat.st_size)
+  with _matResultsLock:
+    result = _matResults.get(key)
+    if result is not None:
+      _matResults.move_to_end(key)
+      return result
+  result = MatResult(fileName)
+  with _matResultsLock:
+    _matResults[key] = result
+    while len(_matResults) > MAT_RESULT_CACHE_SIZE:
+      _matResults.popitem(last=False)
+  return result
+
+def forgetMatResults(path):
+  """Drops the cached MatResults of the file or of the files below the directory, closing their memory maps."""
+  path = os.path.normpath(path)
+  with _matResultsLock:
+    for key in list(_matResults):
+      if key[0] == path or key[0].startswith(path + os.sep):
+        del _matResults[key]
+
+def readVariables(fileName, patterns=None, startTime=None, stopTime=None):
+  """Returns the time and the values of the variables matching the patterns in the time window."""
+  result = openMatResult(fileName)
+  rows = result.getRows(startTime, stopTime)
+  names = result.getNames(patterns)
+  time = result.getTime()[rows]
+  values = numpy.empty((len(names), len(time)))
+  for index, name in enumerate(names):
+    values[index] = result.getValues(name, rows)
+  return time, names, values
+
+class ResultTail:
+  """Follows a mat or csv result file while the simulation writes it.
+
+  poll returns the rows of the variables appended since the last poll, the
+  time first. The file is opened once it holds its header.
+  """
+
+  def __init__(self, fileName, names=()):
+    self.fileName = fileName
+    self.names = list(names)
+    self.result = None
+    self.columns = None
+    self.offset = 0
+    self.row = 0
+
+  def poll(self):
+    """Returns the new rows as a list of [time, value, ...] lists, empty if there are none yet."""
+    try:
+      if self.fileName.endswith(".csv"):
+        return self._pollCsv()
+      return self._pollMat()
+    except (OSError, ResultFileError, ValueError, IndexError):
+      return []
+
+  def _pollMat(self):
+    if self.result is None:
+      self.result = MatResult(self.fileName, growing=True)
+      if not self.result.transposed:
+        raise ResultFileError("{0} is not written row by row.".format(os.path.basename(self.fileName)))
+      self.names = [name for name in self.names if name in self.result.variables]
+    else:
+      self.result.refresh()
+    rows = slice(self.row, len(self.result.data2))
+    self.row = rows.stop
+    values = [self.result.getTime()[rows]] + [self.result.getValues(name, rows) for name in self.names]
+    return numpy.column_stack(values).tolist()
+
+  def _pollCsv(self):
+    with open(self.fileName, "rb") as csvFile:
+      csvFile.seek(self.offset)
+      data = csvFile.read()
+    # only complete lines, the last one may still be written
+    data = data[:data.rfind(b"\n") + 1]
+    self.offset += len(data)
+    lines = data.decode("utf-8", "replace").splitlines()
+    if self.columns is None and lines:
+      header = [name.strip().strip("\"") for name in lines.pop(0).split(",")]
+      self.columns = [0] + [header.index(name) for name in self.names if name in header]
+      self.names = [header[column] for column in self.columns[1:]]
+    if self.columns is None:
+      return []
+    rows = []
+    for line in lines:
+      fields = line.split(",")
+      rows.append([float(fields[column]) for column in self.columns])
+    return rows
+
+def downsampleMinMax(time, values, points):
+  """Keeps the minimum and the maximum of each of points/2 buckets, for all variables at once.
+
+  values has one row per variable. Returns the time and values arrays with one row per variable.
+  """
+  count = len(time)
+  if count <= points:
+    return numpy.broadcast_to(time, values.shape).copy(), values
+  starts = numpy.linspace(0, count, max(points // 2, 1) + 1).astype(numpy.intp)[:-1]
+  lengths = numpy.diff(numpy.append(starts, count))
+  positions = numpy.arange(count)
+
+  def findIndices(extremes):
+    """Returns the first index of each bucket that holds the bucket extreme."""
+    matches = numpy.where(values == numpy.repeat(extremes, lengths, axis=1), positions, count)
+    return numpy.minimum(numpy.minimum.reduceat(matches, starts, axis=1), starts + lengths - 1)
+
+  minimumIndices = findIndices(numpy.minimum.reduceat(values, starts, axis=1))
+  maximumIndices = findIndices(numpy.maximum.reduceat(values, starts, axis=1))
+  # keep the two points of each bucket in time order
+  indices = numpy.empty((len(values), 2 * len(starts)), dtype=numpy.intp)
+  indices[:, 0::2] = numpy.minimum(minimumIndices, maximumIndices)
+  indices[:, 1::2] = numpy.maximum(minimumIndices, maximumIndices)
+  return time[indices], numpy.take_along_axis(values, indices, axis=1)
+
+def downsampleLTTB(time, values, points):
+  """Largest-Triangle-Three-Buckets downsampling to points points, for all variables at once.
+
+  values has one row per variable. Returns the time and values arrays with one row per variable.
+  """
+  count = len(time)
+  if count <= points or points < 3:
+    return numpy.broadcast_to(time, values.shape).copy(), values
+  rows = numpy.arange(len(values))
+  indices = numpy.empty((len(values), points), dtype=numpy.intp)
+  indices[:, 0] = 0
+  indices[:, -1] = count - 1
+  edges = numpy.floor(numpy.linspace(1, count - 1, points - 1)).astype(numpy.intp)
+  selected = numpy.zeros(len(values), dtype=numpy.intp)
+  for bucket in range(points - 2):
+    start, stop = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+    # average of the next bucket, or the last point for the last bucket
+    nextStart, nextStop = stop, max(edges[bucket + 2] if bucket + 2 < len(edges) else count, stop + 1)
+    nextTime = time[nextStart:nextStop].mean()
+    nextValues = values[:, nextStart:nextStop].mean(axis=1)
+    selectedTime = time[selected]
+    selectedValues = values[rows, selected]
+    areas = numpy.abs((selectedTime - nextTime)[:, None] * (values[:, start:stop] - selectedValues[:, None])
+                      - (selectedTime[:, None] - time[None, start:stop]) * (nextValues - selectedValues)[:, None])
+    selected = start + areas.argmax(axis=1)
+    indices[:, bucket + 1] = selected
+  return time[indices], numpy.take_along_axis(values, indices, axis=1)
+
+downsamplers = {"minmax": downsampleMinMax, "lttb": downsampleLTTB}
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+CPU scheduler module. Hands out the cores of the machine to compilation and simulation phases.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from Service import metrics
+
+log = logging.getLogger(__name__)
+
+COMPILE = "compile"
+SIMULATE = "simulate"
+
+def getAvailableCores():
+  """Returns the ids of the cores this process may run on."""
+  if hasattr(os, "sched_getaffinity"):
+    return sorted(os.sched_getaffinity(0))
+  return list(range(os.cpu_count() or 1))
+
+def setAffinity(pid, cores):
+  """Restricts the process to the cores, where the platform supports it."""
+  if pid is None or not cores or not hasattr(os, "sched_setaffinity"):
+    return
+  try:
+    os.sched_setaffinity(pid, cores)
+  except OSError as ex:
+    log.warning("Failed to pin process {0} to the cores {1}: {2}".format(pid, cores, str(ex)))
+
+class CPUScheduler:
+  """Admits compilation and simulation phases to the free cores of the machine.
+
+  Each phase holds at least one core. A compilation takes up to compileMaxCores of
+  the idle cores for a parallel make, and all compilations together hold at most
+  compileMaxShare of the cores so simulations are not starved. Phases that do not
+  fit wait in first come, first served order per kind. With pin the cores are
+  returned so the processes of the phase can be pinned to them.
+  """
+
+  def __init__(self, cores=0, compileMaxCores=0, compileMaxShare=1.0, pin=False):
+    available = getAvailableCores()
+    self.cores = available[:cores] if 0 < cores < len(available) else available
+    self.compileMaxCores = compileMaxCores or len(self.cores)
+    self.compileLimit = max(int(len(self.cores) * compileMaxShare), 1)
+    self.pin = pin
+    self.free = list(self.cores)
+    self.inUse = {COMPILE: 0, SIMULATE: 0}
+    self.waiting = {COMPILE: deque(), SIMULATE: deque()}
+    self.condition = threading.Condition()
+
+  @contextmanager
+  def reserve(self, kind, maxCores=1):
+    """Waits for a free core and holds up to maxCores of the free cores for the with block.
+
+    Yields the list of reserved core ids.
+    """
+    ticket = object()
+    with metrics.phase("waitCores"), self.condition:
+      self.waiting[kind].append(ticket)
+      while self.waiting[kind][0] is not ticket or not self._getCount(kind, maxCores):
+        self.condition.wait()
+      self.waiting[kind].popleft()
+      count = self._getCount(kind, maxCores)
+      cores, self.free = self.free[:count], self.free[count:]
+      self.inUse[kind] += count
+      metrics.coresInUse.set(self.inUse[kind], kind)
+      # the next waiter of this kind may fit in the remaining cores
+      self.condition.notify_all()
+    try:
+      yield cores
+    finally:
+      with self.condition:
+        self.free.extend(cores)
+        self.inUse[kind] -= count
+        metrics.coresInUse.set(self.inUse[kind], kind)
+        self.condition.notify_all()
+
+  def reserveCompile(self):
+    return self.reserve(COMPILE, self.compileMaxCores)
+
+  def reserveSimulate(self):
+    return self.reserve(SIMULATE, 1)
+
+  def _getCount(self, kind, maxCores):
+    count = min(maxCores, len(self.free))
+    if kind == COMPILE:
+      count = min(count, self.compileLimit - self.inUse[COMPILE])
+    return max(count, 0)
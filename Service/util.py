@@ -29,9 +29,13 @@
 # See the full OSMC Public License conditions for more details.
 
 """
-OpenModelica kernel module. Communicates with OM compiler.
+Helper functions. Converts values to Modelica, hashes files and json, embeds json and finds and kills child processes.
 """
 
+import os
+import json
+import signal
+import hashlib
 import logging
 
 log = logging.getLogger(__name__)
@@ -41,4 +45,61 @@ def pythonBoolToModelicaBool(value):
   if value:
     return "true"
   else:
-    return "false"
\ No newline at end of file
+    return "false"
+
+def hashFile(fileName):
+  """Returns the SHA-256 hex digest of the file contents."""
+  sha256 = hashlib.sha256()
+  with open(fileName, "rb") as file:
+    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+      sha256.update(chunk)
+  return sha256.hexdigest()
+
+def hashJson(value):
+  """Returns the SHA-256 hex digest of the canonical json of the value."""
+  return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def embedJson(value, name, data):
+  """Returns the json of the dict value with the json object text or bytes data added as name.
+
+  data is embedded as it is after checking that it is exactly one json object. Raises ValueError otherwise.
+  """
+  if not isinstance(value, dict):
+    raise TypeError("Only a dict can embed json, not {0}.".format(type(value).__name__))
+  if isinstance(data, bytes):
+    data = data.decode()
+  data = data.strip()
+  embedded, end = json.JSONDecoder().raw_decode(data)
+  if not isinstance(embedded, dict) or end != len(data):
+    raise ValueError("{0} is not a json object.".format(name))
+  valueJson = json.dumps(value)
+  return valueJson[:-1] + (", " if value else "") + json.dumps(name) + ": " + data + "}"
+
+def getChildProcessIds(pid):
+  """Returns the ids of the descendants of the process, children first. Empty where /proc is not available."""
+  parents = {}
+  try:
+    processIds = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+  except OSError:
+    return []
+  for processId in processIds:
+    try:
+      with open("/proc/{0}/stat".format(processId)) as statFile:
+        # the command name in parentheses may contain spaces
+        parents[processId] = int(statFile.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+      pass
+  children = []
+  parentIds = [pid]
+  while parentIds:
+    parentIds = [processId for processId, parentId in parents.items() if parentId in parentIds]
+    children.extend(parentIds)
+  return children
+
+def killChildProcesses(pid):
+  """Kills the descendants of the process, e.g. the compiler and the simulation started by omc."""
+  for childId in getChildProcessIds(pid):
+    try:
+      os.kill(childId, signal.SIGKILL)
+    except OSError:
+      pass
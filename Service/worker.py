@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Worker module. Runs the jobs of the shared job queue, on any node that sees the database and TMPDIR.
+
+  python Service/worker.py
+
+Each of the JOB_WORKERS threads claims a job, runs it like the API node would and renews its lease
+every JOB_QUEUE_HEARTBEAT seconds, sending the progress and the events of the job along.
+"""
+
+import os
+import uuid
+import signal
+import socket
+import sqlite3
+import logging
+import threading
+from Service import metrics
+from Service.jobs import Job, runJob
+
+log = logging.getLogger(__name__)
+
+class Worker:
+  """Runs the jobs of the job queue on threads threads."""
+
+  def __init__(self, app, queue, threads=1, heartbeat=1, pollInterval=0.5, workerId=None):
+    self.app = app
+    self.queue = queue
+    self.threads = max(threads, 1)
+    self.heartbeat = heartbeat
+    self.pollInterval = pollInterval
+    self.workerId = workerId or "{0}-{1}-{2}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+    self.stopped = threading.Event()
+    self.runners = []
+
+  def start(self):
+    for index in range(self.threads):
+      runner = threading.Thread(target=self._loop, name="OMWebServiceWorker{0}".format(index), daemon=True)
+      runner.start()
+      self.runners.append(runner)
+
+  def stop(self):
+    """Stops claiming jobs. The running jobs are finished."""
+    self.stopped.set()
+
+  def join(self):
+    for runner in self.runners:
+      runner.join()
+
+  def _loop(self):
+    while not self.stopped.is_set():
+      try:
+        row = self.queue.claim(self.workerId)
+      except sqlite3.Error:
+        log.exception("Claiming a job failed.")
+        row = None
+      if row is None:
+        self.stopped.wait(self.pollInterval)
+        continue
+      self.run(row)
+
+  def run(self, row):
+    """Runs the claimed job while a thread renews its lease, then stores its result."""
+    timings = metrics.Timings()
+    timings.phases = dict(row["timings"])
+    job = Job(row["kind"], row["payload"], timings)
+    job.id = row["id"]
+    job.created = row["created"]
+    job.lastEventId = row["lastEventId"]
+    if row["cancelled"]:
+      job.cancelled.set()
+    state = {"lastEventId": row["lastEventId"]}
+    renewer = threading.Thread(target=self._renew, args=(job, state), name="OMWebServiceLease", daemon=True)
+    renewer.start()
+    runJob(self.app, job)
+    renewer.join()
+    try:
+      if not self.queue.finish(job.id, self.workerId, job.status, job.result, job.timings.toJson(), job.getEvents(state["lastEventId"], 0)):
+        log.warning("Job {0} was {1} but its lease was lost, the result is dropped.".format(job.id, job.status))
+    except sqlite3.Error:
+      log.exception("Storing the result of job {0} failed.".format(job.id))
+
+  def _renew(self, job, state):
+    """Renews the lease of the job until it is done. Cancels the job when it is cancelled or the lease is lost."""
+    while not job.done.wait(self.heartbeat):
+      events = job.getEvents(state["lastEventId"], 0)
+      try:
+        cancelled = self.queue.renew(job.id, self.workerId, job.phase, job.progress, job.resultFile, events)
+      except sqlite3.Error:
+        log.exception("Renewing the lease of job {0} failed.".format(job.id))
+        continue
+      if events:
+        state["lastEventId"] = events[-1][0]
+      if cancelled is None:
+        log.warning("Lost the lease of job {0}, cancelling it.".format(job.id))
+        job.cancel()
+        return
+      if cancelled and not job.cancelled.is_set():
+        job.cancel()
+
+def main():
+  """Runs a worker process for the job queue of JOB_QUEUE_DATABASE until it is terminated."""
+  from Service.app import createApp
+  app = createApp()
+  queue = app.extensions.get("jobQueue")
+  if queue is None:
+    raise SystemExit("Set JOB_QUEUE_DATABASE to run a worker.")
+  worker = Worker(app, queue, threads=app.config['JOB_WORKERS'], heartbeat=app.config['JOB_QUEUE_HEARTBEAT'],
+                  pollInterval=app.config['JOB_QUEUE_POLL_INTERVAL'])
+  signal.signal(signal.SIGTERM, lambda signalNumber, frame: worker.stop())
+  worker.start()
+  try:
+    while not worker.stopped.wait(1):
+      pass
+  except KeyboardInterrupt:
+    worker.stop()
+  worker.join()
+
+if __name__ == "__main__":
+  main()
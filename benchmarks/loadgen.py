@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Replays a mix of requests at a target rate, against a running service or against the app with replayed OMC sessions.
+
+  python -m benchmarks.loadgen --trace trace.jsonl --rate 20 --duration 60 --output load.json
+  python -m benchmarks.loadgen --url http://localhost:8080 --mix mix.json --rate 5
+
+The mix is a json list of requests with a weight, e.g.
+  [{"endpoint": "simulate", "weight": 3, "metadata": "a.metadata.json", "zip": "a.zip"}, {"endpoint": "version", "weight": 1}]
+Requests are sent at exponentially distributed intervals and their latency is measured from
+the time they were due, so a saturated service shows up as growing latencies.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import threading
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from Service.app import createApp
+from benchmarks.run import getStatistics
+
+resources = Path(__file__).parent.parent / "tests" / "resources"
+defaultMix = [
+  {"endpoint": "simulate", "weight": 3, "metadata": str(resources / "FileSimulation.metadata.json"), "zip": str(resources / "FileSimulation.zip")},
+  {"endpoint": "modelInstance", "weight": 2, "metadata": str(resources / "FileModelInstance.metadata.json"), "zip": str(resources / "FileModelInstance.zip")},
+  {"endpoint": "version", "weight": 1}
+]
+
+def readMix(fileName):
+  """Reads the mix and the files of its requests."""
+  mix = defaultMix
+  if fileName:
+    with open(fileName) as mixFile:
+      mix = json.load(mixFile)
+  for request in mix:
+    request["files"] = {}
+    if request.get("metadata"):
+      request["files"]["MetadataJson"] = ("metadata.json", Path(request["metadata"]).read_bytes())
+    if request.get("zip"):
+      request["files"]["ModelZip"] = ("model.zip", Path(request["zip"]).read_bytes())
+  return mix
+
+def encodeMultipart(files):
+  boundary = uuid.uuid4().hex
+  body = b""
+  for name, (fileName, data) in files.items():
+    body += "--{0}\r\nContent-Disposition: form-data; name=\"{1}\"; filename=\"{2}\"\r\nContent-Type: application/octet-stream\r\n\r\n".format(
+      boundary, name, fileName).encode() + data + b"\r\n"
+  body += "--{0}--\r\n".format(boundary).encode()
+  return body, "multipart/form-data; boundary={0}".format(boundary)
+
+class HTTPTarget:
+  """Sends the requests to a running service."""
+
+  def __init__(self, url):
+    self.url = url.rstrip("/")
+
+  def send(self, request):
+    url = "{0}/api/{1}".format(self.url, request["endpoint"])
+    if request["files"]:
+      body, contentType = encodeMultipart(request["files"])
+      httpRequest = urllib.request.Request(url, data=body, headers={"Content-Type": contentType})
+    else:
+      httpRequest = urllib.request.Request(url)
+    try:
+      with urllib.request.urlopen(httpRequest) as response:
+        response.read()
+        return response.status
+    except urllib.error.HTTPError as ex:
+      return ex.code
+
+class AppTarget:
+  """Sends the requests to the app in this process, with the OMC sessions replayed from a trace."""
+
+  def __init__(self, settings):
+    self.app = createApp(settings)
+    self.clients = threading.local()
+
+  def send(self, request):
+    if not hasattr(self.clients, "client"):
+      self.clients.client = self.app.test_client()
+    data = {name: (io.BytesIO(content), fileName) for name, (fileName, content) in request["files"].items()}
+    if data:
+      return self.clients.client.post("/api/" + request["endpoint"], data=data).status_code
+    return self.clients.client.get("/api/" + request["endpoint"]).status_code
+
+  def close(self):
+    self.app.extensions["omcSessionPool"].close()
+    self.app.extensions["jobManager"].shutdown()
+
+def generateLoad(target, mix, rate, duration, workers, seed=None):
+  """Sends requests of the mix at rate per second for duration seconds. Returns the statistics per endpoint."""
+  generator = random.Random(seed)
+  weights = [request.get("weight", 1) for request in mix]
+  latencies = defaultdict(list)
+  failures = defaultdict(int)
+  lock = threading.Lock()
+
+  def send(request, due):
+    status = target.send(request)
+    latency = time.perf_counter() - due
+    with lock:
+      latencies[request["endpoint"]].append(latency)
+      if status >= 400:
+        failures[request["endpoint"]] += 1
+
+  start = time.perf_counter()
+  due = start
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    while due - start < duration:
+      delay = due - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      executor.submit(send, generator.choices(mix, weights)[0], due)
+      due += generator.expovariate(rate)
+  seconds = time.perf_counter() - start
+  results = {}
+  for endpoint, endpointLatencies in latencies.items():
+    results[endpoint] = getStatistics(endpointLatencies, seconds)
+    results[endpoint]["failures"] = failures[endpoint]
+  return {"rate": rate, "achievedRate": sum(len(values) for values in latencies.values()) / seconds, "endpoints": results}
+
+def main():
+  parser = argparse.ArgumentParser(description="Replays a mix of OMWebService requests at a target rate.")
+  parser.add_argument("--url", help="url of a running service, otherwise the app runs in this process")
+  parser.add_argument("--trace", help="OMC trace recorded with OMC_TRACE_FILE to replay in this process")
+  parser.add_argument("--timeScale", type=float, default=1.0, help="scale of the recorded OMC wall times")
+  parser.add_argument("--mix", help="json file with the requests and their weights")
+  parser.add_argument("--rate", type=float, default=10, help="requests per second")
+  parser.add_argument("--duration", type=float, default=30, help="seconds to generate load")
+  parser.add_argument("--workers", type=int, default=64, help="requests in flight at most")
+  parser.add_argument("--seed", type=int, help="seed of the request intervals and mix")
+  parser.add_argument("--output", help="json file to write the results to, stdout if not given")
+  arguments = parser.parse_args()
+
+  mix = readMix(arguments.mix)
+  if arguments.url:
+    target = HTTPTarget(arguments.url)
+    results = generateLoad(target, mix, arguments.rate, arguments.duration, arguments.workers, arguments.seed)
+  else:
+    if not arguments.trace:
+      parser.error("--trace is needed without --url")
+    with tempfile.TemporaryDirectory(prefix="OMWebService-load-") as directory:
+      target = AppTarget({
+        "TMPDIR": os.path.join(directory, "tmp"),
+        "CACHE_DIR": os.path.join(directory, "cache"),
+        "LIBRARY_INDEX_FILE": os.path.join(directory, "cache", "libraries.json"),
+        "OMC_REPLAY_TRACE_FILE": arguments.trace,
+        "OMC_REPLAY_TIME_SCALE": arguments.timeScale,
+        "OMC_POOL_PREWARM_LIBRARIES": [],
+        "COMPILED_MODEL_CACHE_SIZE": 0
+      })
+      try:
+        results = generateLoad(target, mix, arguments.rate, arguments.duration, arguments.workers, arguments.seed)
+      finally:
+        target.close()
+
+  for endpoint, statistics in results["endpoints"].items():
+    print("{0:<14} {1:>6} requests  p50 {2:>8.1f} ms  p99 {3:>8.1f} ms  {4} failed".format(
+      endpoint, statistics["requests"], statistics["p50"] * 1000, statistics["p99"] * 1000, statistics["failures"]), file=sys.stderr)
+  if arguments.output:
+    with open(arguments.output, "w") as outputFile:
+      json.dump(results, outputFile, indent=2)
+  else:
+    json.dump(results, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Writes OpenModelica MAT v4 result files for the benchmarks and the tests.
+"""
+
+import numpy
+
+def writeMatrix(matFile, name, matrix, matType):
+  """Writes the 2D matrix in MAT v4 column major order."""
+  matrix = numpy.asarray(matrix)
+  header = numpy.array([matType, matrix.shape[0], matrix.shape[1], 0, len(name) + 1], dtype="<i4")
+  matFile.write(header.tobytes())
+  matFile.write(name.encode() + b"\0")
+  matFile.write(numpy.asfortranarray(matrix).tobytes(order="F"))
+
+def writeStrings(matFile, name, strings):
+  """Writes the strings as the columns of a text matrix."""
+  length = max(len(string) for string in strings)
+  matrix = numpy.array([list(string.ljust(length, "\0").encode()) for string in strings], dtype="u1")
+  writeMatrix(matFile, name, matrix.T, 51)
+
+def writeMatResult(fileName, time, variables, parameters=None):
+  """Writes a binTrans result file with the time series variables and the constant parameters."""
+  parameters = parameters or {}
+  names = ["time"] + list(variables) + list(parameters)
+  dataInfo = [[2, 1, 0, -1]]
+  dataInfo += [[2, index + 2, 0, -1] for index in range(len(variables))]
+  dataInfo += [[1, index + 2, 0, 0] for index in range(len(parameters))]
+  data1 = [[time[0], time[-1]]] + [[value, value] for value in parameters.values()]
+  data2 = [time] + list(variables.values())
+  with open(fileName, "wb") as matFile:
+    aclass = ["Atrajectory", "1.1", "", "binTrans"]
+    length = max(len(string) for string in aclass)
+    writeMatrix(matFile, "Aclass", numpy.array([list(string.ljust(length, "\0").encode()) for string in aclass], dtype="u1"), 51)
+    writeStrings(matFile, "name", names)
+    writeStrings(matFile, "description", ["" for _ in names])
+    writeMatrix(matFile, "dataInfo", numpy.array(dataInfo, dtype="<i4").T, 20)
+    writeMatrix(matFile, "data_1", numpy.array(data1, dtype="<f8"), 0)
+    writeMatrix(matFile, "data_2", numpy.array(data2, dtype="<f8"), 0)
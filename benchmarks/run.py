@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Measures the latency, throughput and allocations of the service endpoints with a scripted OMC.
+
+  python -m benchmarks.run --concurrency 1 4 16 --requests 200 --latency translateModel=0.05 --output new.json
+  python -m benchmarks.run --compare old.json new.json
+
+The app runs in process with the Flask test client, so the numbers are the overhead of the
+service itself without the network. The results are written as json to compare versions.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy
+from Service.app import createApp
+from benchmarks.matfile import writeMatResult
+from benchmarks.scriptedomc import ScriptedOMC
+
+# add Service path so that createApp finds config.py
+sys.path.insert(0, str(Path(__file__).parent.parent / "Service"))
+
+resources = Path(__file__).parent.parent / "tests" / "resources"
+FORMAT_VERSION = 1
+
+def readResource(fileName):
+  return (resources / fileName).read_bytes()
+
+def getRequests(resultFileName):
+  """Returns the benchmarked endpoints as functions sending one request with a test client."""
+  simulationMetaData = readResource("FileSimulation.metadata.json")
+  simulationZip = readResource("FileSimulation.zip")
+  modelInstanceMetaData = readResource("FileModelInstance.metadata.json")
+  modelInstanceZip = readResource("FileModelInstance.zip")
+
+  def version(client):
+    return client.get("/api/version")
+
+  def simulate(client):
+    return client.post("/api/simulate", data = {
+      "MetadataJson": (io.BytesIO(simulationMetaData), "metadata.json"),
+      "ModelZip": (io.BytesIO(simulationZip), "model.zip")
+    })
+
+  def modelInstance(client):
+    return client.post("/api/modelInstance", data = {
+      "MetadataJson": (io.BytesIO(modelInstanceMetaData), "metadata.json"),
+      "ModelZip": (io.BytesIO(modelInstanceZip), "model.zip")
+    })
+
+  def results(client):
+    return client.get("/api/results", query_string = {"FileName": resultFileName, "Variables": "x*", "Downsample": "minmax", "Points": 1000})
+
+  return {"version": version, "simulate": simulate, "modelInstance": modelInstance, "results": results}
+
+def getStatistics(latencies, seconds):
+  latencies = numpy.array(latencies)
+  return {
+    "requests": len(latencies),
+    "throughput": len(latencies) / seconds,
+    "mean": latencies.mean(),
+    "p50": numpy.percentile(latencies, 50),
+    "p90": numpy.percentile(latencies, 90),
+    "p99": numpy.percentile(latencies, 99),
+    "max": latencies.max()
+  }
+
+def runConcurrently(app, request, concurrency, count):
+  """Sends count requests from concurrency threads, each with its own client. Returns the statistics."""
+  clients = threading.local()
+  latencies = []
+  failures = []
+
+  def send(index):
+    if not hasattr(clients, "client"):
+      clients.client = app.test_client()
+    start = time.perf_counter()
+    response = request(clients.client)
+    latencies.append(time.perf_counter() - start)
+    if response.status_code >= 400:
+      failures.append(response.status_code)
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    list(executor.map(send, range(count)))
+  statistics = getStatistics(latencies, time.perf_counter() - start)
+  statistics["failures"] = len(failures)
+  return statistics
+
+def measureAllocations(app, request, count):
+  """Returns the memory allocated during a request and the memory still held after count requests."""
+  client = app.test_client()
+  request(client)
+  tracemalloc.start()
+  try:
+    before = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    for _ in range(count):
+      tracemalloc.reset_peak()
+      current = tracemalloc.get_traced_memory()[0]
+      request(client)
+      peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    retained = tracemalloc.get_traced_memory()[0] - before
+  finally:
+    tracemalloc.stop()
+  return {"peakBytes": int(numpy.median(peaks)), "retainedBytesPerRequest": retained / count}
+
+def createBenchmarkApp(directory, arguments):
+  ScriptedOMC.latencies = dict(arguments.latency)
+  ScriptedOMC.modelInstanceSize = arguments.modelInstanceSize
+  return createApp({
+    "TMPDIR": os.path.join(directory, "tmp"),
+    "CACHE_DIR": os.path.join(directory, "cache"),
+    "LIBRARY_INDEX_FILE": os.path.join(directory, "cache", "libraries.json"),
+    "OMC_SESSION_FACTORY": "benchmarks.scriptedomc.ScriptedOMC",
+    "OMC_POOL_MIN_SIZE": arguments.sessions,
+    "OMC_POOL_MAX_SIZE": arguments.sessions,
+    "OMC_POOL_PREWARM_LIBRARIES": [],
+    # the caches would answer after the warm up, every request goes to the scripted OMC
+    "COMPILED_MODEL_CACHE_SIZE": 0,
+    "MODEL_INSTANCE_CACHE_MEMORY": 0,
+    "JOB_WORKERS": max(arguments.concurrency)
+  })
+
+def runBenchmarks(arguments):
+  with tempfile.TemporaryDirectory(prefix="OMWebService-benchmark-") as directory:
+    app = createBenchmarkApp(directory, arguments)
+    app.logger.disabled = True
+    resultTime = numpy.linspace(0.0, 1.0, arguments.resultPoints)
+    writeMatResult(os.path.join(app.config['TMPDIR'], "Benchmark_res.mat"), resultTime,
+                   {"x{0}".format(index): numpy.sin(resultTime * index) for index in range(10)}, {})
+    requests = getRequests("Benchmark_res.mat")
+    results = {}
+    for name in arguments.endpoints:
+      request = requests[name]
+      # warm up the sessions and caches before measuring
+      runConcurrently(app, request, max(arguments.concurrency), max(arguments.concurrency))
+      results[name] = {
+        "concurrency": {str(concurrency): runConcurrently(app, request, concurrency, arguments.requests) for concurrency in arguments.concurrency},
+        "allocations": measureAllocations(app, request, arguments.allocationRequests)
+      }
+    app.extensions["omcSessionPool"].close()
+    app.extensions["jobManager"].shutdown()
+  return {
+    "formatVersion": FORMAT_VERSION,
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "settings": {"requests": arguments.requests, "sessions": arguments.sessions, "latency": dict(arguments.latency),
+                 "modelInstanceSize": arguments.modelInstanceSize, "resultPoints": arguments.resultPoints},
+    "endpoints": results
+  }
+
+def printResults(results, output=sys.stderr):
+  print("{0:<14} {1:>5} {2:>10} {3:>9} {4:>9} {5:>9} {6:>8} {7:>12}".format(
+    "endpoint", "conc", "req/s", "p50 ms", "p90 ms", "p99 ms", "failed", "peak KiB"), file=output)
+  for name, endpoint in results["endpoints"].items():
+    for concurrency, statistics in endpoint["concurrency"].items():
+      print("{0:<14} {1:>5} {2:>10.1f} {3:>9.2f} {4:>9.2f} {5:>9.2f} {6:>8} {7:>12.1f}".format(
+        name, concurrency, statistics["throughput"], statistics["p50"] * 1000, statistics["p90"] * 1000,
+        statistics["p99"] * 1000, statistics["failures"], endpoint["allocations"]["peakBytes"] / 1024), file=output)
+
+def compareResults(baseline, results, output=sys.stdout):
+  """Prints the relative change of the throughput and latencies of results against baseline."""
+  print("{0:<14} {1:>5} {2:>10} {3:>9} {4:>9}".format("endpoint", "conc", "req/s", "p50", "p99"), file=output)
+  for name, endpoint in results["endpoints"].items():
+    for concurrency, statistics in endpoint["concurrency"].items():
+      old = baseline["endpoints"].get(name, {}).get("concurrency", {}).get(concurrency)
+      if not old:
+        continue
+      changes = [(statistics[key] - old[key]) / old[key] * 100 for key in ("throughput", "p50", "p99")]
+      print("{0:<14} {1:>5} {2:>+9.1f}% {3:>+8.1f}% {4:>+8.1f}%".format(name, concurrency, *changes), file=output)
+
+def parseLatency(value):
+  command, _, seconds = value.partition("=")
+  return command, float(seconds)
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmarks the OMWebService endpoints with a scripted OMC.")
+  parser.add_argument("--endpoints", nargs="+", default=["version", "simulate", "modelInstance", "results"],
+                      choices=["version", "simulate", "modelInstance", "results"])
+  parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16], help="concurrency levels")
+  parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+  parser.add_argument("--allocationRequests", type=int, default=20, help="requests traced for the allocations")
+  parser.add_argument("--sessions", type=int, default=4, help="OMC sessions of the pool")
+  parser.add_argument("--latency", action="append", type=parseLatency, default=[],
+                      help="OMC command latency as command=seconds, * for all other commands")
+  parser.add_argument("--modelInstanceSize", type=int, default=100000, help="bytes of the getModelInstance json")
+  parser.add_argument("--resultPoints", type=int, default=100000, help="time points of the result file read by /results")
+  parser.add_argument("--output", help="json file to write the results to, stdout if not given")
+  parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"), help="compare two result files and exit")
+  arguments = parser.parse_args()
+
+  if arguments.compare:
+    with open(arguments.compare[0]) as baselineFile, open(arguments.compare[1]) as resultsFile:
+      compareResults(json.load(baselineFile), json.load(resultsFile))
+    return
+
+  results = runBenchmarks(arguments)
+  printResults(results)
+  if arguments.output:
+    with open(arguments.output, "w") as outputFile:
+      json.dump(results, outputFile, indent=2)
+  else:
+    json.dump(results, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+OMC stand-in that answers the commands of the service from a script instead of running omc.
+"""
+
+import os
+import re
+import stat
+import time
+from Service.omc import OMC
+
+class ScriptedOMC(OMC):
+  """Answers the OMC commands after a scripted latency.
+
+  latencies maps command names like translateModel, system or getModelInstance to seconds, "*" is
+  used for the other commands. getModelInstance returns a json of modelInstanceSize bytes.
+  """
+  latencies = {}
+  modelInstanceSize = 10000
+  version = "OpenModelica 1.0.0~scripted"
+
+  def __init__(self):
+    super().__init__(omcSession=self)
+    self.workingDirectory = os.getcwd()
+    self.classNames = []
+
+  def getProcessId(self):
+    return None
+
+  def sendExpression(self, expression, parsed=True):
+    if expression.startswith("{"):
+      # the service sends arrays of calls like loadFile or getSourceFile, with calls nested one level deep
+      callPattern = r"\w+\((?:[^()\"]|\"[^\"]*\"|\((?:[^()\"]|\"[^\"]*\")*\))*\)"
+      return tuple(self.sendExpression(call, parsed) for call in re.findall(callPattern, expression))
+    match = re.match(r"(\w+)\((.*)\)$", expression, re.DOTALL)
+    command, arguments = match.groups() if match else (expression, "")
+    latency = self.latencies.get(command, self.latencies.get("*", 0))
+    if latency:
+      time.sleep(latency)
+    return getattr(self, "answer" + command[:1].upper() + command[1:], self.answerDefault)(arguments)
+
+  def answerDefault(self, arguments):
+    return True
+
+  def answerCd(self, arguments):
+    if arguments:
+      self.workingDirectory = arguments.strip("\"")
+    return self.workingDirectory
+
+  def answerGetVersion(self, arguments):
+    return self.version
+
+  def answerGetErrorString(self, arguments):
+    return ""
+
+  def answerGetClassNames(self, arguments):
+    return tuple(self.classNames)
+
+  def answerLoadFile(self, arguments):
+    self.classNames.append(os.path.splitext(os.path.basename(arguments.strip("\"")))[0])
+    return True
+
+  def answerClear(self, arguments):
+    self.classNames = []
+    return True
+
+  def answerGetModelInstance(self, arguments):
+    className = arguments.split(",")[0]
+    padding = "x" * max(self.modelInstanceSize - len(className) - 28, 0)
+    return "{{\"name\": \"{0}\", \"comment\": \"{1}\"}}".format(className, padding)
+
+  def answerSize(self, arguments):
+    return 1
+
+  def answerTranslateModel(self, arguments):
+    prefix = re.search(r"fileNamePrefix=\"([^\"]*)\"", arguments)
+    with open(os.path.join(self.workingDirectory, (prefix.group(1) if prefix else arguments.split(",")[0]) + ".makefile"), "w"):
+      pass
+    return True
+
+  def answerSystem(self, arguments):
+    """Compiles a translated model to a simulation executable that creates an empty result file."""
+    makefile = re.search(r"-f \\\"([^\\]*)\.makefile", arguments)
+    if not makefile:
+      return 0
+    executable = os.path.join(self.workingDirectory, makefile.group(1))
+    with open(executable, "w") as executableFile:
+      executableFile.write("#!/bin/sh\nfor argument in \"$@\"; do\n  case $argument in -r=*) : > \"${argument#-r=}\";; esac\ndone\n")
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    return 0
+
+  def answerGetSimulationOptions(self, arguments):
+    return (0.0, 1.0, 1e-6, 500, 0.002)
+
+  def answerBuildModelFMU(self, arguments):
+    fmuFile = os.path.join(self.workingDirectory, arguments.split(",")[0] + ".fmu")
+    with open(fmuFile, "wb"):
+      pass
+    return fmuFile
@@ -44,10 +44,15 @@ setup(name="OMWebService",
       license="BSD, OSMC-PL 1.2, GPL (user's choice)",
       url="http://openmodelica.org/",
       packages=["Service"],
+      package_data={"Service": ["metadata.schema.json"]},
       install_requires=[
-        "jsonschema==2.6.0",
+        "jsonschema>=4.0",
         "flask==2.0.3",
         "flask-restx==0.5.1",
-        "OMPython"
-        ]
+        "numpy",
+        "OMPython==4.1.0"
+        ],
+      extras_require={
+        "asgi": ["uvicorn"]
+        }
       )
\ No newline at end of file
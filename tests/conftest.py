@@ -43,3 +43,23 @@ def application():
     "TESTING": True
   })
   yield app_
+
+@pytest.fixture
+def fakeApplication(tmp_path):
+  """Application using fake OMC sessions and a temporary TMPDIR and CACHE_DIR."""
+  app_ = app.createApp({
+    "TESTING": True,
+    "TMPDIR": str(tmp_path / "tmp"),
+    "CACHE_DIR": str(tmp_path / "cache"),
+    "LIBRARY_INDEX_FILE": str(tmp_path / "cache" / "libraries.json"),
+    "OMC_SESSION_FACTORY": "tests.fakeomc.FakeOMC",
+    "OMC_POOL_MIN_SIZE": 0,
+    "OMC_POOL_MAX_SIZE": 2,
+    "OMC_POOL_PREWARM_LIBRARIES": [],
+    "COMPILED_MODEL_CACHE_SIZE": 1024 * 1024,
+    "FMU_CACHE_SIZE": 1024 * 1024,
+    "PACKAGE_CACHE_SIZE": 1024 * 1024,
+    "MODEL_INSTANCE_CACHE_MEMORY": 1024 * 1024,
+    "MODEL_INSTANCE_CACHE_SIZE": 1024 * 1024
+  })
+  yield app_
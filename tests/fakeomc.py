@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Fake OMC session used to test the endpoints without OpenModelica.
+"""
+
+import os
+import re
+import stat
+import uuid
+import zipfile
+from Service.omc import OMC
+
+# fake simulation executable that creates the result file given with -r and prints its arguments
+SIMULATION_EXECUTABLE = """#!/bin/sh
+for argument in "$@"; do
+  case $argument in -r=*) printf "fake result" > "${argument#-r=}";; esac
+done
+echo "$@"
+"""
+
+def splitArray(expression):
+  """Splits the array expression {a, b} into its top level elements."""
+  elements, depth, start, quoted = [], 0, 1, False
+  for index, character in enumerate(expression[1:-1], 1):
+    if character == "\"" and expression[index - 1] != "\\":
+      quoted = not quoted
+    elif quoted:
+      continue
+    elif character in "({":
+      depth += 1
+    elif character in ")}":
+      depth -= 1
+    elif character == "," and depth == 0:
+      elements.append(expression[start:index].strip())
+      start = index + 1
+  elements.append(expression[start:-1].strip())
+  return [element for element in elements if element]
+
+class FakeOMCSession(OMC):
+  """OMC interface that answers the expressions itself instead of sending them to OMC.
+
+  The expressions are recorded in commands, the elements of arrays one by one,
+  and errors added to errors are returned by getErrorString().
+  """
+
+  def __init__(self):
+    super().__init__(omcSession=self)
+    self.commands = []
+    self.errors = []
+    self.roundTrips = 0
+
+  def getProcessId(self):
+    return None
+
+  def sendExpression(self, expression, parsed=True):
+    self.roundTrips += 1
+    if expression == "getErrorString()":
+      errorString, self.errors = "".join(self.errors), []
+      return errorString
+    if expression.startswith("{") and expression.endswith("}"):
+      return tuple(self.answer(element) for element in splitArray(expression))
+    return self.answer(expression)
+
+  def answer(self, expression):
+    self.commands.append(expression)
+    return True
+
+class FakeOMC(FakeOMCSession):
+  """Answers the OMC commands used by the service and writes fake result files."""
+
+  def __init__(self):
+    super().__init__()
+    self.workingDirectory = "/"
+    self.classNames = []
+    # the package.mo of the installed libraries by name
+    self.sourceFiles = {}
+
+  def close(self):
+    pass
+
+  def writeExecutable(self, className):
+    executable = os.path.join(self.workingDirectory, className)
+    with open(executable, "w") as executableFile:
+      executableFile.write(SIMULATION_EXECUTABLE)
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    with open(executable + "_init.xml", "w"):
+      pass
+    return executable
+
+  def answer(self, expression):
+    super().answer(expression)
+    match = re.match(r"(\w+)\((.*)\)$", expression, re.DOTALL)
+    command, arguments = match.groups() if match else ("", "")
+    if command == "cd":
+      if arguments:
+        self.workingDirectory = arguments.strip("\"")
+      return self.workingDirectory
+    if command == "getVersion":
+      return "OpenModelica 1.0.0~fake"
+    if command == "getClassNames":
+      return tuple(self.classNames)
+    if command == "size":
+      return 1
+    if command == "getSourceFile":
+      return self.sourceFiles.get(arguments, "")
+    if command == "loadModel":
+      self.classNames.append(arguments.split(",")[0])
+      return True
+    if command == "loadFile":
+      self.classNames.append(os.path.splitext(arguments.strip("\""))[0])
+      return True
+    if command == "clear":
+      self.classNames = []
+      return True
+    if command == "simulate":
+      className = arguments.split(",")[0]
+      resultFile = os.path.join(self.workingDirectory, className + "_res.mat")
+      with open(resultFile, "wb") as file:
+        file.write(b"fake result")
+      self.writeExecutable(className)
+      return {"messages": "The simulation finished successfully.", "resultFile": resultFile,
+              "timeFrontend": 0.1, "timeBackend": 0.1, "timeSimCode": 0.01, "timeTemplates": 0.01,
+              "timeCompile": 0.5, "timeSimulation": 0.1, "timeTotal": 0.82}
+    if command == "translateModel":
+      prefix = re.search(r"fileNamePrefix=\"([^\"]*)\"", arguments)
+      with open(os.path.join(self.workingDirectory, (prefix.group(1) if prefix else arguments.split(",")[0]) + ".makefile"), "w"):
+        pass
+      return True
+    if command == "system":
+      # make -f "<prefix>.makefile" of a translated model
+      makefile = re.search(r"-f \\\"([^\\]*)\.makefile", arguments)
+      if not makefile or not os.path.exists(os.path.join(self.workingDirectory, makefile.group(1) + ".makefile")):
+        return 2
+      self.writeExecutable(makefile.group(1))
+      return 0
+    if command == "buildModelFMU":
+      fmuFile = os.path.join(self.workingDirectory, arguments.split(",")[0] + ".fmu")
+      platforms = re.findall(r"\"([^\"]*)\"", re.search(r"platforms=\{(.*?)\}", arguments).group(1)) if "platforms=" in arguments else ["static"]
+      # like OMC every translation gets a new GUID, the binaries check it
+      guid = "{" + str(uuid.uuid4()) + "}"
+      with zipfile.ZipFile(fmuFile, "w") as fmu:
+        fmu.writestr("modelDescription.xml", "<fmiModelDescription guid=\"{0}\"/>".format(guid))
+        for platform in platforms:
+          fmu.writestr("binaries/{0}/model.so".format("linux64" if platform in ("static", "dynamic") else platform), platform + " " + guid)
+      return fmuFile
+    if command == "getModelInstance":
+      return "{\"name\": \"" + arguments.split(",")[0] + "\"}"
+    if command == "getSimulationOptions":
+      return (0.0, 1.0, 1e-6, 500, 0.002)
+    return True
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the admission control and the bounded job queue.
+"""
+
+import threading
+from pathlib import Path
+from Service.admission import Lane
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_lane():
+  lane = Lane("simulation", limit=1, queueSize=1, timeout=5)
+  assert lane.enter()
+  # a second request waits for the slot, a third one is rejected
+  threading.Timer(0.05, lane.leave, [2.0]).start()
+  assert lane.enter()
+  assert lane.getRetryAfter() >= 1
+  lane.queueSize = 0
+  assert not lane.enter()
+
+def test_full_lane_rejects(fakeApplication):
+  lane = fakeApplication.extensions["admissionController"].lanes["interactive"]
+  lane.limit, lane.queueSize = 1, 0
+  lane.active = 1
+  response = fakeApplication.test_client().get("/api/version")
+  assert response.status_code == 429
+  assert int(response.headers["Retry-After"]) >= 1
+  lane.active = 0
+  assert fakeApplication.test_client().get("/api/version").status_code == 200
+
+def test_full_job_queue_rejects(fakeApplication):
+  jobManager = fakeApplication.extensions["jobManager"]
+  jobManager.queueSize = 1
+  jobManager.queued = 1
+  response = fakeApplication.test_client().post("/api/jobs/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 429
+  assert int(response.headers["Retry-After"]) >= 1
+  assert "retry" in response.json["message"]
+  # the upload is not kept
+  assert not list(Path(fakeApplication.config['TMPDIR']).iterdir())
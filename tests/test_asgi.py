@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the ASGI serving mode by calling the ASGI app directly.
+"""
+
+import json
+import time
+import asyncio
+import threading
+from pathlib import Path
+from werkzeug.test import EnvironBuilder
+from Service import jobs
+from Service.asgi import AsgiApp
+from Service.jobs import Job
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+async def request(asgiApp, path, queryString=b"", headers=(), method="GET", body=b""):
+  """Sends a request to the ASGI app. Returns the status, the headers and the body chunks."""
+  messages = [{"type": "http.request", "body": body, "more_body": False}]
+  sent = []
+
+  async def receive():
+    if messages:
+      return messages.pop(0)
+    # the client stays connected
+    await asyncio.Event().wait()
+
+  async def send(message):
+    sent.append(message)
+
+  headers = [(b"host", asgiApp.app.config['SERVER_NAME'].encode())] + list(headers)
+  scope = {"type": "http", "method": method, "path": path, "query_string": queryString, "headers": headers,
+           "http_version": "1.1", "scheme": "http", "server": ("localhost", 8080), "client": ("127.0.0.1", 1234)}
+  await asgiApp(scope, receive, send)
+  chunks = [message["body"] for message in sent[1:] if message["body"]]
+  return sent[0]["status"], dict(sent[0]["headers"]), chunks
+
+def test_download_in_chunks(fakeApplication):
+  content = bytes(range(256)) * 3000
+  with open("{0}/Model_res.mat".format(fakeApplication.config['TMPDIR']), "wb") as file:
+    file.write(content)
+  asgiApp = AsgiApp(fakeApplication)
+  status, headers, chunks = asyncio.run(request(asgiApp, "/api/download/", b"FileName=Model_res.mat"))
+  assert status == 200
+  assert len(chunks) > 1 and b"".join(chunks) == content
+  status, headers, chunks = asyncio.run(request(asgiApp, "/api/download/", b"FileName=Model_res.mat", [(b"range", b"bytes=10-19")]))
+  assert status == 206
+  assert b"".join(chunks) == content[10:20]
+
+def test_long_poll_does_not_block(fakeApplication):
+  fakeApplication.config.update({"OMC_POOL_MAX_SIZE": 0, "ASGI_EXTRA_THREADS": 1})
+  asgiApp = AsgiApp(fakeApplication)
+  job = Job("simulate", {})
+  fakeApplication.extensions["jobManager"].jobs[job.id] = job
+  threading.Timer(0.2, job.setDone).start()
+
+  async def poll():
+    start = time.monotonic()
+    waiting = asyncio.ensure_future(request(asgiApp, "/api/jobs/" + job.id, b"Wait=10"))
+    # the single request thread is free while the job status request waits
+    status, headers, chunks = await request(asgiApp, "/api/version")
+    assert status == 200 and not waiting.done()
+    status, headers, chunks = await waiting
+    return status, json.loads(b"".join(chunks)), time.monotonic() - start
+
+  status, jobJson, seconds = asyncio.run(poll())
+  assert status == 200
+  assert jobJson["id"] == job.id
+  assert 0.2 <= seconds < 5
+
+def test_job_events_on_event_loop(fakeApplication):
+  fakeApplication.config.update({"OMC_POOL_MAX_SIZE": 0, "ASGI_EXTRA_THREADS": 1, "EVENT_STREAM_INTERVAL": 0.05})
+  asgiApp = AsgiApp(fakeApplication)
+  job = Job("simulate", {})
+  fakeApplication.extensions["jobManager"].jobs[job.id] = job
+  threading.Timer(0.1, job.setProgress, ("Simulating", 0.5)).start()
+  threading.Timer(0.3, job.setDone).start()
+
+  async def follow():
+    streaming = asyncio.ensure_future(request(asgiApp, "/api/jobs/{0}/events".format(job.id)))
+    # the single request thread is free while the event stream is sent
+    status, headers, chunks = await request(asgiApp, "/api/version")
+    assert status == 200 and not streaming.done()
+    return await streaming
+
+  status, headers, chunks = asyncio.run(follow())
+  assert status == 200
+  assert headers[b"content-type"].startswith(b"text/event-stream")
+  body = b"".join(chunks).decode()
+  assert "event: progress\ndata: {\"phase\": \"Simulating\", \"progress\": 0.5}" in body
+  assert body.index("event: progress") < body.index("event: status")
+
+def test_long_poll_waits_once(fakeApplication):
+  asgiApp = AsgiApp(fakeApplication)
+  job = Job("simulate", {})
+  fakeApplication.extensions["jobManager"].jobs[job.id] = job
+  start = time.monotonic()
+  status, headers, chunks = asyncio.run(request(asgiApp, "/api/jobs/" + job.id, b"Wait=0.5"))
+  seconds = time.monotonic() - start
+  assert status == 200
+  assert json.loads(b"".join(chunks))["status"] == "queued"
+  # the app does not wait again after the event loop waited
+  assert 0.5 <= seconds < 0.9
+
+def test_simulate_waits_on_event_loop(fakeApplication, monkeypatch):
+  fakeApplication.config.update({"OMC_POOL_MAX_SIZE": 0, "ASGI_EXTRA_THREADS": 1})
+  asgiApp = AsgiApp(fakeApplication)
+  release = threading.Event()
+  simulate = jobs.jobTypes["simulate"]
+
+  def slowSimulate(job):
+    release.wait(10)
+    return simulate(job)
+
+  monkeypatch.setitem(jobs.jobTypes, "simulate", slowSimulate)
+  # a full polling lane does not reject the answer of the simulation
+  polling = fakeApplication.extensions["admissionController"].lanes["polling"]
+  polling.active, polling.queueSize = polling.limit, 0
+  environ = EnvironBuilder(method="POST", data={
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  }).get_environ()
+  headers = [(b"content-type", environ["CONTENT_TYPE"].encode()), (b"content-length", environ["CONTENT_LENGTH"].encode())]
+
+  async def simulateAndPoll():
+    simulating = asyncio.ensure_future(request(asgiApp, "/api/simulate", headers=headers, method="POST", body=environ["wsgi.input"].read()))
+    await asyncio.sleep(0.2)
+    # the single request thread is free while the simulation runs
+    status, _, _ = await request(asgiApp, "/api/version")
+    assert status == 200 and not simulating.done()
+    release.set()
+    return await simulating
+
+  status, headers, chunks = asyncio.run(simulateAndPoll())
+  assert status == 200
+  assert b"x-omwebservice-wait-job" not in headers
+  assert json.loads(b"".join(chunks))["file"].endswith("BouncingBall_res.mat")
+  text = fakeApplication.test_client().get("/metrics").data.decode()
+  assert "omws_http_requests_total{endpoint=\"api.simulate\",method=\"POST\",status=\"200\"} 1.0" in text
+  assert "status=\"202\"" not in text and "api.job_result" not in text
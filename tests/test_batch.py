@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the batch simulation endpoint with a fake OMC and a fake simulation executable.
+"""
+
+from pathlib import Path
+import io
+import json
+import pytest
+from Service.batch import getVariants
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_batch(fakeApplication):
+  client = fakeApplication.test_client()
+  variants = {"variants": [{"e": 0.5}], "grid": {"e": [0.7, 0.8], "stopTime": [1.0, 2.0]}}
+  response = client.post("/api/jobs/batch", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb"),
+    "VariantsJson": (io.BytesIO(json.dumps(variants).encode()), "variants.json")
+  })
+  assert response.status_code == 202
+  job = fakeApplication.extensions["jobManager"].get(response.json["id"])
+  assert job.wait(10)
+
+  response = client.get("/api/jobs/{0}/result".format(job.id))
+  assert response.status_code == 200
+  runs = response.json["runs"]
+  assert len(runs) == 5
+  assert all(run["status"] == "finished" and run["file"] for run in runs)
+  assert "e=0.5" in runs[0]["messages"]
+  assert "stopTime=2.0" in runs[4]["messages"] and "e=0.8" in runs[4]["messages"]
+
+def test_invalid_variants():
+  with pytest.raises(ValueError):
+    getVariants({"grid": {"e": 0.5}}, 10)
+  with pytest.raises(ValueError):
+    getVariants([{"e,stopTime": 0.5}], 10)
+  with pytest.raises(ValueError):
+    getVariants({"grid": {"e": list(range(11))}}, 10)
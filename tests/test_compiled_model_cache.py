@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the compiled model cache with a fake OMC and a fake simulation executable.
+"""
+
+from pathlib import Path
+import os
+import re
+import io
+import json
+from Service.cache import DirectoryCache
+from Service.compiledmodel import getCompiledModelKey
+from tests.fakeomc import FakeOMC
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def simulate(client, metaDataJson):
+  response = client.post("/api/simulate", data = {
+    "MetadataJson": (io.BytesIO(json.dumps(metaDataJson).encode()), "metadata.json"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  return response.json
+
+def test_runtime_values_reuse_the_executable(fakeApplication):
+  client = fakeApplication.test_client()
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  data = simulate(client, metaDataJson)
+  assert data["file"].endswith("BouncingBall_res.mat")
+  assert len(fakeApplication.extensions["compiledModelCache"].keys()) == 1
+
+  metaDataJson["stopTime"] = 10.0
+  metaDataJson["method"] = "euler"
+  data = simulate(client, metaDataJson)
+  assert data["file"].endswith("BouncingBall_res.mat")
+  assert "stopTime=10.0" in data["messages"] and "-s=euler" in data["messages"]
+
+def test_solver_of_the_model_is_kept(fakeApplication):
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  metaDataJson.pop("method", None)
+  client = fakeApplication.test_client()
+  simulate(client, metaDataJson)
+  # the cached executable is not told to use dassl
+  assert "-s=" not in simulate(client, metaDataJson)["messages"]
+
+def test_cached_executable_reads_the_request_files(fakeApplication):
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  client = fakeApplication.test_client()
+  simulate(client, metaDataJson)
+  data = simulate(client, metaDataJson)
+  # the executable of the cache entry gets the upload directory with the model files and its init xml
+  inputPath = re.search(r"-inputPath=(\S+)", data["messages"]).group(1)
+  assert os.path.dirname(inputPath) == fakeApplication.config['TMPDIR'].rstrip("/")
+  assert os.path.exists(os.path.join(inputPath, "BouncingBall.mo"))
+  assert os.path.exists(os.path.join(inputPath, "BouncingBall_init.xml"))
+
+def test_failed_build_keeps_the_simulate_messages(fakeApplication, monkeypatch):
+  answer = FakeOMC.answer
+  monkeypatch.setattr(FakeOMC, "answer", lambda self, expression: 2 if expression.startswith("system(") else answer(self, expression))
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  data = simulate(fakeApplication.test_client(), metaDataJson)
+  assert data["messages"].startswith("Failed to build model: BouncingBall")
+  assert data["file"] == ""
+  assert not fakeApplication.extensions["compiledModelCache"].keys()
+
+def test_key_ignores_runtime_values():
+  metaDataJson = {"class": "BouncingBall", "stopTime": 1.0}
+  key = getCompiledModelKey(metaDataJson, "abc", "v1")
+  assert key == getCompiledModelKey(dict(metaDataJson, stopTime=5.0, tolerance=1e-8), "abc", "v1")
+  assert key != getCompiledModelKey(dict(metaDataJson, cflags="-O0"), "abc", "v1")
+  assert key != getCompiledModelKey(metaDataJson, "def", "v1")
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+  cache = DirectoryCache(str(tmp_path), 1500)
+  def populate(directory):
+    (Path(directory) / "data").write_bytes(b"x" * 600)
+  cache.put("a", populate)
+  cache.put("b", populate)
+  cache.get("a")
+  cache.put("c", populate)
+  assert sorted(cache.keys()) == ["a", "c"]
+  assert not (tmp_path / "b").exists()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests range and conditional requests of the download endpoint.
+"""
+
+def writeFile(application):
+  with open("{0}/Model_res.mat".format(application.config['TMPDIR']), "wb") as file:
+    file.write(bytes(range(256)) * 4)
+
+def test_range(fakeApplication):
+  writeFile(fakeApplication)
+  client = fakeApplication.test_client()
+  response = client.get("/api/download/", query_string = {"FileName": "Model_res.mat"}, headers = {"Range": "bytes=100-199"})
+  assert response.status_code == 206
+  assert response.headers["Content-Range"] == "bytes 100-199/1024"
+  assert response.data == bytes(range(100, 200))
+
+def test_conditional(fakeApplication):
+  writeFile(fakeApplication)
+  client = fakeApplication.test_client()
+  response = client.get("/api/download/", query_string = {"FileName": "Model_res.mat"})
+  assert response.status_code == 200
+  etag = response.headers["ETag"]
+  assert response.headers["Last-Modified"]
+  response = client.get("/api/download/", query_string = {"FileName": "Model_res.mat"}, headers = {"If-None-Match": etag})
+  assert response.status_code == 304
+  assert response.data == b""
+
+def test_outside_directory(fakeApplication):
+  client = fakeApplication.test_client()
+  assert client.get("/api/download/", query_string = {"FileName": "../secret.mat"}).status_code == 404
+  assert client.get("/api/download/", query_string = {"FileName": "missing.mat"}).status_code == 404
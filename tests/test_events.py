@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests following a result file while it is written and the job event stream with a fake OMC.
+"""
+
+import os
+from pathlib import Path
+from Service.jobs import Job
+from Service.progress import EventStream
+from Service.results import ResultTail
+from benchmarks.matfile import writeMatResult
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_result_tail_csv(tmp_path):
+  fileName = str(tmp_path / "model_res.csv")
+  with open(fileName, "w") as csvFile:
+    csvFile.write("\"time\",\"x\",\"y\"\n0,1,2\n0.5,3,")
+  tail = ResultTail(fileName, ["y"])
+  assert tail.poll() == [[0.0, 2.0]]
+  assert tail.poll() == []
+  with open(fileName, "a") as csvFile:
+    csvFile.write("4\n1,5,6\n")
+  assert tail.poll() == [[0.5, 4.0], [1.0, 6.0]]
+
+def test_result_tail_growing_mat(tmp_path):
+  fileName = str(tmp_path / "model_res.mat")
+  writeMatResult(fileName, [0.0, 1.0, 2.0, 3.0], {"x": [10.0, 11.0, 12.0, 13.0]})
+  with open(fileName, "rb") as matFile:
+    data = matFile.read()
+  # the last row and a half of the next to last one are not written yet
+  rowSize = 2 * 8
+  with open(fileName, "wb") as matFile:
+    matFile.write(data[:-rowSize - rowSize // 2])
+  tail = ResultTail(fileName, ["x", "unknown"])
+  assert tail.poll() == [[0.0, 10.0], [1.0, 11.0]]
+  assert tail.names == ["x"]
+  with open(fileName, "wb") as matFile:
+    matFile.write(data)
+  assert tail.poll() == [[2.0, 12.0], [3.0, 13.0]]
+
+def test_event_stream(tmp_path):
+  job = Job("simulate", {})
+  job.setProgress("Simulating", 0.5)
+  job.addEvent("log", "started")
+  stream = EventStream(job)
+  messages = stream.poll(0)
+  assert messages[0] == "id: 1\nevent: progress\ndata: {\"phase\": \"Simulating\", \"progress\": 0.5}\n\n"
+  assert messages[1].startswith("id: 2\nevent: log\n")
+  assert stream.poll(0) == []
+  assert not stream.finished
+
+  job.resultFile = str(tmp_path / "model_res.csv")
+  with open(job.resultFile, "w") as csvFile:
+    csvFile.write("time,x\n0,1\n")
+  stream = EventStream(job, ["x"], lastEventId=2)
+  assert stream.poll(0) == ["event: rows\ndata: {\"names\": [\"time\", \"x\"], \"rows\": [[0.0, 1.0]]}\n\n"]
+  job.setDone()
+  messages = stream.poll(0)
+  assert messages[-1].startswith("event: status\n")
+  assert stream.finished
+
+def test_job_events(fakeApplication):
+  client = fakeApplication.test_client()
+  response = client.post("/api/jobs/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 202
+  assert response.json["links"]["events"].endswith("/api/jobs/{0}/events".format(response.json["id"]))
+  response = client.get("/api/jobs/{0}/events".format(response.json["id"]))
+  assert response.status_code == 200
+  assert response.mimetype == "text/event-stream"
+  body = response.get_data(as_text=True)
+  assert "event: progress\n" in body
+  assert body.endswith("\n\n")
+  assert "event: status\ndata: {" in body
+  assert "\"status\": \"finished\"" in body
+
+def test_cancel_queued_job(fakeApplication):
+  jobManager = fakeApplication.extensions["jobManager"]
+  job = Job("simulate", {})
+  with jobManager.lock:
+    jobManager.queued += 1
+    jobManager.jobs[job.id] = job
+  client = fakeApplication.test_client()
+  response = client.delete("/api/jobs/{0}".format(job.id))
+  assert response.status_code == 202
+  jobManager._run(job)
+  assert job.status == Job.CANCELLED
+  assert client.delete("/api/jobs/{0}".format(job.id)).status_code == 409
+  assert client.delete("/api/jobs/unknown").status_code == 404
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the multi platform FMU builds and the FMU cache with a fake OMC.
+"""
+
+from pathlib import Path
+import io
+import re
+import json
+import zipfile
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def buildFMU(client, metaDataJson):
+  response = client.post("/api/simulate", data = {
+    "MetadataJson": (io.BytesIO(json.dumps(metaDataJson).encode()), "metadata.json"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  assert response.json["messages"] == "FMU is generated."
+  return client.get(response.json["file"]).data
+
+def getBuildCommands(application):
+  return [command for omc in application.extensions["omcSessionPool"].sessions for command in omc.commands
+          if command.startswith("buildModelFMU(")]
+
+def test_platforms_share_the_guid_and_are_cached(fakeApplication):
+  client = fakeApplication.test_client()
+  metaDataJson = {"fileNames": ["BouncingBall.mo"], "class": "BouncingBall", "outputFormat": "fmu",
+                  "fmuType": "me", "platforms": ["static", "x86_64-w64-mingw32"]}
+  data = buildFMU(client, metaDataJson)
+  with zipfile.ZipFile(io.BytesIO(data)) as fmu:
+    assert sorted(fmu.namelist()) == ["binaries/linux64/model.so", "binaries/x86_64-w64-mingw32/model.so", "modelDescription.xml"]
+    guid = re.search(r"guid=\"([^\"]*)\"", fmu.read("modelDescription.xml").decode()).group(1)
+    # fmi2Instantiate of every platform checks the GUID of the modelDescription.xml
+    assert all(fmu.read(name).decode().endswith(guid) for name in fmu.namelist() if name.startswith("binaries/"))
+  commands = getBuildCommands(fakeApplication)
+  assert len(commands) == 1
+  assert "fmuType=\"me\"" in commands[0] and "\"static\"" in commands[0] and "mingw32" in commands[0]
+
+  # the same request gets the cached FMU, another platform set is built again
+  assert buildFMU(client, metaDataJson) == data
+  assert len(getBuildCommands(fakeApplication)) == 1
+  buildFMU(client, dict(metaDataJson, platforms=["static"]))
+  assert len(getBuildCommands(fakeApplication)) == 2
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the inline delivery of results and model instances with a fake OMC.
+"""
+
+from pathlib import Path
+import email
+import json
+import pytest
+from Service.util import embedJson
+from tests.fakeomc import FakeOMC
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def post(client, url, inline):
+  return client.post(url, data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb"),
+    "Inline": str(inline).lower()
+  })
+
+def test_inline_simulation_result(fakeApplication):
+  response = post(fakeApplication.test_client(), "/api/simulate", True)
+  assert response.status_code == 200
+  assert response.mimetype == "multipart/mixed"
+  message = email.message_from_bytes(b"Content-Type: " + response.headers["Content-Type"].encode() + b"\r\n\r\n" + response.data)
+  resultPart, filePart = message.get_payload()
+  resultJson = json.loads(resultPart.get_payload())
+  assert resultJson["file"].endswith("BouncingBall_res.mat")
+  assert filePart.get_filename() == "BouncingBall_res.mat"
+  assert filePart.get_payload(decode=True) == fakeApplication.test_client().get(resultJson["file"]).data
+
+def test_large_result_is_a_url(fakeApplication):
+  fakeApplication.config["INLINE_MAX_SIZE"] = 0
+  response = post(fakeApplication.test_client(), "/api/simulate", True)
+  assert response.mimetype == "application/json"
+  assert response.json["file"].endswith("BouncingBall_res.mat")
+
+def test_inline_model_instance(fakeApplication):
+  client = fakeApplication.test_client()
+  response = post(client, "/api/modelInstance", True)
+  assert response.status_code == 200
+  assert response.json["instance"] == {"name": "BouncingBall"}
+  assert response.json["file"] == ""
+  # the cached instance is embedded the same way
+  assert post(client, "/api/modelInstance", True).json["instance"] == {"name": "BouncingBall"}
+  response = post(client, "/api/modelInstance", False)
+  assert "instance" not in response.json
+  assert client.get(response.json["file"]).json == {"name": "BouncingBall"}
+
+def test_embed_json():
+  assert json.loads(embedJson({"file": ""}, "instance", b' {"name": "A"}\n')) == {"file": "", "instance": {"name": "A"}}
+  assert json.loads(embedJson({}, "instance", "{}")) == {"instance": {}}
+  for data in ("\"name\"}, \"file\": \"x\"", "{\"a\": 1} , {\"b\": 2}", "[{}]", "{\"a\": }"):
+    with pytest.raises(ValueError):
+      embedJson({}, "instance", data)
+  with pytest.raises(TypeError):
+    embedJson([], "instance", "{}")
+
+def test_invalid_model_instance_is_a_url(fakeApplication, monkeypatch):
+  answer = FakeOMC.answer
+  monkeypatch.setattr(FakeOMC, "answer", lambda self, expression: "\"x\"" if expression.startswith("getModelInstance(") else answer(self, expression))
+  client = fakeApplication.test_client()
+  response = post(client, "/api/modelInstance", True)
+  assert response.status_code == 200
+  assert "instance" not in response.json
+  assert client.get(response.json["file"]).data == b"\"x\""
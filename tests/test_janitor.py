@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the clean up of TMPDIR.
+"""
+
+import os
+import time
+import numpy
+from Service import results
+from Service.janitor import Janitor
+from Service.jobs import Job
+from benchmarks.matfile import writeMatResult
+
+def makeEntry(application, name, size, age):
+  path = os.path.join(application.config['TMPDIR'], name)
+  os.makedirs(path)
+  with open(os.path.join(path, "Model_res.mat"), "wb") as file:
+    file.write(b"x" * size)
+  os.utime(path, (time.time() - age, time.time() - age))
+  return path
+
+def addJob(application, uploadDirectory, done):
+  job = Job("simulate", {"uploadDirectory": uploadDirectory, "metaDataJson": {"class": "Model"}})
+  if done:
+    job.setDone()
+  application.extensions["jobManager"].jobs[job.id] = job
+
+def test_ttl_and_quota(fakeApplication):
+  expired = makeEntry(fakeApplication, "tmpexpired", 10, 7200)
+  oldest = makeEntry(fakeApplication, "tmpoldest", 1000, 300)
+  running = makeEntry(fakeApplication, "tmprunning", 1000, 200)
+  newest = makeEntry(fakeApplication, "tmpnewest", 1000, 100)
+  addJob(fakeApplication, running, done=False)
+  janitor = Janitor(fakeApplication, ttl=3600, quota=2500, minAge=0)
+  janitor.collect()
+  assert not os.path.exists(expired)
+  # the least recently used entry goes, the running job is kept
+  assert not os.path.exists(oldest)
+  assert os.path.exists(running) and os.path.exists(newest)
+
+def test_download_touches_entry(fakeApplication):
+  old = makeEntry(fakeApplication, "tmpold", 10, 7200)
+  response = fakeApplication.test_client().get("/api/download/", query_string = {"FileName": "tmpold/Model_res.mat"})
+  assert response.status_code == 200
+  response.close()
+  # a restarted service or another node sharing TMPDIR sees the touch
+  janitor = Janitor(fakeApplication, ttl=3600, minAge=0)
+  janitor.collect()
+  assert os.path.exists(old)
+
+def test_prune_build_products(fakeApplication):
+  uploadDirectory = makeEntry(fakeApplication, "tmpfinished", 10, 0)
+  for fileName in ("Model.c", "Model_01exo.o", "Model.makefile", "Model.mo", "external.c"):
+    with open(os.path.join(uploadDirectory, fileName), "w"):
+      pass
+  addJob(fakeApplication, uploadDirectory, done=True)
+  Janitor(fakeApplication).collect()
+  assert sorted(os.listdir(uploadDirectory)) == ["Model.mo", "Model_res.mat", "external.c"]
+
+def test_remove_closes_results(fakeApplication):
+  path = os.path.join(fakeApplication.config['TMPDIR'], "tmpresult")
+  os.makedirs(path)
+  fileName = os.path.join(path, "Model_res.mat")
+  time = numpy.linspace(0.0, 1.0, 11)
+  writeMatResult(fileName, time, {"x": time})
+  result = results.openMatResult(fileName)
+  assert results.openMatResult(fileName) is result
+  # a rewritten file is parsed again
+  writeMatResult(fileName, time, {"x": time, "y": time})
+  assert results.openMatResult(fileName) is not result
+  fakeApplication.extensions["janitor"].remove(path)
+  assert not os.path.exists(path)
+  assert not any(key[0].startswith(path) for key in results._matResults)
+
+def test_touch_file_entry(fakeApplication):
+  fileName = os.path.join(fakeApplication.config['TMPDIR'], "Model_res.mat")
+  with open(fileName, "wb") as file:
+    file.write(b"x" * 10)
+  os.utime(fileName, (time.time() - 7200, time.time() - 7200))
+  modified = os.stat(fileName).st_mtime_ns
+  fakeApplication.extensions["janitor"].touch(fileName)
+  assert os.stat(fileName).st_mtime_ns == modified
+  janitor = Janitor(fakeApplication, ttl=3600, minAge=0)
+  janitor.collect()
+  assert os.path.exists(fileName)
+  janitor.ttl = -1
+  janitor.collect()
+  assert not os.listdir(fakeApplication.config['TMPDIR'])
+
+def test_missing_files_are_not_touched(fakeApplication):
+  client = fakeApplication.test_client()
+  assert client.get("/api/download/", query_string = {"FileName": "missing.mat"}).status_code == 404
+  assert client.get("/api/download/", query_string = {"FileName": "missing/Model_res.mat"}).status_code == 404
+  assert not os.listdir(fakeApplication.config['TMPDIR'])
+  # the sidecar of a file removed by someone else is collected
+  orphan = os.path.join(fakeApplication.config['TMPDIR'], ".gone.mat.touched")
+  open(orphan, "w").close()
+  Janitor(fakeApplication).collect()
+  assert not os.path.exists(orphan)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the shared job queue and the workers with a fake OMC.
+"""
+
+import time
+from pathlib import Path
+from Service.jobs import Job
+from Service.jobqueue import JobQueue, QueueJobManager
+from Service.worker import Worker
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_lease_and_retry(tmp_path):
+  queue = JobQueue(str(tmp_path / "jobs.db"), leaseSeconds=0.1, maxAttempts=2)
+  queue.put("job1", "simulate", {"uploadDirectory": "upload"}, {"upload": 0.5})
+  row = queue.claim("worker1")
+  assert row["id"] == "job1" and row["payload"] == {"uploadDirectory": "upload"} and row["timings"] == {"upload": 0.5}
+  assert queue.claim("worker2") is None
+  assert queue.renew("job1", "worker1", "Simulating", 0.5, "", [(1, "log", "line")]) is False
+  assert queue.getEvents("job1", 0) == [(1, "log", "line")]
+
+  # worker1 stops renewing its lease and the job runs again
+  time.sleep(0.2)
+  row = queue.claim("worker2")
+  assert row["id"] == "job1" and row["attempts"] == 2 and row["lastEventId"] == 1
+  assert queue.renew("job1", "worker1", "Simulating", 0.6, "") is None
+  assert not queue.finish("job1", "worker1", Job.FINISHED, {"messages": "", "fileName": ""}, {})
+
+  # after maxAttempts lost workers the job fails
+  time.sleep(0.2)
+  assert queue.claim("worker3") is None
+  row = queue.get("job1")
+  assert row["status"] == Job.FAILED
+  assert "lost" in row["result"]["messages"]
+
+def test_cancel(tmp_path):
+  queue = JobQueue(str(tmp_path / "jobs.db"))
+  queue.put("queued", "simulate", {})
+  queue.put("running", "simulate", {})
+  assert queue.claim("worker")["id"] == "queued"
+  queue.put("waiting", "simulate", {})
+  assert queue.cancel("waiting")
+  assert queue.get("waiting")["status"] == Job.CANCELLED
+  assert queue.renew("queued", "worker", "", 0, "") is False
+  assert queue.cancel("queued")
+  assert queue.renew("queued", "worker", "", 0, "") is True
+  assert queue.finish("queued", "worker", Job.CANCELLED, {"messages": "The job was cancelled.", "fileName": ""}, {})
+  assert not queue.cancel("queued")
+  assert queue.countByStatus() == {Job.CANCELLED: 2, Job.QUEUED: 1}
+
+def test_worker(fakeApplication, tmp_path):
+  queue = JobQueue(str(tmp_path / "jobs.db"))
+  fakeApplication.extensions["jobManager"] = QueueJobManager(fakeApplication, queue, pollInterval=0.05)
+  worker = Worker(fakeApplication, queue, heartbeat=0.05, pollInterval=0.05)
+  worker.start()
+  try:
+    client = fakeApplication.test_client()
+    response = client.post("/api/jobs/simulate", data = {
+      "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+      "ModelZip": (resources / "FileSimulation.zip").open("rb")
+    })
+    assert response.status_code == 202
+    jobId = response.json["id"]
+    response = client.get("/api/jobs/{0}?Wait=10".format(jobId))
+    assert response.json["status"] == "finished"
+    response = client.get("/api/jobs/{0}/result".format(jobId))
+    assert response.status_code == 200
+    assert response.json["file"].endswith("BouncingBall_res.mat")
+    assert "upload" in response.json["timings"]
+    response = client.get("/api/jobs/{0}/events".format(jobId))
+    assert "event: progress\n" in response.get_data(as_text=True)
+  finally:
+    worker.stop()
+    worker.join()
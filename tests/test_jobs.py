@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the background simulation job endpoints with a fake OMC.
+"""
+
+from pathlib import Path
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_simulate_job(fakeApplication):
+  client = fakeApplication.test_client()
+  response = client.post("/api/jobs/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 202
+  job = fakeApplication.extensions["jobManager"].get(response.json["id"])
+  assert job.wait(10)
+
+  response = client.get("/api/jobs/{0}".format(job.id))
+  assert response.status_code == 200
+  assert response.json["status"] == "finished"
+
+  response = client.get("/api/jobs/{0}/result".format(job.id))
+  assert response.status_code == 200
+  assert response.json["file"].endswith("BouncingBall_res.mat")
+
+def test_simulate_is_a_job_wrapper(fakeApplication):
+  response = fakeApplication.test_client().post("/api/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  assert response.json["file"].endswith("BouncingBall_res.mat")
+
+def test_unknown_job(fakeApplication):
+  response = fakeApplication.test_client().get("/api/jobs/unknown")
+  assert response.status_code == 404
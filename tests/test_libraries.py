@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the library install index.
+"""
+
+from Service.libraries import LibraryIndex, loadLibraries
+from tests.fakeomc import FakeOMC
+
+def createOMC(sourceFile):
+  omc = FakeOMC()
+  omc.sourceFiles["Modelica"] = str(sourceFile)
+  return omc
+
+def test_install_is_skipped_when_indexed(tmp_path):
+  sourceFile = tmp_path / "Modelica 4.0.0" / "package.mo"
+  sourceFile.parent.mkdir()
+  sourceFile.write_text("package Modelica end Modelica;")
+  indexFileName = str(tmp_path / "libraries.json")
+
+  omc = createOMC(sourceFile)
+  loadLibraries(omc, [("Modelica", "4.0.0")], LibraryIndex(indexFileName))
+  assert "installPackage(Modelica, \"4.0.0\")" in omc.commands
+
+  # a new index reads the entries back from the file
+  index = LibraryIndex(indexFileName)
+  assert index.isInstalled("Modelica", "4.0.0")
+  omc = createOMC(sourceFile)
+  loadLibraries(omc, [("Modelica", "4.0.0")], index)
+  assert omc.commands == ["loadModel(Modelica, {\"4.0.0\"})"]
+
+  # removed from disk so it is installed again
+  sourceFile.unlink()
+  assert not index.isInstalled("Modelica", "4.0.0")
+  assert index.entries()[0]["exists"] is False
+
+def test_list_libraries(fakeApplication):
+  response = fakeApplication.test_client().get("/api/libraries")
+  assert response.status_code == 200
+  assert "libraries" in response.json
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the validation of the metadata json.
+"""
+
+from pathlib import Path
+import io
+import json
+import pytest
+from Service.metadata import InvalidMetaData, loadValidator, parseMetaData
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_resources_are_valid():
+  validator = loadValidator()
+  for fileName in resources.glob("*.metadata.json"):
+    parseMetaData(fileName.read_bytes(), validator)
+
+def test_errors():
+  validator = loadValidator()
+  with pytest.raises(InvalidMetaData) as info:
+    parseMetaData(b"{\"class\": \"BouncingBall\"", validator)
+  assert info.value.code == 400
+  with pytest.raises(InvalidMetaData) as info:
+    parseMetaData(json.dumps({"class": "M); quit(", "outputFormat": "xml", "numberOfIntervals": 0,
+                              "libs": [{"name": "Modelica"}]}).encode(), validator)
+  errors = info.value.data["errors"]
+  assert [error.split(":")[0] for error in errors] == ["class", "libs/0", "numberOfIntervals", "outputFormat"]
+
+def test_invalid_metadata_is_rejected_early(fakeApplication):
+  response = fakeApplication.test_client().post("/api/simulate", data = {
+    "MetadataJson": (io.BytesIO(json.dumps({"class": "BouncingBall", "fmuType": "both"}).encode()), "metadata.json"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 400
+  assert response.json["errors"] == ["fmuType: 'both' is not one of ['me', 'cs', 'me_cs']."]
+  # nothing is written and no OMC session is started
+  assert not list(Path(fakeApplication.config['TMPDIR']).iterdir())
+  assert fakeApplication.extensions["omcSessionPool"].size == 0
+
+def test_output_format_is_case_insensitive(fakeApplication):
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  for outputFormat in ("Mat", "CSV"):
+    parseMetaData(json.dumps(dict(metaDataJson, outputFormat=outputFormat)).encode(), loadValidator())
+  response = fakeApplication.test_client().post("/api/simulate", data = {
+    "MetadataJson": (io.BytesIO(json.dumps(dict(metaDataJson, outputFormat="FMU")).encode()), "metadata.json"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  assert response.json["file"].endswith(".fmu")
+
+def test_patterns_are_ecma_262():
+  def getPatterns(schema):
+    if isinstance(schema, dict):
+      for name, value in schema.items():
+        if name == "pattern":
+          yield value
+        else:
+          yield from getPatterns(value)
+    elif isinstance(schema, list):
+      for value in schema:
+        yield from getPatterns(value)
+  # clients validate with JavaScript regular expressions, which have no inline flags
+  for pattern in getPatterns(loadValidator().schema):
+    assert "(?" not in pattern.replace("(?:", "").replace("(?=", "").replace("(?!", "")
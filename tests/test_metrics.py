@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the Prometheus metrics of the requests, the OMC commands and the simulation phases.
+"""
+
+from pathlib import Path
+from Service import metrics
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def test_histogram_format():
+  registry = metrics.Registry()
+  histogram = registry.histogram("test_seconds", "Test latency.", ("phase",), buckets=(0.1, 1))
+  histogram.observe(0.05, "a")
+  histogram.observe(5, "a")
+  lines = registry.expose().splitlines()
+  assert "test_seconds_bucket{phase=\"a\",le=\"0.1\"} 1.0" in lines
+  assert "test_seconds_bucket{phase=\"a\",le=\"1.0\"} 1.0" in lines
+  assert "test_seconds_bucket{phase=\"a\",le=\"+Inf\"} 2.0" in lines
+  assert "test_seconds_count{phase=\"a\"} 2.0" in lines
+  assert "test_seconds_sum{phase=\"a\"} 5.05" in lines
+
+def test_metrics_endpoint(fakeApplication):
+  client = fakeApplication.test_client()
+  response = client.post("/api/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  response = client.get("/metrics")
+  assert response.status_code == 200
+  text = response.data.decode()
+  assert "omws_http_requests_total{endpoint=\"api.simulate\",method=\"POST\",status=\"200\"}" in text
+  assert "omws_omc_command_duration_seconds_count{command=\"translateModel\"}" in text
+  for phase in ("upload", "unzip", "loadFiles", "translate", "compile", "simulation"):
+    assert "omws_phase_duration_seconds_count{{phase=\"{0}\"}}".format(phase) in text
+  assert "omws_omc_sessions{state=\"idle\"} 1.0" in text
+  assert "omws_jobs{status=\"finished\"} 1.0" in text
+
+def test_timings_in_response(fakeApplication):
+  response = fakeApplication.test_client().post("/api/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  timings = response.json["timings"]
+  for phase in ("upload", "unzip", "queue", "loadFiles", "translate", "compile", "simulation", "resultUrl"):
+    assert phase in timings
+  assert any(timing.startswith("simulation;dur=") for timing in response.headers["Server-Timing"].split(", "))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the model instance cache with a fake OMC.
+"""
+
+from pathlib import Path
+import io
+import json
+from Service.instancecache import ModelInstanceCache, getModelInstanceKey
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def getModelInstance(client, metaDataJson):
+  response = client.post("/api/modelInstance", data = {
+    "MetadataJson": (io.BytesIO(json.dumps(metaDataJson).encode()), "metadata.json"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  return response.json
+
+def countModelInstanceCommands(application):
+  return sum(command.startswith("getModelInstance(") for omc in application.extensions["omcSessionPool"].sessions
+             for command in omc.commands)
+
+def test_cached_instance_does_not_use_omc(fakeApplication):
+  client = fakeApplication.test_client()
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  first = getModelInstance(client, metaDataJson)
+  assert countModelInstanceCommands(fakeApplication) == 1
+  second = getModelInstance(client, metaDataJson)
+  assert countModelInstanceCommands(fakeApplication) == 1
+  assert second["file"] != first["file"]
+  assert client.get(second["file"]).data == client.get(first["file"]).data
+  # another class is built again
+  getModelInstance(client, dict(metaDataJson, **{"class": "Other"}))
+  assert countModelInstanceCommands(fakeApplication) == 2
+
+def test_tiers_and_invalidation(tmp_path, fakeApplication):
+  modelInstanceCache = fakeApplication.extensions["modelInstanceCache"]
+  msl = {"class": "Modelica.Blocks.Examples.PID_Controller", "libs": [{"name": "Modelica", "version": "4.0.0"}]}
+  key = getModelInstanceKey(msl, "", False, "v1")
+  assert key != getModelInstanceKey(msl, "", True, "v1")
+  modelInstanceCache.put(key, b"{}", [("Modelica", "4.0.0")])
+  # the disk tier serves entries evicted from memory
+  modelInstanceCache.memory.clear()
+  assert modelInstanceCache.get(key) == b"{}"
+  assert key in modelInstanceCache.memory
+  # installing the library again drops its entries from both tiers
+  libraryIndex = fakeApplication.extensions["libraryIndex"]
+  libraryIndex.fileName = str(tmp_path / "libraries.json")
+  libraryIndex.add("Modelica", "4.0.0", str(tmp_path / "package.mo"))
+  assert modelInstanceCache.get(key) is None
+  assert not modelInstanceCache.directoryCache.keys()
+
+def test_memory_limit():
+  modelInstanceCache = ModelInstanceCache(10)
+  modelInstanceCache.put("a", b"x" * 6, [])
+  modelInstanceCache.put("b", b"x" * 6, [])
+  assert modelInstanceCache.get("a") is None and modelInstanceCache.get("b") == b"x" * 6
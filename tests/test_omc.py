@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the pipelined commands, the lazy error string and the process id of the OMC interface.
+"""
+
+import logging
+from types import SimpleNamespace
+from Service import omc as omcModule
+from Service.omc import OMC
+from Service.replay import RecordingSession, TraceWriter
+from tests.fakeomc import FakeOMCSession
+
+class FakeOMC(FakeOMCSession):
+  """Fails to load the files named missing*.mo."""
+
+  def answer(self, expression):
+    super().answer(expression)
+    if "missing" in expression:
+      self.errors.append("Error: {0} failed.\n".format(expression))
+      return False
+    return True
+
+def test_pipelined_commands():
+  omc = FakeOMC()
+  assert omc.sendCommands(["loadFile(\"a.mo\")", "loadFile(\"b, c.mo\")", "loadFile(\"missing.mo\")"]) == (True, True, False)
+  assert omc.commands == ["loadFile(\"a.mo\")", "loadFile(\"b, c.mo\")", "loadFile(\"missing.mo\")"]
+  assert omc.roundTrips == 1
+
+def test_lazy_error_string():
+  omc = FakeOMC()
+  omc.sendCommand("cd(\"/tmp\")")
+  omc.sendCommand("loadFile(\"missing.mo\")")
+  assert omc.roundTrips == 2
+  assert omc.errorString == "Error: loadFile(\"missing.mo\") failed.\n"
+  assert omc.errorString == "Error: loadFile(\"missing.mo\") failed.\n"
+  assert omc.roundTrips == 3
+  assert omc.clearErrorString()
+  omc.sendCommand("loadFile(\"a.mo\")")
+  assert omc.errorString == ""
+
+def test_process_id(tmp_path, monkeypatch, caplog):
+  monkeypatch.setattr(omcModule, "processIdWarned", False)
+  # the OMPython session keeps the omc process in omc_process._omc_process
+  omcSession = SimpleNamespace(omc_process=SimpleNamespace(_omc_process=SimpleNamespace(pid=1234)))
+  assert OMC(omcSession).getProcessId() == 1234
+  writer = TraceWriter(str(tmp_path / "trace.jsonl"))
+  assert OMC(RecordingSession(omcSession, writer)).getProcessId() == 1234
+  writer.close()
+  with caplog.at_level(logging.WARNING, logger="Service.omc"):
+    assert OMC(SimpleNamespace()).getProcessId() is None
+    assert OMC(SimpleNamespace()).getProcessId() is None
+  assert len([record for record in caplog.records if "process id" in record.message]) == 1
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests uploading model packages once and simulating them by hash with a fake OMC.
+"""
+
+import io
+import os
+import json
+import stat
+from pathlib import Path
+from Service import api, util
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def getMetaDataJson(packageHash):
+  metaDataJson = json.loads((resources / "FileSimulation.metadata.json").read_text())
+  metaDataJson["package"] = packageHash
+  return (io.BytesIO(json.dumps(metaDataJson).encode()), "metadata.json")
+
+def test_upload_package(fakeApplication):
+  client = fakeApplication.test_client()
+  packageHash = util.hashFile(resources / "FileSimulation.zip")
+  assert client.get("/api/packages/{0}".format(packageHash)).status_code == 404
+  response = client.post("/api/packages", data = {"ModelZip": (resources / "FileSimulation.zip").open("rb")})
+  assert response.status_code == 201
+  assert response.json["package"] == packageHash
+  response = client.post("/api/packages", data = {"ModelZip": (resources / "FileSimulation.zip").open("rb")})
+  assert response.status_code == 200
+  assert client.get("/api/packages/{0}".format(packageHash)).json["package"] == packageHash
+  response = client.post("/api/packages", data = {"ModelZip": (io.BytesIO(b"not a zip"), "model.zip")})
+  assert response.status_code == 400
+
+def test_simulate_package(fakeApplication):
+  client = fakeApplication.test_client()
+  packageHash = client.post("/api/packages", data = {"ModelZip": (resources / "FileSimulation.zip").open("rb")}).json["package"]
+  response = client.post("/api/jobs/simulate", data = {"MetadataJson": getMetaDataJson(packageHash)})
+  assert response.status_code == 202
+  job = fakeApplication.extensions["jobManager"].get(response.json["id"])
+  assert job.wait(10)
+  assert job.status == "finished"
+  assert job.payload["sourcesHash"] == packageHash
+  # the model file is linked from the package, not copied
+  modelFile = os.path.join(job.payload["uploadDirectory"], "BouncingBall.mo")
+  assert os.stat(modelFile).st_nlink > 1
+  assert not os.stat(modelFile).st_mode & stat.S_IWUSR
+
+def test_unknown_package(fakeApplication):
+  response = fakeApplication.test_client().post("/api/simulate", data = {"MetadataJson": getMetaDataJson("0" * 64)})
+  assert response.status_code == 200
+  assert "upload it to /api/packages" in response.json["messages"]
+  assert os.listdir(fakeApplication.config['TMPDIR']) == []
+
+def test_package_shares_compiled_models(fakeApplication, monkeypatch):
+  compiled = []
+  buildSimulationExecutable = api.buildSimulationExecutable
+
+  def countingBuildSimulationExecutable(omc, uploadDirectory, metaDataJson):
+    compiled.append(metaDataJson["class"])
+    return buildSimulationExecutable(omc, uploadDirectory, metaDataJson)
+
+  monkeypatch.setattr(api, "buildSimulationExecutable", countingBuildSimulationExecutable)
+  client = fakeApplication.test_client()
+  packageHash = client.post("/api/packages", data = {"ModelZip": (resources / "FileSimulation.zip").open("rb")}).json["package"]
+  response = client.post("/api/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  response = client.post("/api/simulate", data = {"MetadataJson": getMetaDataJson(packageHash)})
+  assert response.status_code == 200
+  assert response.json["file"].endswith("BouncingBall_res.mat")
+  # the package request runs the executable built for the ModelZip upload
+  assert compiled == ["BouncingBall"]
+  assert len(fakeApplication.extensions["compiledModelCache"].keys()) == 1
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the OMC session pool with a fake OMC session.
+"""
+
+import threading
+import pytest
+from Service.pool import OMCSessionPool, OMCSessionPoolTimeout
+from tests.fakeomc import FakeOMCSession
+
+class FakeOMC(FakeOMCSession):
+  """Records the commands instead of sending them to OMC."""
+  instances = 0
+
+  def __init__(self):
+    super().__init__()
+    FakeOMC.instances += 1
+    self.classNames = []
+    # classes added inside the top level classes by files starting with within
+    self.nestedClassNames = {}
+    self.closed = False
+
+  def answer(self, expression):
+    super().answer(expression)
+    if expression == "cd()":
+      return "/home/omc"
+    if expression == "getClassNames()":
+      return tuple(self.classNames)
+    if expression.startswith("getSourceFile("):
+      return "/lib/{0}/package.mo".format(expression[len("getSourceFile("):-1])
+    if expression.startswith("size(getClassNames("):
+      className = expression[len("size(getClassNames("):expression.index(",")]
+      return 1 + len(self.nestedClassNames.get(className, []))
+    if expression.startswith("loadModel("):
+      self.classNames.append(expression[len("loadModel("):expression.index(",")])
+    elif expression == "loadFile(\"within.mo\")":
+      self.nestedClassNames.setdefault("Modelica", []).append("Modelica.Blocks.UserBlock")
+    elif expression.startswith("loadFile("):
+      self.classNames.append("UserModel")
+    elif expression.startswith("deleteClass("):
+      self.classNames.remove(expression[len("deleteClass("):-1])
+    elif expression == "clear()":
+      self.classNames = []
+      self.nestedClassNames = {}
+    return True
+
+  def close(self):
+    self.closed = True
+
+def test_reuse_and_reset():
+  pool = OMCSessionPool(FakeOMC, minSize=1, maxSize=2)
+  pool.start()
+  with pool.session() as omc:
+    omc.sendCommand("loadFile(\"a.mo\")")
+  with pool.session() as omc2:
+    pass
+  assert omc is omc2
+  assert omc.commands[-2:] == ["cd(\"/home/omc\")", "clear()"]
+
+def test_resident_libraries():
+  msl = [("Modelica", "4.0.0")]
+  pool = OMCSessionPool(FakeOMC, minSize=1, maxSize=2, prewarmLibraries=[msl])
+  pool.start()
+  with pool.session(libraries=msl) as omc:
+    omc.sendCommand("loadFile(\"a.mo\")")
+  assert omc.classNames == ["Modelica"]
+  assert "installPackage(Modelica, \"4.0.0\")" in omc.commands
+  loads = omc.commands.count("loadModel(Modelica, {\"4.0.0\"})")
+  with pool.session(libraries=msl) as omc2:
+    pass
+  assert omc2 is omc
+  assert omc.commands.count("loadModel(Modelica, {\"4.0.0\"})") == loads
+  with pool.session() as omc3:
+    assert omc3 is not omc
+
+def test_nested_library_class_clears_session():
+  msl = [("Modelica", "4.0.0")]
+  pool = OMCSessionPool(FakeOMC, minSize=1, maxSize=1)
+  pool.start()
+  with pool.session(libraries=msl) as omc:
+    # within Modelica.Blocks; adds a class inside the library and changes no library file
+    omc.sendCommand("loadFile(\"within.mo\")")
+  assert omc.nestedClassNames == {}
+  assert "clear()" in omc.commands
+  with pool.session(libraries=msl) as omc2:
+    assert omc2 is omc and omc.classNames == ["Modelica"]
+
+def test_bounded_size():
+  pool = OMCSessionPool(FakeOMC, minSize=0, maxSize=1)
+  omc = pool.acquire()
+  with pytest.raises(OMCSessionPoolTimeout):
+    pool.acquire(timeout=0.05)
+  threading.Timer(0.05, pool.release, [omc]).start()
+  assert pool.acquire(timeout=5) is omc
+
+def test_recycle_after_max_uses_and_errors():
+  pool = OMCSessionPool(FakeOMC, minSize=0, maxSize=1, maxUses=2)
+  first = pool.acquire()
+  pool.release(first)
+  pool.release(pool.acquire())
+  assert first.closed
+  with pytest.raises(RuntimeError):
+    with pool.session() as second:
+      raise RuntimeError("borrower failed")
+  assert second is not first and second.closed
+  pool.close()
+
+def test_reserved_interactive_session():
+  pool = OMCSessionPool(FakeOMC, minSize=0, maxSize=2, reservedSessions=1)
+  background = pool.acquire(interactive=False)
+  with pytest.raises(OMCSessionPoolTimeout):
+    pool.acquire(timeout=0.05, interactive=False)
+  # the reserved session is left for interactive requests
+  with pool.session(timeout=0.05) as omc:
+    assert omc is not background
+  pool.release(background)
+  pool.release(pool.acquire(timeout=0.05, interactive=False))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests recording OMC sessions to a trace file and replaying them.
+"""
+
+import os
+from Service.replay import TraceWriter, ReplayOMC, recordingFactory
+from tests.fakeomc import FakeOMC
+
+def test_record_and_replay(tmp_path):
+  traceFileName = str(tmp_path / "trace.jsonl")
+  recordedDirectory = tmp_path / "recorded" / "tmpabcd1234"
+  recordedDirectory.mkdir(parents=True)
+  writer = TraceWriter(traceFileName)
+  omc = recordingFactory(FakeOMC, writer)()
+  omc.sendCommand("cd(\"{0}\")".format(recordedDirectory))
+  omc.sendCommand("loadFile(\"BouncingBall.mo\")")
+  recorded = omc.sendCommand("simulate(BouncingBall, stopTime=3.0)")
+  writer.close()
+
+  ReplayOMC.load(traceFileName, timeScale=0)
+  replayDirectory = tmp_path / "replayed" / "tmpwxyz9876"
+  replayDirectory.mkdir(parents=True)
+  replay = ReplayOMC()
+  assert replay.sendCommand("cd(\"{0}\")".format(replayDirectory)) == str(replayDirectory)
+  assert replay.sendCommand("loadFile(\"BouncingBall.mo\")")
+  result = replay.sendCommand("simulate(BouncingBall, stopTime=3.0)")
+  assert result["messages"] == recorded["messages"]
+  assert result["resultFile"] == os.path.join(str(replayDirectory), "BouncingBall_res.mat")
+  assert os.path.exists(result["resultFile"])
+  # an unknown expression gets the recorded result of the same command
+  assert replay.sendCommand("simulate(BouncingBall, stopTime=5.0)")["messages"] == recorded["messages"]
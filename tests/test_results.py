@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+
+"""
+Tests the result query endpoint with a generated MAT v4 result file.
+"""
+
+import io
+import numpy
+from benchmarks.matfile import writeMatResult
+
+def writeResult(application):
+  time = numpy.linspace(0.0, 1.0, 11)
+  writeMatResult("{0}/Model_res.mat".format(application.config['TMPDIR']), time,
+                 {"x": time * 2, "ball.v": -time, "ball.h": time + 1}, {"g": 9.81})
+
+def test_select_variables(fakeApplication):
+  writeResult(fakeApplication)
+  response = fakeApplication.test_client().get("/api/results", query_string = {
+    "FileName": "Model_res.mat", "Variables": "ball.*,g", "StartTime": 0.45, "StopTime": 0.75
+  })
+  assert response.status_code == 200
+  data = response.json
+  assert numpy.allclose(data["time"], [0.5, 0.6, 0.7])
+  assert list(data["variables"]) == ["ball.h", "ball.v", "g"]
+  assert numpy.allclose(data["variables"]["ball.v"], [-0.5, -0.6, -0.7])
+  assert numpy.allclose(data["variables"]["g"], [9.81] * 3)
+
+def test_npz_format(fakeApplication):
+  writeResult(fakeApplication)
+  response = fakeApplication.test_client().get("/api/results", query_string = {"FileName": "Model_res.mat", "Variables": "x", "Format": "npz"})
+  assert response.status_code == 200
+  data = numpy.load(io.BytesIO(response.data))
+  assert list(data["names"]) == ["x"]
+  assert numpy.allclose(data["values"][0], data["time"] * 2)
+
+def test_invalid_file(fakeApplication):
+  client = fakeApplication.test_client()
+  assert client.get("/api/results", query_string = {"FileName": "../secret.mat"}).status_code == 400
+  assert client.get("/api/results", query_string = {"FileName": "missing.mat"}).status_code == 404
+
+def test_downsample(fakeApplication):
+  time = numpy.linspace(0.0, 1.0, 1001)
+  writeMatResult("{0}/Model_res.mat".format(fakeApplication.config['TMPDIR']), time,
+                 {"x": numpy.sin(20 * time), "y": time}, {})
+  client = fakeApplication.test_client()
+  for method in ("minmax", "lttb"):
+    response = client.get("/api/results", query_string = {"FileName": "Model_res.mat", "Downsample": method, "Points": 100})
+    assert response.status_code == 200
+    series = response.json["variables"]
+    assert len(series["x"]["time"]) == len(series["x"]["values"]) == 100
+    assert max(series["x"]["values"]) > 0.999 and min(series["x"]["values"]) < -0.999
+    assert numpy.allclose(series["y"]["time"], series["y"]["values"])
+    assert numpy.all(numpy.diff(series["x"]["time"]) >= 0)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of OpenModelica.
+# Copyright (c) 1998-CurrentYear, Open Source Modelica Consortium (OSMC),
+# c/o Linköpings universitet, Department of Computer and Information Science,
+# SE-58183 Linköping, Sweden.
+
+# All rights reserved.
+
+# THIS PROGRAM IS PROVIDED UNDER THE TERMS OF GPL VERSION 3 LICENSE OR
+# THIS OSMC PUBLIC LICENSE (OSMC-PL) VERSION 1.2.
+# ANY USE, REPRODUCTION OR DISTRIBUTION OF THIS PROGRAM CONSTITUTES
+# RECIPIENT'S ACCEPTANCE OF THE OSMC PUBLIC LICENSE OR THE GPL VERSION 3,
+# ACCORDING TO RECIPIENTS CHOICE.
+
+# The OpenModelica software and the Open Source Modelica
+# Consortium (OSMC) Public License (OSMC-PL) are obtained
+# from OSMC, either from the above address,
+# from the URLs: http://www.ida.liu.se/projects/OpenModelica or
+# http://www.openmodelica.org, and in the OpenModelica distribution.
+# GNU version 3 is obtained from: http://www.gnu.org/copyleft/gpl.html.
+
+# This program is distributed WITHOUT ANY WARRANTY; without
+# even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE, EXCEPT AS EXPRESSLY SET FORTH
+# IN THE BY RECIPIENT SELECTED SUBSIDIARY LICENSE CONDITIONS OF OSMC-PL.
+
+# See the full OSMC Public License conditions for more details.
+
+"""
+Tests the CPU scheduler.
+"""
+
+import time
+import threading
+from pathlib import Path
+from Service.scheduler import CPUScheduler, COMPILE, SIMULATE
+
+# get the resources folder in the tests folder
+resources = Path(__file__).parent / "resources"
+
+def makeScheduler(cores, **kwargs):
+  scheduler = CPUScheduler(**kwargs)
+  scheduler.cores = scheduler.free = list(range(cores))
+  scheduler.compileMaxCores = kwargs.get("compileMaxCores") or cores
+  scheduler.compileLimit = max(int(cores * kwargs.get("compileMaxShare", 1.0)), 1)
+  return scheduler
+
+def test_compile_budget():
+  scheduler = makeScheduler(4, compileMaxShare=0.75)
+  # an idle machine gives one compilation the whole compile share
+  with scheduler.reserveCompile() as cores:
+    assert len(cores) == 3
+    with scheduler.reserveSimulate() as simulateCores:
+      assert len(simulateCores) == 1 and simulateCores[0] not in cores
+  assert sorted(scheduler.free) == [0, 1, 2, 3]
+
+def test_queueing():
+  scheduler = makeScheduler(2, compileMaxCores=1)
+  running = {COMPILE: 0, SIMULATE: 0}
+  peak = [0]
+  lock = threading.Lock()
+
+  def run(kind):
+    with scheduler.reserve(kind, scheduler.compileMaxCores if kind == COMPILE else 1):
+      with lock:
+        running[kind] += 1
+        peak[0] = max(peak[0], sum(running.values()))
+      time.sleep(0.02)
+      with lock:
+        running[kind] -= 1
+
+  threads = [threading.Thread(target=run, args=(COMPILE if index % 2 else SIMULATE,)) for index in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join(5)
+  # never more phases than cores, and every phase finished
+  assert peak[0] == 2
+  assert not any(thread.is_alive() for thread in threads)
+  assert scheduler.inUse == {COMPILE: 0, SIMULATE: 0}
+
+def test_build_and_simulate_reserve_separately(fakeApplication, monkeypatch):
+  scheduler = fakeApplication.extensions["cpuScheduler"]
+  reserved = []
+  reserve = scheduler.reserve
+
+  def recordingReserve(kind, maxCores=1):
+    reserved.append(kind)
+    return reserve(kind, maxCores)
+
+  monkeypatch.setattr(scheduler, "reserve", recordingReserve)
+  response = fakeApplication.test_client().post("/api/simulate", data = {
+    "MetadataJson": (resources / "FileSimulation.metadata.json").open("rb"),
+    "ModelZip": (resources / "FileSimulation.zip").open("rb")
+  })
+  assert response.status_code == 200
+  assert response.json["file"].endswith("BouncingBall_res.mat")
+  # OMC only builds on the compile cores, the solver runs on a simulation core
+  assert reserved == [COMPILE, SIMULATE]
+  omc = fakeApplication.extensions["omcSessionPool"].acquire()
+  numProcs = [command for command in omc.commands if command.startswith("setCommandLineOptions(\"--numProcs")]
+  assert numProcs[-1] == "setCommandLineOptions(\"--numProcs=0\")"